@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -23,11 +24,48 @@ load_dotenv(dotenv_path=BASE_DIR / ".env")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+# Webhooks without a valid X-Twilio-Signature are rejected; turn off only for local testing
+TWILIO_VALIDATE_SIGNATURES = os.getenv("TWILIO_VALIDATE_SIGNATURES", "true") == "true"
 
 # Telegram Bot Configuration
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_IDS = os.getenv("TELEGRAM_CHAT_ID")
 
+# Conversation flow of incoming calls (voice_assistant/flows): "vize_danisman" is the prompt-only visa assistant,
+# "pizzadam_order" the order FSM with tool calls, restaurant menus and order submission
+CONVERSATION_FLOW = os.getenv("CONVERSATION_FLOW", "vize_danisman")
+
+# Call resume: FSM snapshots are kept per caller number and a call back within the window resumes the order.
+# Older snapshots are swept from CALL_SNAPSHOT_DIR
+CALL_SNAPSHOT_DIR = os.getenv("CALL_SNAPSHOT_DIR", BASE_DIR / "call_snapshots")
+CALL_RESUME_WINDOW_SECONDS = int(os.getenv("CALL_RESUME_WINDOW_SECONDS", "300"))
+
+# Language detection: below this confidence the caller is asked for the language explicitly
+LANGUAGE_DETECTION_MIN_CONFIDENCE = float(os.getenv("LANGUAGE_DETECTION_MIN_CONFIDENCE", "0.6"))
+LANGUAGE_PREFERENCE_TTL_SECONDS = int(os.getenv("LANGUAGE_PREFERENCE_TTL_SECONDS", str(90 * 24 * 3600)))
+
+# Latency budgets for external lookups (common.utils.resilience): what a caller's turn may wait on them,
+# and how long the order history prefetch started with the call may take
+TURN_LATENCY_BUDGET_SECONDS = float(os.getenv("TURN_LATENCY_BUDGET_SECONDS", "1.5"))
+ORDER_HISTORY_PREFETCH_BUDGET_SECONDS = float(os.getenv("ORDER_HISTORY_PREFETCH_BUDGET_SECONDS", "4"))
+
+# Restaurants: the number a caller dialed -> Foodticket client_id, e.g. {"+31201234567": 1234}. Unlisted numbers
+# go to FOODTICKET_CLIENT_ID. At most MAX_RESTAURANT_PARTITIONS restaurants keep their menu and zipcodes in memory
+RESTAURANT_CLIENT_IDS = json.loads(os.getenv("RESTAURANT_CLIENT_IDS", "{}"))
+MAX_RESTAURANT_PARTITIONS = int(os.getenv("MAX_RESTAURANT_PARTITIONS", "32"))
+
+# Foodticket API (integrations.foodticket_client); point FOODTICKET_BASE_URL at the stand-in server for local testing.
+# Scripts that run without Django settings read the same environment variables (`client.foodticket_setting`)
+FOODTICKET_BASE_URL = os.getenv("FOODTICKET_BASE_URL", "https://api.foodticket.net/1")
+FOODTICKET_CLIENT_ID = int(os.getenv("FOODTICKET_CLIENT_ID", "3517"))
+FOODTICKET_API_KEY = os.getenv("FOODTICKET_API_KEY", "564ff05d0a9c61d030431330952a56c0")
+FOODTICKET_CACHE_DIR = os.getenv("FOODTICKET_CACHE_DIR", str(BASE_DIR / "foodticket_cache"))
+FOODTICKET_CATALOG_TTL_SECONDS = int(os.getenv("FOODTICKET_CATALOG_TTL_SECONDS", "900"))
+FOODTICKET_ZIPCODE_TTL_SECONDS = int(os.getenv("FOODTICKET_ZIPCODE_TTL_SECONDS", "3600"))
+FOODTICKET_HEDGE_AFTER_SECONDS = float(os.getenv("FOODTICKET_HEDGE_AFTER_SECONDS", "0.4"))
+FOODTICKET_BREAKER_FAILURES = int(os.getenv("FOODTICKET_BREAKER_FAILURES", "5"))
+FOODTICKET_BREAKER_RESET_SECONDS = float(os.getenv("FOODTICKET_BREAKER_RESET_SECONDS", "30"))
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
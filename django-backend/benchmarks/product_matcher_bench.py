@@ -0,0 +1,97 @@
+"""
+Accuracy and latency of the product matcher against the previous difflib lookup.
+
+Uses the cached catalog snapshot when there is one, otherwise the product vocabulary of the flow.
+
+The bundled cases (product_match_cases.json) are hand-written, and the matcher's alias table was
+written against them: they check that known spellings keep resolving, they do not measure
+accuracy, and a perfect score on them says nothing about real callers. An accuracy figure needs
+held-out cases from real calls (the product_name arguments in EventLog, labelled by hand), passed
+with --cases. The latency figures hold either way.
+Run from django-backend/:
+    python -m benchmarks.product_matcher_bench
+    python -m benchmarks.product_matcher_bench --cases /path/to/held_out_cases.json
+"""
+
+import argparse
+import json
+import time
+from difflib import get_close_matches
+from pathlib import Path
+
+from integrations.foodticket_client.product_matcher import matcher_from_titles
+from voice_assistant.state_machine.conversation_openai_tools import products as vocabulary_products
+
+CASES_FILE = Path(__file__).with_name("product_match_cases.json")
+REPEATS = 200
+
+
+def load_titles() -> tuple[list, str]:
+    try:
+        from integrations.foodticket_client.catalog_cache import catalog_cache
+
+        catalog = catalog_cache.peek()
+    except ImportError:
+        catalog = None
+    if catalog is not None:
+        return [product["title"] for product in catalog.products if product.get("title")], f"catalog snapshot of client {catalog.client_id}"
+    return list(vocabulary_products), "flow vocabulary"
+
+
+def difflib_lookup(titles):
+    def lookup(text):
+        return get_close_matches(text, titles, n=3, cutoff=0.5)
+
+    return lookup
+
+
+def matcher_lookup(matcher):
+    def lookup(text):
+        return [match.title for match in matcher.match(text, limit=3)]
+
+    return lookup
+
+
+def evaluate(name, lookup, cases):
+    top1 = top3 = 0
+    misses = []
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        for case in cases:
+            lookup(case["text"])
+    elapsed = time.perf_counter() - started
+    for case in cases:
+        ranked = lookup(case["text"])
+        expected = case["expected"]
+        if (ranked[:1] or [None])[0] == expected:
+            top1 += 1
+        else:
+            misses.append(f"{case['lang']} '{case['text']}' -> {ranked[:1] or None}, expected {expected}")
+        if expected in ranked or (expected is None and not ranked):
+            top3 += 1
+    per_lookup_us = elapsed / (REPEATS * len(cases)) * 1e6
+    print(f"{name}: top-1 {top1}/{len(cases)} ({top1 / len(cases):.0%}), top-3 {top3}/{len(cases)}, {per_lookup_us:.1f} us/lookup")
+    for miss in misses:
+        print(f"    miss: {miss}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", type=Path, default=CASES_FILE, help="JSON file with a 'cases' list, as product_match_cases.json")
+    options = parser.parse_args()
+
+    titles, source = load_titles()
+    cases = json.loads(options.cases.read_text(encoding="utf-8"))["cases"]
+    cases = [case for case in cases if case["expected"] is None or case["expected"] in titles]
+
+    started = time.perf_counter()
+    matcher = matcher_from_titles(titles)
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f"{len(titles)} products from the {source}, {len(matcher.entries)} indexed names, index built in {build_ms:.1f} ms")
+    if options.cases == CASES_FILE:
+        print(f"{len(cases)} tuning cases: the aliases were written against them, the scores below are a regression check, not accuracy\n")
+    else:
+        print(f"{len(cases)} cases from {options.cases}\n")
+
+    evaluate("difflib", difflib_lookup(titles), cases)
+    evaluate("matcher", matcher_lookup(matcher), cases)
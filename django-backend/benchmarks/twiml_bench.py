@@ -0,0 +1,72 @@
+"""
+Throughput of the incoming call TwiML, twilio library objects vs the precompiled template.
+
+"objects" is the previous view body (VoiceResponse / Connect / Stream serialized through
+ElementTree), "template" is `incoming_call_twiml`. Both render the same random caller numbers and
+the outputs are compared byte for byte first. With --concurrency the renders run as that many
+coroutines on one event loop, the way the async view serves a burst of webhooks.
+Run from django-backend/:
+    python -m benchmarks.twiml_bench --calls 50000 --concurrency 500
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from twilio.twiml.voice_response import Connect, Stream, VoiceResponse
+
+from voice_assistant.services.twiml import FIRST_MESSAGE, incoming_call_twiml
+
+HOST = "voice.example.com"
+DIALED_NUMBER = "+31201234567"
+
+
+def objects_twiml(host, caller_number, dialed_number):
+    response = VoiceResponse()
+    connect = Connect()
+    stream = Stream(url=f"wss://{host}/ws/media-stream/")
+    stream.parameter(name="callerNumber", value=caller_number)
+    stream.parameter(name="dialedNumber", value=dialed_number)
+    stream.parameter(name="firstMessage", value=FIRST_MESSAGE)
+    connect.append(stream)
+    response.append(connect)
+    return str(response)
+
+
+def caller_numbers(count):
+    rng = random.Random(0)
+    return [f"+316{rng.randrange(10**8):08d}" for _ in range(count)]
+
+
+def measure(name, render, numbers, concurrency):
+    started = time.perf_counter()
+    if concurrency > 1:
+
+        async def webhook(number):
+            return render(HOST, number, DIALED_NUMBER)
+
+        async def burst():
+            for i in range(0, len(numbers), concurrency):
+                await asyncio.gather(*(webhook(number) for number in numbers[i : i + concurrency]))
+
+        asyncio.run(burst())
+    else:
+        for number in numbers:
+            render(HOST, number, DIALED_NUMBER)
+    elapsed = time.perf_counter() - started
+    print(f"  {name:<10} {len(numbers) / elapsed:10.0f} renders/s   {elapsed / len(numbers) * 1e6:6.1f} µs/render")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    options = parser.parse_args()
+
+    numbers = caller_numbers(options.calls)
+    for number in numbers[:1000] + ['Anonymous <"&">']:
+        assert objects_twiml(HOST, number, DIALED_NUMBER) == incoming_call_twiml(HOST, number, DIALED_NUMBER), number
+    print(f"{options.calls} calls, concurrency {options.concurrency}, outputs identical")
+    measure("objects", objects_twiml, numbers, options.concurrency)
+    measure("template", incoming_call_twiml, numbers, options.concurrency)
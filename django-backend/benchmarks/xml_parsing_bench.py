@@ -0,0 +1,79 @@
+"""
+Peak memory and time of the Foodticket XML parsing, whole-document vs incremental.
+
+"whole" is the previous approach (ET.parse / iterparse without clearing over the full body),
+"stream" feeds 64 KiB chunks to `xml_stream` the way the client reads a streamed response.
+Run from django-backend/:
+    python -m benchmarks.xml_parsing_bench --scale 20
+"""
+
+import argparse
+import io
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from integrations.foodticket_client.fixtures import orders_xml, products_xml
+from integrations.foodticket_client.parsers import flat_order_lines, product_from_row
+from integrations.foodticket_client.xml_stream import CHUNK_SIZE, iter_records
+
+
+def chunks(content: bytes):
+    for i in range(0, len(content), CHUNK_SIZE):
+        yield content[i : i + CHUNK_SIZE]
+
+
+def whole_products(content):
+    root = ET.parse(io.BytesIO(content)).getroot()
+    return [product_from_row(row) for row in root.findall("row")]
+
+
+def stream_products(content):
+    return [product_from_row(row) for row in iter_records(chunks(content), "row")]
+
+
+def whole_first_order(content):
+    flat_orders = []
+    for event, elem in ET.iterparse(io.BytesIO(content), events=("end",)):
+        if elem.tag == "order":
+            flat_orders.extend(flat_order_lines(elem))
+    return flat_orders[0] if flat_orders else "not found"
+
+
+def stream_first_order(content):
+    for order in iter_records(chunks(content), "order"):
+        lines = flat_order_lines(order)
+        if lines:
+            return lines[0]
+    return "not found"
+
+
+def stream_all_orders(content):
+    return sum(len(flat_order_lines(order)) for order in iter_records(chunks(content), "order"))
+
+
+def measure(name, func, content):
+    tracemalloc.start()
+    started = time.perf_counter()
+    func(content)
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"  {name:<22} peak {peak / 2**20:7.2f} MiB   {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=10)
+    options = parser.parse_args()
+
+    products = products_xml(200 * options.scale)
+    orders = orders_xml(1000 * options.scale)
+    # The response body itself is not counted, the client never holds it when streaming
+    print(f"products: {len(products) / 2**20:.1f} MiB body")
+    measure("whole", whole_products, products)
+    measure("stream", stream_products, products)
+    print(f"orders: {len(orders) / 2**20:.1f} MiB body")
+    measure("whole, first order", whole_first_order, orders)
+    measure("stream, first order", stream_first_order, orders)
+    measure("stream, all orders", stream_all_orders, orders)
@@ -14,6 +14,14 @@ class OpenAIEvent(Enum):
     # Starts generation of assistant’s response
     RESPONSE_CREATE = "response.create"
 
+    # Sent by OpenAI → Client
+    # A response started; only one response can be active at a time
+    RESPONSE_CREATED = "response.created"
+
+    # Sent by Client → OpenAI
+    # Adds an item to the conversation (e.g. the output of a function call)
+    CONVERSATION_ITEM_CREATE = "conversation.item.create"
+
     # Sent by OpenAI → Client
     # Audio stream chunks from assistant (base64-encoded)
     RESPONSE_AUDIO_DELTA = "response.audio.delta"
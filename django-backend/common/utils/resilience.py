@@ -0,0 +1,163 @@
+"""
+Latency budget, hedged requests and circuit breaker for external lookups made during a call.
+
+- `latency_budget(seconds)` sets a deadline for everything awaited inside it (it travels with
+  the contextvars of the task, nested budgets can only shrink it). Clients read
+  `remaining_budget()` to cap their timeouts, so a turn waits at most its budget on upstreams.
+- `hedged(...)` starts a second attempt of an idempotent request when the first one is slow and
+  returns whichever answers first.
+- `CircuitBreaker` stops calling an upstream after repeated failures and lets one probe request
+  through after a cool-down. Callers catch `CircuitOpenError` and answer from a cache or degrade.
+  The state is exported as the `breaker.<name>.state` gauge (0 closed, 1 half-open, 2 open).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from common.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_deadline: ContextVar[Optional[float]] = ContextVar("latency_deadline", default=None)
+
+
+class BudgetExceeded(asyncio.TimeoutError):
+    pass
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str):
+        self.name = name
+        super().__init__(f"Circuit '{name}' is open")
+
+
+@contextmanager
+def latency_budget(seconds: float):
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Seconds left in the current budget, None outside of any budget."""
+    deadline = _deadline.get()
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def budget_timeout(default: float) -> float:
+    """`default` capped by the remaining budget; raises `BudgetExceeded` when nothing is left."""
+    remaining = remaining_budget()
+    if remaining is None:
+        return default
+    if remaining <= 0:
+        raise BudgetExceeded("Latency budget exhausted")
+    return min(default, remaining)
+
+
+async def hedged(
+    attempt: Callable[[], Awaitable[T]],
+    hedge_after: float,
+    discard: Optional[Callable[[T], Awaitable]] = None,
+    name: str = "request",
+) -> T:
+    """
+    Runs `attempt()`; when it has not finished after `hedge_after` seconds (and the budget allows),
+    runs it once more in parallel and returns the first success. `discard` releases the result of a
+    losing attempt that finished anyway (e.g. closes a streamed response).
+    """
+    first = asyncio.ensure_future(attempt())
+    remaining = remaining_budget()
+    pending = {first}
+    if remaining is None or remaining > hedge_after:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+        if not done:
+            metrics.increment(f"hedge.{name}.fired")
+            pending.add(asyncio.ensure_future(attempt()))
+
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            succeeded = [task for task in done if task.exception() is None]
+            if succeeded:
+                winner = succeeded[0]
+                if winner is not first:
+                    metrics.increment(f"hedge.{name}.won")
+                if discard is not None:
+                    for task in succeeded[1:]:
+                        await discard(task.result())
+                return winner.result()
+            error = next(iter(done)).exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        metrics.set_gauge(f"breaker.{name}.state", 0)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning(f"Circuit '{self.name}' {self.state} -> {state}")
+            self.state = state
+            metrics.set_gauge(f"breaker.{self.name}.state", self._GAUGE[state])
+
+    def allow_request(self) -> bool:
+        """False while open; after the cool-down a single probe request is let through."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout_seconds:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.CLOSED or (self.state == self.HALF_OPEN and not self._probing):
+                self._probing = self.state == self.HALF_OPEN
+                return True
+        metrics.increment(f"breaker.{self.name}.rejected")
+        return False
+
+    def check(self):
+        if not self.allow_request():
+            raise CircuitOpenError(self.name)
+
+    def release(self):
+        """For a request that ended without an outcome (cancelled), so a half-open circuit can probe again."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    metrics.increment(f"breaker.{self.name}.opened")
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
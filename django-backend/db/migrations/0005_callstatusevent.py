@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-19 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0004_orderoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallStatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('call_session_id', models.CharField(max_length=50)),
+                ('status', models.CharField(max_length=16)),
+                ('sequence_number', models.PositiveSmallIntegerField(null=True)),
+                ('duration', models.PositiveIntegerField(null=True)),
+                ('direction', models.CharField(blank=True, default='', max_length=20)),
+                ('from_number', models.CharField(blank=True, default='', max_length=32)),
+                ('to_number', models.CharField(blank=True, default='', max_length=32)),
+                ('occurred_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['call_session_id', 'sequence_number'], name='call_status_call_idx'), models.Index(fields=['occurred_at'], name='call_status_occurred_idx')],
+            },
+        ),
+    ]
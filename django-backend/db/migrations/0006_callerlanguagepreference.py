@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-19 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('db', '0005_callstatusevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallerLanguagePreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('caller_hash', models.CharField(max_length=40, unique=True)),
+                ('lang', models.CharField(max_length=2)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 
 class EventLog(models.Model):
@@ -6,3 +7,63 @@ class EventLog(models.Model):
     event_name = models.CharField(max_length=100, null=True)
     event_data = models.JSONField(null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+
+class OrderOutbox(models.Model):
+    """Confirmed orders waiting to be submitted to Foodticket, see `voice_assistant.services.order_outbox`."""
+
+    PENDING = "pending"
+    SUBMITTED = "submitted"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (SUBMITTED, "Submitted"), (FAILED, "Failed")]
+
+    idempotency_key = models.CharField(max_length=64, unique=True)
+    call_sid = models.CharField(max_length=50)
+    client_id = models.IntegerField()
+    payload = models.JSONField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    external_order_id = models.CharField(max_length=64, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "next_attempt_at"], name="order_outbox_due_idx")]
+
+
+class CallStatusEvent(models.Model):
+    """
+    One Twilio call status callback (ringing, in-progress, completed, ...), see
+    `voice_assistant.services.call_status`. `call_session_id` is the CallSid, as in EventLog.
+    """
+
+    call_session_id = models.CharField(max_length=50)
+    status = models.CharField(max_length=16)
+    sequence_number = models.PositiveSmallIntegerField(null=True)
+    # Seconds, on completed calls; Twilio bills per started minute of it
+    duration = models.PositiveIntegerField(null=True)
+    direction = models.CharField(max_length=20, blank=True, default="")
+    from_number = models.CharField(max_length=32, blank=True, default="")
+    to_number = models.CharField(max_length=32, blank=True, default="")
+    # When Twilio sent the callback; rows are written in batches, so created_at is later
+    occurred_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["call_session_id", "sequence_number"], name="call_status_call_idx"),
+            models.Index(fields=["occurred_at"], name="call_status_occurred_idx"),
+        ]
+
+
+class CallerLanguagePreference(models.Model):
+    """
+    Language of a caller's last call, so the next call skips the language question, see
+    `voice_assistant.services.language_preferences`. Numbers are stored as a sha1, like the snapshot keys.
+    """
+
+    caller_hash = models.CharField(max_length=40, unique=True)
+    lang = models.CharField(max_length=2)
+    updated_at = models.DateTimeField(auto_now=True)
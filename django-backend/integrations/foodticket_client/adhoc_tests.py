@@ -4,10 +4,14 @@ import xml.etree.ElementTree as ET
 import io
 from datetime import datetime, timedelta
 from typing import List, Dict
-client_id = 3517
-api_key = '564ff05d0a9c61d030431330952a56c0'
+
+from integrations.foodticket_client.client import DEFAULT_API_KEY, DEFAULT_CLIENT_ID, foodticket_setting
+
+client_id = DEFAULT_CLIENT_ID
+api_key = DEFAULT_API_KEY
+base_url = foodticket_setting("FOODTICKET_BASE_URL", "https://api.foodticket.net/1")
 url = (
-        f"https://api.foodticket.net/1/orders?client_id={client_id}"
+        f"{base_url}/orders?client_id={client_id}"
     )
 
 
@@ -51,7 +55,7 @@ for product in flat_orders:
 
 
 
-url = f"https://api.foodticket.net/1/products?client_id={client_id}"
+url = f"{base_url}/products?client_id={client_id}"
 
 response = requests.get(url, headers=headers)
 xml_stream = io.BytesIO(response.content)
@@ -0,0 +1,218 @@
+"""
+Menu catalog cache (products and extras) per Foodticket client_id.
+
+Each client's catalog is an immutable `Catalog` held in memory and mirrored to a JSON snapshot
+in FOODTICKET_CACHE_DIR, so a restart does not wait on the API. Readers take the current object
+without a lock; a refresh builds a new `Catalog` and swaps the dict entry. Expired catalogs keep
+being served while one background refresh per client revalidates them with conditional GETs
+(ETag / Last-Modified). Responses are parsed while they stream in; when the body hash shows the
+content did not change, the previous objects are kept so derived indexes are not rebuilt.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from common.utils.metrics import metrics
+from integrations.foodticket_client.client import (
+    DEFAULT_API_KEY,
+    DEFAULT_CLIENT_ID,
+    FoodticketAPIError,
+    FoodticketClient,
+    conditional_headers,
+    foodticket_setting,
+    response_validators,
+    run_sync,
+)
+from integrations.foodticket_client.extras_index import ExtrasIndex, ExtrasIndexBuilder
+from integrations.foodticket_client.parsers import product_from_row
+from integrations.foodticket_client.xml_stream import CHUNK_SIZE, aiter_records
+
+logger = logging.getLogger(__name__)
+
+FOODTICKET_CACHE_DIR = foodticket_setting("FOODTICKET_CACHE_DIR", str(Path(__file__).resolve().parents[2] / "foodticket_cache"))
+CATALOG_TTL_SECONDS = foodticket_setting("FOODTICKET_CATALOG_TTL_SECONDS", "900", int)
+
+
+@dataclass(frozen=True)
+class Catalog:
+    client_id: int
+    products: List[Dict]
+    extras: ExtrasIndex
+    fetched_at: float
+    # Per endpoint: etag, last_modified and sha1 of the last response body
+    validators: Dict[str, Dict] = field(default_factory=dict)
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def to_dict(self) -> dict:
+        return {
+            "client_id": self.client_id,
+            "products": self.products,
+            "extras": self.extras.to_dict(),
+            "fetched_at": self.fetched_at,
+            "validators": self.validators,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Catalog":
+        return cls(data["client_id"], data["products"], ExtrasIndex.from_dict(data["extras"]), data["fetched_at"], data.get("validators", {}))
+
+
+async def _parse_products(rows) -> List[Dict]:
+    return [product_from_row(row) async for row in rows]
+
+
+async def _parse_extras(rows) -> ExtrasIndex:
+    builder = ExtrasIndexBuilder()
+    async for row in rows:
+        builder.add_row(row)
+    return builder.build()
+
+
+class CatalogCache:
+    def __init__(self, cache_dir: str = FOODTICKET_CACHE_DIR, ttl_seconds: int = CATALOG_TTL_SECONDS, api_key: str = DEFAULT_API_KEY):
+        self.cache_dir = Path(cache_dir)
+        self.ttl_seconds = ttl_seconds
+        self.api_key = api_key
+        self._catalogs: Dict[int, Catalog] = {}
+        self._clients: Dict[int, FoodticketClient] = {}
+        self._refreshing: Dict[int, asyncio.Task] = {}
+
+    def _path(self, client_id: int) -> Path:
+        return self.cache_dir / f"catalog_{client_id}.json"
+
+    def _client(self, client_id: int) -> FoodticketClient:
+        client = self._clients.get(client_id)
+        if client is None:
+            client = self._clients[client_id] = FoodticketClient(client_id, self.api_key)
+        return client
+
+    def is_stale(self, catalog: Catalog) -> bool:
+        return catalog.age() > self.ttl_seconds
+
+    def peek(self, client_id: int = DEFAULT_CLIENT_ID) -> Optional[Catalog]:
+        """Catalog in memory or on disk, without any network call. May be stale."""
+        catalog = self._catalogs.get(client_id)
+        if catalog is None:
+            catalog = self._load_snapshot(client_id)
+            if catalog is not None:
+                self._catalogs[client_id] = catalog
+        return catalog
+
+    def evict(self, client_id: int):
+        """Drops a client's catalog from memory; the snapshot on disk stays for the next `peek`."""
+        self._catalogs.pop(client_id, None)
+        client = self._clients.pop(client_id, None)
+        if client is not None:
+            try:
+                asyncio.get_running_loop().create_task(client.aclose())
+            except RuntimeError:
+                pass
+
+    def put(self, catalog: Catalog):
+        """Serves `catalog` from memory without writing a snapshot (simulations and local runs)."""
+        self._catalogs[catalog.client_id] = catalog
+
+    async def get(self, client_id: int = DEFAULT_CLIENT_ID) -> Catalog:
+        """Serves from memory; only the very first load of a client waits on the API."""
+        catalog = self.peek(client_id)
+        if catalog is None:
+            return await self.refresh(client_id)
+        if self.is_stale(catalog) and client_id not in self._refreshing:
+            self._refreshing[client_id] = asyncio.get_running_loop().create_task(self._refresh_in_background(client_id))
+        return catalog
+
+    def get_sync(self, client_id: int = DEFAULT_CLIENT_ID, api_key: Optional[str] = None) -> Catalog:
+        """For scripts without an event loop: refreshes in place when the catalog is missing or expired."""
+        catalog = self.peek(client_id)
+        if catalog is None or self.is_stale(catalog):
+            catalog = run_sync(client_id, api_key or self.api_key, lambda client: self._fetch(client, catalog))
+            self._store(catalog)
+        return catalog
+
+    async def refresh(self, client_id: int = DEFAULT_CLIENT_ID) -> Catalog:
+        catalog = await self._fetch(self._client(client_id), self._catalogs.get(client_id))
+        await asyncio.to_thread(self._store, catalog)
+        return catalog
+
+    async def _refresh_in_background(self, client_id: int):
+        try:
+            await self.refresh(client_id)
+        except Exception:
+            metrics.increment("foodticket.catalog.refresh_failed")
+            logger.exception(f"Catalog refresh for client {client_id} failed, serving the previous copy")
+        finally:
+            self._refreshing.pop(client_id, None)
+
+    async def _fetch(self, client: FoodticketClient, previous: Optional[Catalog]) -> Catalog:
+        started = time.perf_counter()
+        previous_validators = previous.validators if previous else {}
+        products, products_validators = await self._fetch_endpoint(client, "/products", previous_validators.get("products", {}), _parse_products)
+        extras, extras_validators = await self._fetch_endpoint(client, "/extras", previous_validators.get("extras", {}), _parse_extras)
+
+        catalog = Catalog(
+            client_id=client.client_id,
+            products=products if products is not None else previous.products,
+            extras=extras if extras is not None else previous.extras,
+            fetched_at=time.time(),
+            validators={"products": products_validators, "extras": extras_validators},
+        )
+        metrics.observe("foodticket.catalog.refresh_ms", (time.perf_counter() - started) * 1000)
+        logger.info(
+            f"Catalog for client {client.client_id} refreshed: products {'changed' if products is not None else 'unchanged'}, "
+            f"extras {'changed' if extras is not None else 'unchanged'}"
+        )
+        return catalog
+
+    async def _fetch_endpoint(self, client: FoodticketClient, path: str, validators: dict, parse_rows):
+        """Returns (parsed, validators); parsed is None when the previous parse can be reused."""
+        async with client.stream(path, headers=conditional_headers(validators)) as response:
+            if response.status_code == 304:
+                metrics.increment("foodticket.catalog.not_modified")
+                return None, validators
+            if response.status_code != 200:
+                raise FoodticketAPIError(response.status_code)
+            digest = hashlib.sha1()
+            parsed = await parse_rows(aiter_records(response.aiter_bytes(CHUNK_SIZE), "row", on_chunk=digest.update))
+            new_validators = {**response_validators(response), "sha1": digest.hexdigest()}
+        if new_validators["sha1"] == validators.get("sha1"):
+            metrics.increment("foodticket.catalog.unchanged")
+            return None, new_validators
+        return parsed, new_validators
+
+    def _store(self, catalog: Catalog):
+        self._catalogs[catalog.client_id] = catalog
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Unique temp file + rename: concurrent writers never leave a half written snapshot
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f".catalog_{catalog.client_id}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(catalog.to_dict(), f)
+            os.replace(tmp_path, self._path(catalog.client_id))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _load_snapshot(self, client_id: int) -> Optional[Catalog]:
+        path = self._path(client_id)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return Catalog.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable catalog snapshot {path}: {e}")
+            return None
+
+
+catalog_cache = CatalogCache()
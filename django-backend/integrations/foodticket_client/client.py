@@ -0,0 +1,279 @@
+"""
+Async Foodticket API client.
+
+One `httpx.AsyncClient` per `FoodticketClient` keeps a pool of keep-alive connections, so lookups
+made during a call do not block the event loop and do not pay a TLS handshake each time.
+Idempotent GETs are retried on connection errors and 5xx responses and hedged when the first attempt
+is slow. Waiting for a response is capped by the caller's latency budget (`common.utils.resilience`),
+and after repeated upstream failures (connection errors, timeouts of full-length requests, 5xx) the
+shared circuit breaker fails requests fast with `CircuitOpenError` until a probe succeeds. A request
+cut short by its caller's budget raises `BudgetExceeded` and does not count as a failure. Responses are parsed while they stream in (`xml_stream`), lookups stop
+reading as soon as they found their record. Orders are submitted by the order outbox
+(`voice_assistant.services.order_outbox`), never on a call's critical path.
+
+Use the process-wide `foodticket_client` from async code. The sync functions in `postcode_check`,
+`menu_pull` and `order_info_retrieve` are thin wrappers for scripts.
+"""
+
+import asyncio
+import logging
+import os
+import xml.etree.ElementTree as ET
+from contextlib import aclosing, asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
+
+import httpx
+from django.conf import ENVIRONMENT_VARIABLE, settings
+
+from common.utils.resilience import BudgetExceeded, CircuitBreaker, budget_timeout, hedged, remaining_budget
+from integrations.foodticket_client.extras_index import ExtrasIndex, ExtrasIndexBuilder
+from integrations.foodticket_client.parsers import flat_order_lines, product_from_row, zipcode_from_row, zipcode_not_found
+from integrations.foodticket_client.xml_stream import CHUNK_SIZE, aiter_records
+
+logger = logging.getLogger(__name__)
+
+
+def foodticket_setting(name: str, default: str, cast: Callable[[str], Any] = str):
+    """
+    The Foodticket setting `name` from the Django settings; without configured settings (the sync script
+    wrappers, fixtures, benchmarks) from the environment variable of the same name, with `default`.
+    """
+    if settings.configured or os.environ.get(ENVIRONMENT_VARIABLE):
+        value = getattr(settings, name, None)
+        if value is not None:
+            return value
+    return cast(os.getenv(name, default))
+
+
+DEFAULT_CLIENT_ID = foodticket_setting("FOODTICKET_CLIENT_ID", "3517", int)
+DEFAULT_API_KEY = foodticket_setting("FOODTICKET_API_KEY", "564ff05d0a9c61d030431330952a56c0")
+DEFAULT_PRODUCT_ID = "2649158"
+
+REQUEST_TIMEOUT_SECONDS = 5.0
+CONNECT_TIMEOUT_SECONDS = 2.0
+TIMEOUT = httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS)
+LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0)
+MAX_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 0.2
+# A second attempt starts when the first has no response headers after this long
+HEDGE_AFTER_SECONDS = foodticket_setting("FOODTICKET_HEDGE_AFTER_SECONDS", "0.4", float)
+BREAKER_FAILURE_THRESHOLD = foodticket_setting("FOODTICKET_BREAKER_FAILURES", "5", int)
+BREAKER_RESET_SECONDS = foodticket_setting("FOODTICKET_BREAKER_RESET_SECONDS", "30", float)
+
+# Shared by every client, they all talk to the same upstream
+foodticket_breaker = CircuitBreaker("foodticket", BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+
+
+class FoodticketAPIError(Exception):
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        super().__init__(f"API request failed. Status code: {status_code}")
+
+
+class FoodticketClient:
+    def __init__(
+        self,
+        client_id: int = DEFAULT_CLIENT_ID,
+        api_key: str = DEFAULT_API_KEY,
+        base_url: Optional[str] = None,
+        breaker: CircuitBreaker = foodticket_breaker,
+    ):
+        self.client_id = client_id
+        self.api_key = api_key
+        self._base_url = base_url
+        self.breaker = breaker
+        self._http = None
+
+    @property
+    def base_url(self) -> str:
+        # Read on first use, so a changed setting (tests, the stand-in server) applies to the shared clients
+        return self._base_url or foodticket_setting("FOODTICKET_BASE_URL", "https://api.foodticket.net/1")
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        # Created lazily so the pool is bound to the event loop that uses it
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"X-OrderBuddy-Reseller-Key": self.api_key},
+                timeout=TIMEOUT,
+                limits=LIMITS,
+            )
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _send(self, path: str, params: dict, headers: Optional[dict], timeout: float) -> httpx.Response:
+        request_timeout = TIMEOUT if timeout >= REQUEST_TIMEOUT_SECONDS else httpx.Timeout(timeout, connect=min(CONNECT_TIMEOUT_SECONDS, timeout))
+        request = self.http.build_request("GET", path, params=params, headers=headers, timeout=request_timeout)
+        return await self.http.send(request, stream=True)
+
+    async def _open(self, path: str, params: dict, headers: Optional[dict]) -> httpx.Response:
+        for attempt in range(MAX_RETRIES + 1):
+            timeout = budget_timeout(REQUEST_TIMEOUT_SECONDS)
+            try:
+                response = await asyncio.wait_for(
+                    hedged(lambda: self._send(path, params, headers, timeout), HEDGE_AFTER_SECONDS, discard=lambda r: r.aclose(), name="foodticket"),
+                    timeout,
+                )
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                if attempt == MAX_RETRIES or remaining_budget() == 0:
+                    if timeout < REQUEST_TIMEOUT_SECONDS and isinstance(e, (httpx.TimeoutException, asyncio.TimeoutError)):
+                        # Cut short by the caller's budget, says nothing about the upstream
+                        raise BudgetExceeded(f"Foodticket GET {path} exceeded the latency budget") from e
+                    raise
+                logger.warning(f"Foodticket GET {path} failed ({e!r}), retrying")
+            else:
+                if response.status_code < 500:
+                    return response
+                await response.aclose()
+                if attempt == MAX_RETRIES:
+                    raise FoodticketAPIError(response.status_code)
+                logger.warning(f"Foodticket GET {path} returned {response.status_code}, retrying")
+            await asyncio.sleep(min(RETRY_BACKOFF_SECONDS * 2**attempt, remaining_budget() or RETRY_BACKOFF_SECONDS * 2**attempt))
+
+    @asynccontextmanager
+    async def stream(self, path: str, headers: Optional[dict] = None, **params) -> AsyncIterator[httpx.Response]:
+        """
+        Opens a streamed GET. Connection errors, timeouts and 5xx are retried before the body is read;
+        raises `CircuitOpenError` without a request while the circuit is open.
+        """
+        self.breaker.check()
+        try:
+            response = await self._open(path, {"client_id": self.client_id, **params}, headers)
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception as e:
+            if is_upstream_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.release()
+            raise
+        self.breaker.record_success()
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    async def get(self, path: str, **params) -> bytes:
+        async with self.stream(path, **params) as response:
+            if response.status_code != 200:
+                raise FoodticketAPIError(response.status_code)
+            return await response.aread()
+
+    async def records(self, path: str, tag: str, **params) -> AsyncIterator[ET.Element]:
+        """Parsed `<tag>` records of a response, see `xml_stream`. Wrap in `aclosing` when stopping early."""
+        async with self.stream(path, **params) as response:
+            if response.status_code != 200:
+                raise FoodticketAPIError(response.status_code)
+            async for record in aiter_records(response.aiter_bytes(CHUNK_SIZE), tag):
+                yield record
+
+    async def fetch_zipcodes(self) -> List[Dict]:
+        async with aclosing(self.records("/zipcodes", "row")) as rows:
+            return [zipcode_from_row(row) async for row in rows]
+
+    async def get_zipcode_info(self, postcode: str) -> Union[Dict, str]:
+        async with aclosing(self.records("/zipcodes", "row")) as rows:
+            async for row in rows:
+                if row.findtext("start") == postcode[:4]:
+                    return zipcode_from_row(row)
+        return zipcode_not_found(postcode)
+
+    async def fetch_products(self) -> List[Dict]:
+        async with aclosing(self.records("/products", "row")) as rows:
+            return [product_from_row(row) async for row in rows]
+
+    async def fetch_extras_index(self) -> ExtrasIndex:
+        builder = ExtrasIndexBuilder()
+        async with aclosing(self.records("/extras", "row")) as rows:
+            async for row in rows:
+                builder.add_row(row)
+        return builder.build()
+
+    async def fetch_extras_info(self, product_id: str = DEFAULT_PRODUCT_ID) -> Dict[str, List[str]]:
+        extras = (await self.fetch_extras_index()).for_product(product_id)
+        return {group: list(options) for group, options in extras.items()}
+
+    async def submit_order(self, order: dict, idempotency_key: str) -> str:
+        """
+        POSTs an order and returns Foodticket's order id ("" when the response has none). Not retried
+        here: the order outbox retries with the same Idempotency-Key, so a repeat does not create a
+        second order. 5xx and connection errors count towards the circuit breaker.
+        """
+        self.breaker.check()
+        try:
+            response = await self.http.post(
+                "/orders", params={"client_id": self.client_id}, json=order, headers={"Idempotency-Key": idempotency_key}
+            )
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except httpx.TransportError:
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            raise FoodticketAPIError(response.status_code)
+        self.breaker.record_success()
+        if response.status_code not in (200, 201):
+            raise FoodticketAPIError(response.status_code)
+        try:
+            return ET.fromstring(response.content).findtext("id") or ""
+        except ET.ParseError:
+            return ""
+
+    async def fetch_flat_orders_by_phone(self, phone: Union[int, str]) -> Union[Dict, str]:
+        """First order line of the caller's latest order; stops reading at the first order with lines."""
+        async with aclosing(self.records("/orders", "order", stel=phone, page=0, perpage=1)) as orders:
+            async for order in orders:
+                lines = flat_order_lines(order)
+                if lines:
+                    return lines[0]
+        return "not found"
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Whether an error counts against the circuit breaker: the upstream failed, not the caller's budget."""
+    if isinstance(error, BudgetExceeded):
+        return False
+    if isinstance(error, FoodticketAPIError):
+        return error.status_code >= 500
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError))
+
+
+def conditional_headers(validators: dict) -> dict:
+    """If-None-Match / If-Modified-Since from the validators of a previous response."""
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def response_validators(response: httpx.Response) -> dict:
+    return {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+
+def run_sync(client_id: int, api_key: str, call):
+    """Runs `call(client)` on a short-lived client, for scripts without an event loop."""
+
+    async def _run():
+        async with FoodticketClient(client_id, api_key) as client:
+            return await call(client)
+
+    return asyncio.run(_run())
+
+
+foodticket_client = FoodticketClient()
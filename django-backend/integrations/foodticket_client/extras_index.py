@@ -0,0 +1,113 @@
+"""
+Extras (toppings, sizes, drinks, edges) per product, built in one streaming pass over the extras XML.
+
+Each `<row>` of the extras response is an extra group ("Toppings", "Bodem", ...) listing the
+product ids it applies to and its options. The index keeps every group once and gives each product
+a read-only `{group_name: (options, ...)}` mapping; products with the same groups share one mapping.
+"""
+
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+from integrations.foodticket_client.xml_stream import iter_content_records
+
+EMPTY_EXTRAS: Mapping[str, Tuple[str, ...]] = MappingProxyType({})
+
+
+def to_cents(price: Optional[str]) -> int:
+    try:
+        return round(float(price) * 100)
+    except (TypeError, ValueError):
+        return 0
+
+
+@dataclass(frozen=True)
+class ExtraGroup:
+    id: str
+    name: str
+    mandatory: bool
+    options: Tuple[str, ...]
+    prices: Tuple[int, ...]  # cents, same order as options
+    option_ids: Tuple[str, ...]  # Foodticket extra ids, same order as options (what an order line refers to)
+
+    def price_of(self, option: str) -> int:
+        return self.prices[self.options.index(option)] if option in self.options else 0
+
+
+class ExtrasIndex:
+    def __init__(self, groups: Dict[str, ExtraGroup], product_groups: Dict[str, Tuple[str, ...]]):
+        self.groups = groups
+        self.product_groups = product_groups
+        shared = {}
+        self._by_product: Dict[str, Mapping[str, Tuple[str, ...]]] = {}
+        for product_id, group_ids in product_groups.items():
+            extras = shared.get(group_ids)
+            if extras is None:
+                extras = shared[group_ids] = MappingProxyType({groups[group_id].name: groups[group_id].options for group_id in group_ids})
+            self._by_product[product_id] = extras
+
+    def for_product(self, product_id: str) -> Mapping[str, Tuple[str, ...]]:
+        return self._by_product.get(str(product_id), EMPTY_EXTRAS)
+
+    def groups_for_product(self, product_id: str) -> Tuple[ExtraGroup, ...]:
+        return tuple(self.groups[group_id] for group_id in self.product_groups.get(str(product_id), ()))
+
+    def to_dict(self) -> dict:
+        return {
+            "groups": {
+                group.id: {
+                    "name": group.name,
+                    "mandatory": group.mandatory,
+                    "options": list(group.options),
+                    "prices": list(group.prices),
+                    "option_ids": list(group.option_ids),
+                }
+                for group in self.groups.values()
+            },
+            "products": {product_id: list(group_ids) for product_id, group_ids in self.product_groups.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ExtrasIndex":
+        groups = {
+            group_id: ExtraGroup(group_id, group["name"], group["mandatory"], tuple(group["options"]), tuple(group["prices"]), tuple(group["option_ids"]))
+            for group_id, group in data["groups"].items()
+        }
+        return cls(groups, {product_id: tuple(group_ids) for product_id, group_ids in data["products"].items()})
+
+
+class ExtrasIndexBuilder:
+    """Collects extra groups one `<row>` at a time (see `xml_stream`)."""
+
+    def __init__(self):
+        self.groups: Dict[str, ExtraGroup] = {}
+        self.product_groups: Dict[str, list] = {}
+
+    def add_row(self, row: ET.Element):
+        group_id = row.findtext("id")
+        options, prices, option_ids = [], [], []
+        items = row.find("items")
+        for item in items.findall("item") if items is not None else ():
+            options.append(item.findtext("title"))
+            prices.append(to_cents(item.findtext("price")))
+            option_ids.append(item.findtext("id") or "")
+        if not group_id or not options:
+            return
+        self.groups[group_id] = ExtraGroup(
+            group_id, row.findtext("title") or "", row.findtext("mandatory") == "1", tuple(options), tuple(prices), tuple(option_ids)
+        )
+        for product_id in (row.findtext("product_ids") or "").split(","):
+            if product_id.strip():
+                self.product_groups.setdefault(product_id.strip(), []).append(group_id)
+
+    def build(self) -> ExtrasIndex:
+        return ExtrasIndex(self.groups, {product_id: tuple(group_ids) for product_id, group_ids in self.product_groups.items()})
+
+
+def build_extras_index(content: bytes) -> ExtrasIndex:
+    builder = ExtrasIndexBuilder()
+    for row in iter_content_records(content, "row"):
+        builder.add_row(row)
+    return builder.build()
@@ -0,0 +1,122 @@
+"""
+Synthetic Foodticket API responses for benchmarks and local runs.
+
+The XML has the same record layout the parsers read (`<row>` for zipcodes, products and extras,
+`<order>` with `<orderline>` children for orders), with sizes far beyond a real restaurant's.
+
+Usage (from django-backend/):
+    python -m integrations.foodticket_client.fixtures --out /tmp/foodticket_fixtures --scale 10
+"""
+
+import argparse
+import random
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+PRODUCT_NAMES = [
+    "Margherita Pizza", "Pepperoni Pizza", "Funghi Pizza", "Hawaii Pizza", "Tonno Pizza", "Boeren Pizza",
+    "Shoarma Pizza", "Quattro Stagioni Pizza", "Formaggi Pizza", "BBQ Kip Pizza", "Kip Saté Pizza", "Basis Pizza",
+]
+EXTRA_GROUPS = {
+    "Toppings": ["Ham", "Salami", "Champignons", "Olijven", "Paprika", "Ui", "Ananas", "Extra kaas", "Jalapeños", "Kip"],
+    "Bodem": ["Medium 30cm", "Medium Dunne Bodem 30cm", "Large 35cm", "Glutenvrij 30cm"],
+    "Wil je er drankje of taartje bij?": ["Coca-Cola", "Fanta", "Spa Blauw", "Cheesecake", "Brownie"],
+    "Heerlijke zaadjes voor de rand van je pizza": ["Sesam", "Maanzaad", "Geen"],
+}
+
+
+def _element(tag: str, fields: dict, children: str = "") -> str:
+    body = "".join(f"<{key}>{escape(str(value))}</{key}>" for key, value in fields.items())
+    return f"<{tag}>{body}{children}</{tag}>"
+
+
+def zipcodes_xml(count: int = 500, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    rows = (
+        _element(
+            "row",
+            {"start": 1000 + i, "costs": f"{rng.choice([0, 1.5, 2.5, 3.5]):.2f}", "min": rng.choice([10, 15, 20, 25]),
+             "available": int(rng.random() < 0.9), "free": int(rng.random() < 0.2)},
+        )
+        for i in range(count)
+    )
+    return f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><rows>{''.join(rows)}</rows>".encode()
+
+
+def products_xml(count: int = 200, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        name = PRODUCT_NAMES[i % len(PRODUCT_NAMES)]
+        title = name if i < len(PRODUCT_NAMES) else f"{name} {i}"
+        rows.append(
+            _element(
+                "row",
+                {"id": 2649158 + i, "title": title, "description": f"Tomatensaus, mozzarella en {name.lower()}",
+                 "description_extras": "Toppings, Bodem", "price": f"{rng.uniform(8, 18):.2f}", "delivery": 1, "vegan": int(rng.random() < 0.1)},
+            )
+        )
+    return f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><rows>{''.join(rows)}</rows>".encode()
+
+
+def extras_xml(product_count: int = 200, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    product_ids = ",".join(str(2649158 + i) for i in range(product_count))
+    rows = []
+    for group_id, (group, options) in enumerate(EXTRA_GROUPS.items(), start=1):
+        items = "".join(
+            _element("item", {"id": group_id * 100 + i, "pack_costs": "0.00", "prio": i, "price": f"{rng.choice([0, 0.5, 1, 1.5, 2.5]):.2f}", "title": option})
+            for i, option in enumerate(options)
+        )
+        rows.append(
+            _element(
+                "row",
+                {"product_ids": product_ids, "mandatory": int(group == "Bodem"), "id": group_id, "items_str": ", ".join(options),
+                 "products_n": product_count, "title": group, "selectable": len(options), "categories_n": 1},
+                f"<items>{items}</items>",
+            )
+        )
+    return f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><rows>{''.join(rows)}</rows>".encode()
+
+
+def orders_xml(count: int = 1000, lines_per_order: int = 3, phone: str = "31615373364", seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    orders = []
+    for i in range(count):
+        lines = "".join(
+            _element("orderline", {"title": rng.choice(PRODUCT_NAMES), "category_title": "Pizza's", "extras": "Large 35cm, Extra kaas", "price": f"{rng.uniform(8, 18):.2f}"})
+            for _ in range(lines_per_order)
+        )
+        orders.append(
+            _element(
+                "order",
+                {"id": 900000 + i, "client_id": 3517, "date": f"2025-06-{1 + i % 28:02d} 18:{i % 60:02d}:00", "firstname": "Test",
+                 "lastname": f"Caller {i}", "tel": phone, "email": "", "address": "Damrak 1, 1012LG Amsterdam",
+                 "status": rng.choice(["new", "accepted", "in_oven", "on_the_way", "delivered"]), "tip": "0.00",
+                 "delivery_costs": "2.50", "total": f"{rng.uniform(15, 60):.2f}"},
+                lines,
+            )
+        )
+    return f"<?xml version=\"1.0\" encoding=\"UTF-8\"?><orders>{''.join(orders)}</orders>".encode()
+
+
+def write_fixtures(directory: Path, scale: int = 1) -> dict:
+    directory.mkdir(parents=True, exist_ok=True)
+    fixtures = {
+        "zipcodes.xml": zipcodes_xml(500 * scale),
+        "products.xml": products_xml(200 * scale),
+        "extras.xml": extras_xml(200 * scale),
+        "orders.xml": orders_xml(1000 * scale),
+    }
+    for name, content in fixtures.items():
+        (directory / name).write_bytes(content)
+    return {name: len(content) for name, content in fixtures.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic Foodticket XML responses")
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--scale", type=int, default=1)
+    options = parser.parse_args()
+    for name, size in write_fixtures(options.out, options.scale).items():
+        print(f"{name}: {size / 1024:.0f} KiB")
@@ -0,0 +1,66 @@
+"""
+Parsers for Foodticket API XML records.
+
+Shared by `FoodticketClient` and the catalog cache so both return the same structures. Each function
+reads one record yielded by `xml_stream`.
+"""
+
+import xml.etree.ElementTree as ET
+from typing import Dict, List
+
+
+def zipcode_from_row(row: ET.Element) -> Dict:
+    return {
+        "postcode": row.findtext("start"),
+        "costs": row.findtext("costs"),
+        "min_order": row.findtext("min"),
+        "available": row.findtext("available") == "1",
+        "free_delivery": row.findtext("free") == "1",
+    }
+
+
+def product_from_row(row: ET.Element) -> Dict:
+    return {
+        "id": row.findtext("id"),
+        "title": row.findtext("title"),
+        "description": row.findtext("description"),
+        "description_extras": row.findtext("description_extras"),
+        "price": row.findtext("price"),
+        "delivery": row.findtext("delivery"),
+        "vegan": row.findtext("vegan"),
+    }
+
+
+def flat_order_lines(order: ET.Element) -> List[Dict]:
+    """One dict per order line, with the order fields repeated on each line."""
+    date = order.findtext("date") or ""
+    base_order = {
+        "order_id": order.findtext("id"),
+        "client_id": order.findtext("client_id"),
+        "order_date": date.split(" ")[0],
+        "order_time": date.split(" ")[1] if " " in date else "",
+        "firstname": order.findtext("firstname") or "",
+        "lastname": order.findtext("lastname") or "",
+        "phone": order.findtext("tel") or "",
+        "email": order.findtext("email") or "",
+        "address": order.findtext("address") or "",
+        "status": order.findtext("status"),
+        "tip": order.findtext("tip"),
+        "delivery_cost": order.findtext("delivery_costs"),
+        "total_price": order.findtext("total"),
+    }
+    return [
+        {
+            **base_order,
+            "product_title": orderline.findtext("title"),
+            "product_category": orderline.findtext("category_title"),
+            "product_extras": orderline.findtext("extras"),
+            "product_price": orderline.findtext("price"),
+        }
+        for orderline in order.findall("orderline")
+    ]
+
+
+def zipcode_not_found(postcode: str) -> str:
+    return f"❌ Postcode {postcode} is out of our delivery options."
+
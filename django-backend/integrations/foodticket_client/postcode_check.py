@@ -1,32 +1,11 @@
-import requests
-import xml.etree.ElementTree as ET
-import io
 from typing import Dict, Union
 
+from integrations.foodticket_client.client import DEFAULT_API_KEY, DEFAULT_CLIENT_ID, run_sync
 
-def get_zipcode_info(postcode: str, client_id: int = 3517, api_key: str = "564ff05d0a9c61d030431330952a56c0") -> Union[Dict, str]:
-    url = f"https://api.foodticket.net/1/zipcodes?client_id={client_id}"
-    headers = {"X-OrderBuddy-Reseller-Key": api_key}
 
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        raise Exception(f"API request failed. Status code: {response.status_code}")
-
-    xml_stream = io.BytesIO(response.content)
-    root = ET.parse(xml_stream).getroot()
-
-    for row in root.findall("row"):
-        zip_code = row.findtext("start")
-        if zip_code == postcode[:4]:
-            return {
-                "postcode": zip_code,
-                "costs": row.findtext("costs"),
-                "min_order": row.findtext("min"),
-                "available": row.findtext("available") == "1",
-                "free_delivery": row.findtext("free") == "1",
-            }
-
-    return f"❌ Postcode {postcode} is out of our delivery options."
+def get_zipcode_info(postcode: str, client_id: int = DEFAULT_CLIENT_ID, api_key: str = DEFAULT_API_KEY) -> Union[Dict, str]:
+    """Sync wrapper for scripts; async code uses `foodticket_client.get_zipcode_info`."""
+    return run_sync(client_id, api_key, lambda client: client.get_zipcode_info(postcode))
 
 
 # Example usage
@@ -0,0 +1,182 @@
+"""
+Order quotes computed locally from the cached catalog and the caller's delivery area.
+
+A `PriceBook` is built once per catalog: product titles resolve to the product dict, and the
+extras of each product are flattened into a size table and an option table the first time the
+product is quoted. A quote is then a handful of dict lookups, so the FSM can state the total in
+the same turn the sizes are given. All amounts are integer cents.
+
+Rules (as applied by Foodticket):
+    - unit price = product price + the size ("Bodem") option + every chosen topping / extra option
+    - a line with a size or topping the product does not come in is not priced (never a silent 0)
+    - delivery costs come from the caller's zipcode, zero when the zipcode has free delivery
+    - delivery orders whose subtotal is below the zipcode's minimum are not accepted
+
+A priced line also carries the Foodticket ids of the product and of every chosen option, which is
+what an order submitted to Foodticket refers to (see `voice_assistant.services.order_outbox`).
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from integrations.foodticket_client.extras_index import ExtrasIndex, to_cents
+from integrations.foodticket_client.product_matcher import matcher_for_catalog, normalize
+
+logger = logging.getLogger(__name__)
+
+SIZE_GROUP = "Bodem"
+
+_CENTIMETERS = re.compile(r"(\d+)\s*cm")
+
+
+def size_key(size: str) -> Optional[Tuple[str, bool]]:
+    """"30cm (Dunne Bodem)" and "Medium Dunne Bodem 30cm" -> ("30", True)."""
+    match = _CENTIMETERS.search(size.lower())
+    return (match.group(1), "dun" in size.lower()) if match else None
+
+
+def format_euros(cents: int, decimal_separator: str = ".") -> str:
+    return f"{cents // 100}{decimal_separator}{cents % 100:02d}"
+
+
+@dataclass(frozen=True)
+class OrderLine:
+    product_name: str
+    quantity: int = 1
+    size: Optional[str] = None
+    toppings: Tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class PricedLine:
+    line: OrderLine
+    title: str
+    unit_cents: int
+    product_id: str = ""
+    # Foodticket extra ids of the size and the toppings, in that order
+    option_ids: Tuple[str, ...] = ()
+
+    @property
+    def total_cents(self) -> int:
+        return self.unit_cents * self.line.quantity
+
+
+@dataclass(frozen=True)
+class Quote:
+    lines: Tuple[PricedLine, ...]
+    # Lines that could not be priced (product not in the catalog, or a size / topping it does not come in);
+    # a quote with any of them has no reliable total
+    unpriced: Tuple[str, ...]
+    subtotal_cents: int
+    delivery_cents: int = 0
+    min_order_cents: int = 0
+
+    @property
+    def total_cents(self) -> int:
+        return self.subtotal_cents + self.delivery_cents
+
+    @property
+    def complete(self) -> bool:
+        return not self.unpriced
+
+    @property
+    def below_minimum(self) -> bool:
+        return self.complete and self.subtotal_cents < self.min_order_cents
+
+
+@dataclass(frozen=True)
+class _ProductPrices:
+    base_cents: int
+    # (option id, cents) per size key / normalized option name
+    sizes: Dict[Tuple[str, bool], Tuple[str, int]]
+    options: Dict[str, Tuple[str, int]]
+
+
+class PriceBook:
+    def __init__(self, products: List[Dict], extras: ExtrasIndex, matcher=None):
+        self.extras = extras
+        self._by_title = {normalize(product["title"]): product for product in products if product.get("title")}
+        # Fallback for names that are not exact catalog titles (see `product_matcher`)
+        self._matcher = matcher
+        self._prices: Dict[str, _ProductPrices] = {}
+
+    def resolve(self, product_name: str) -> Optional[Dict]:
+        product = self._by_title.get(normalize(product_name))
+        if product is None and self._matcher is not None:
+            match = self._matcher.best(product_name)
+            product = match.product if match is not None else None
+        return product
+
+    def _product_prices(self, product: Dict) -> _ProductPrices:
+        prices = self._prices.get(product["id"])
+        if prices is None:
+            sizes, options = {}, {}
+            for group in self.extras.groups_for_product(product["id"]):
+                for option, cents, option_id in zip(group.options, group.prices, group.option_ids):
+                    key = size_key(option) if group.name == SIZE_GROUP else None
+                    # Options are in the restaurant's priority order, the first one of a kind wins
+                    if key is not None:
+                        sizes.setdefault(key, (option_id, cents))
+                    else:
+                        options.setdefault(normalize(option), (option_id, cents))
+            prices = self._prices[product["id"]] = _ProductPrices(to_cents(product.get("price")), sizes, options)
+        return prices
+
+    def price_line(self, line: OrderLine) -> Optional[PricedLine]:
+        """None when the product is unknown or the line has a size or topping the product does not come in."""
+        product = self.resolve(line.product_name)
+        if product is None:
+            return None
+        prices = self._product_prices(product)
+        chosen = []
+        if line.size:
+            size = prices.sizes.get(size_key(line.size))
+            if size is None:
+                logger.warning(f"{product['title']} does not come in size {line.size!r}, line not priced")
+                return None
+            chosen.append(size)
+        for topping in line.toppings:
+            option = prices.options.get(normalize(topping))
+            if option is None:
+                logger.warning(f"{product['title']} has no topping {topping!r}, line not priced")
+                return None
+            chosen.append(option)
+        unit = prices.base_cents + sum(cents for _, cents in chosen)
+        return PricedLine(line, product["title"], unit, str(product["id"]), tuple(option_id for option_id, _ in chosen))
+
+    def quote(self, lines: Iterable[OrderLine], delivery_area: Optional[Dict] = None) -> Quote:
+        """`delivery_area` is the caller's zipcode record (`parsers.zipcode_from_row`), None for pickup."""
+        priced, unpriced = [], []
+        for line in lines:
+            priced_line = self.price_line(line)
+            if priced_line is None:
+                unpriced.append(f"{line.product_name} {line.size}" if line.size else line.product_name)
+            else:
+                priced.append(priced_line)
+        subtotal = sum(priced_line.total_cents for priced_line in priced)
+        delivery_cents = min_order_cents = 0
+        if delivery_area is not None:
+            delivery_cents = 0 if delivery_area.get("free_delivery") else to_cents(delivery_area.get("costs"))
+            min_order_cents = to_cents(delivery_area.get("min_order"))
+        return Quote(tuple(priced), tuple(unpriced), subtotal, delivery_cents, min_order_cents)
+
+
+_price_books: Dict[int, tuple] = {}
+
+
+def price_book_for_catalog(catalog) -> PriceBook:
+    """Price book for a `catalog_cache.Catalog`, rebuilt only when the products or extras response changed."""
+    version = tuple(catalog.validators.get(endpoint, {}).get("sha1") for endpoint in ("products", "extras"))
+    if not all(version):
+        version = (id(catalog.products), id(catalog.extras))
+    cached = _price_books.get(catalog.client_id)
+    if cached is None or cached[0] != version:
+        cached = _price_books[catalog.client_id] = (version, PriceBook(catalog.products, catalog.extras, matcher_for_catalog(catalog)))
+        logger.info(f"Price book for client {catalog.client_id} built with {len(catalog.products)} products")
+    return cached[1]
+
+
+def evict_price_book(client_id: int):
+    _price_books.pop(client_id, None)
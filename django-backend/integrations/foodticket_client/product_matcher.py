@@ -0,0 +1,208 @@
+"""
+Product name matching for transcribed caller speech.
+
+Callers say Italian and Dutch product names with Turkish, Dutch or English pronunciation and
+the transcription spells them the way they sounded ("margarita", "kuatro formacı", "funghi").
+`ProductMatcher` indexes every product title and its aliases by character trigrams and by a
+phonetic key per word, so a lookup only scores products that share a trigram or a key with the
+query. Scores combine trigram similarity and phonetic word overlap, both 0..1.
+
+Accuracy on real calls has not been measured: the aliases were written against the hand-written
+cases of `benchmarks.product_matcher_bench`, which therefore only check for regressions.
+"""
+
+import logging
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MIN_SCORE = 0.5
+TRIGRAM_WEIGHT = 0.5
+PHONETIC_WEIGHT = 0.5
+
+# Extra names callers use for a product, by catalog title. Only titles present in the catalog are indexed.
+ALIASES = {
+    "Margherita Pizza": ["margarita", "margareta"],
+    "Vegan Margherita Pizza": ["vegan margarita", "vegetarian margherita"],
+    "Formaggi Pizza": ["four cheese", "cheese pizza", "dort peynirli", "peynirli pizza", "vier kazen", "kaas pizza"],
+    "Quattro Stagioni Pizza": ["four seasons", "dort mevsim", "vier seizoenen"],
+    "Funghi Pizza": ["mushroom pizza", "mantarli pizza", "champignon pizza"],
+    "Prosciutto e Funghi Pizza": ["ham and mushroom", "ham champignon", "jambon mantar"],
+    "Tonno Pizza": ["tuna pizza", "ton balikli", "tonijn pizza"],
+    "Hawaii Pizza": ["hawaiian", "ananasli pizza", "ananas pizza"],
+    "Kip Saté Pizza": ["chicken satay", "tavuk satay", "kip satay"],
+    "Hete Kip Pizza": ["hot chicken", "spicy chicken", "acili tavuk"],
+    "BBQ Kip Pizza": ["bbq chicken", "barbecue chicken", "barbeku tavuk"],
+    "Just Chicken Pizza": ["chicken pizza", "tavuklu pizza", "kip pizza"],
+    "Boeren Pizza": ["farmer pizza", "farmers pizza", "boer pizza"],
+    "Triple Meat Pizza": ["three meat", "uc etli"],
+    "Shoarma Pizza": ["shawarma", "doner pizza", "kebab pizza"],
+    "Basis Pizza": ["basic pizza", "plain pizza", "sade pizza"],
+}
+
+# Turkish letters are folded to the spelling an English/Dutch transcript would use
+_TURKISH_FOLD = {"ı": "i", "İ": "i", "ş": "sh", "Ş": "sh", "ç": "ch", "Ç": "ch", "ğ": "", "Ğ": ""}
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# Applied in order to a normalized word; spellings that sound alike across the three languages converge
+_PHONETIC_RULES = [
+    (re.compile(r"sch"), "s"),
+    (re.compile(r"sh"), "s"),
+    (re.compile(r"ch"), "k"),
+    (re.compile(r"gh"), "g"),
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"th"), "t"),
+    (re.compile(r"ck"), "k"),
+    (re.compile(r"qu"), "k"),
+    (re.compile(r"kw"), "k"),
+    (re.compile(r"ij"), "i"),
+    (re.compile(r"x"), "ks"),
+    (re.compile(r"c+(?=[eiy])"), "s"),
+    (re.compile(r"g+(?=[ei])"), "s"),  # Italian "ggi", "gi" and Turkish "c" sound alike
+    (re.compile(r"c"), "k"),
+    (re.compile(r"z"), "s"),
+    (re.compile(r"w"), "v"),
+    (re.compile(r"h"), ""),
+]
+# Plural and case endings a generic word gets in English, Dutch and Turkish ("pizzas", "pizzasi", "pizzalar")
+_INFLECTIONS = {"", "s", "si", "yi", "ya", "lar", "ler", "lari", "nin"}
+_VOICELESS = str.maketrans("bdgv", "ptkf")
+_VOWELS = re.compile(r"[aeiouyj]")
+_REPEATS = re.compile(r"(.)\1+")
+
+
+def normalize(text: str) -> str:
+    text = "".join(_TURKISH_FOLD.get(char, char) for char in text)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def phonetic_key(word: str) -> str:
+    """First sound plus the consonant skeleton: "margherita", "margarita" -> "mrkrt"."""
+    for pattern, replacement in _PHONETIC_RULES:
+        word = pattern.sub(replacement, word)
+    if not word:
+        return ""
+    word = word.translate(_VOICELESS)
+    return _REPEATS.sub(r"\1", word[0] + _VOWELS.sub("", word[1:]))
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: set, b: set) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 0.0
+
+
+@dataclass(frozen=True)
+class ProductMatch:
+    product: Dict
+    title: str
+    score: float
+    matched_name: str
+
+
+@dataclass(frozen=True)
+class _Entry:
+    product_index: int
+    name: str
+    trigrams: frozenset
+    keys: frozenset
+
+
+class ProductMatcher:
+    def __init__(self, products: List[Dict], aliases: Optional[Dict[str, List[str]]] = None):
+        self.products = [product for product in products if product.get("title")]
+        aliases = ALIASES if aliases is None else aliases
+
+        # Words in most titles ("pizza") say nothing about which product was meant
+        document_frequency = defaultdict(int)
+        for product in self.products:
+            for word in set(normalize(product["title"]).split()):
+                document_frequency[word] += 1
+        self.generic_words = {word for word, count in document_frequency.items() if count > max(1, len(self.products) / 2)}
+
+        self.entries: List[_Entry] = []
+        self._by_trigram = defaultdict(list)
+        self._by_key = defaultdict(list)
+        for index, product in enumerate(self.products):
+            for name in [product["title"], *aliases.get(product["title"], [])]:
+                self._add(index, name)
+
+    def _strip_generic(self, word: str) -> str:
+        # Inflections ("pizzas", "pizzasi") and compounds ("boerenpizza") carry the generic word too
+        for generic in self.generic_words:
+            if word.startswith(generic) and word[len(generic) :] in _INFLECTIONS:
+                return ""
+            if word.endswith(generic) and len(word) > len(generic) + 2:
+                return word[: -len(generic)]
+        return word
+
+    def _features(self, text: str):
+        words = [word for word in map(self._strip_generic, normalize(text).split()) if word]
+        core = " ".join(words)
+        return core, frozenset(trigrams(core)) if core else frozenset(), frozenset(filter(None, map(phonetic_key, words)))
+
+    def _add(self, product_index: int, name: str):
+        core, grams, keys = self._features(name)
+        if not core:
+            return
+        entry_id = len(self.entries)
+        self.entries.append(_Entry(product_index, name, grams, keys))
+        for gram in grams:
+            self._by_trigram[gram].append(entry_id)
+        for key in keys:
+            self._by_key[key].append(entry_id)
+
+    def match(self, text: str, limit: int = 5, min_score: float = MIN_SCORE) -> List[ProductMatch]:
+        """Ranked candidates (best first, shorter title on ties), one per product."""
+        core, grams, keys = self._features(text)
+        if not core:
+            return []
+        candidates = set()
+        for gram in grams:
+            candidates.update(self._by_trigram.get(gram, ()))
+        for key in keys:
+            candidates.update(self._by_key.get(key, ()))
+
+        best: Dict[int, ProductMatch] = {}
+        for entry_id in candidates:
+            entry = self.entries[entry_id]
+            score = TRIGRAM_WEIGHT * _dice(grams, entry.trigrams) + PHONETIC_WEIGHT * _dice(keys, entry.keys)
+            current = best.get(entry.product_index)
+            if score >= min_score and (current is None or score > current.score):
+                product = self.products[entry.product_index]
+                best[entry.product_index] = ProductMatch(product, product["title"], round(score, 4), entry.name)
+        return sorted(best.values(), key=lambda match: (-match.score, len(match.title)))[:limit]
+
+    def best(self, text: str, min_score: float = MIN_SCORE) -> Optional[ProductMatch]:
+        matches = self.match(text, limit=1, min_score=min_score)
+        return matches[0] if matches else None
+
+
+def matcher_from_titles(titles: Iterable[str]) -> ProductMatcher:
+    return ProductMatcher([{"title": title} for title in titles])
+
+
+_matchers: Dict[int, tuple] = {}
+
+
+def matcher_for_catalog(catalog) -> ProductMatcher:
+    """Matcher for a `catalog_cache.Catalog`, rebuilt only when the products response changed."""
+    version = catalog.validators.get("products", {}).get("sha1") or id(catalog.products)
+    cached = _matchers.get(catalog.client_id)
+    if cached is None or cached[0] != version:
+        cached = _matchers[catalog.client_id] = (version, ProductMatcher(catalog.products))
+        logger.info(f"Product matcher for client {catalog.client_id} built with {len(cached[1].entries)} names")
+    return cached[1]
+
+
+def evict_matcher(client_id: int):
+    _matchers.pop(client_id, None)
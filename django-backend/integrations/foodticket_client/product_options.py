@@ -0,0 +1,156 @@
+"""
+Per-product option constraints built from the extras data.
+
+For every product the index gives the sizes, toppings and edge options it can be ordered with and
+the groups a choice is mandatory from, so a whole cart is checked against the menu in one pass
+(`OptionsIndex.check_cart`). The options of a product are derived the first time it is asked for
+and shared by every product with the same extra groups. Product names resolve like the price book
+(exact title first, then `product_matcher`), so a cart that can be priced can be checked.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from integrations.foodticket_client.extras_index import ExtraGroup
+from integrations.foodticket_client.pricing import SIZE_GROUP, PriceBook, price_book_for_catalog, size_key
+from integrations.foodticket_client.product_matcher import normalize
+
+logger = logging.getLogger(__name__)
+
+TOPPINGS_GROUP = "Toppings"
+DRINKS_GROUP = "Wil je er drankje of taartje bij?"
+# Edge groups have no fixed title ("Heerlijke zaadjes voor de rand van je pizza", "Kaaskorst")
+EDGE_GROUP_WORDS = ("rand", "korst")
+
+
+def canonical_size(option: str) -> Optional[str]:
+    """"Medium Dunne Bodem 30cm" -> "30cm (Dunne Bodem)", the form callers say and `test_order_size` accepts."""
+    key = size_key(option)
+    if key is None:
+        return None
+    return f"{key[0]}cm (Dunne Bodem)" if key[1] else f"{key[0]}cm"
+
+
+def is_edge_group(group: ExtraGroup) -> bool:
+    name = group.name.lower()
+    return any(word in name for word in EDGE_GROUP_WORDS)
+
+
+@dataclass(frozen=True)
+class ProductOptions:
+    title: str
+    sizes: Tuple[str, ...]  # canonical sizes, in the restaurant's order
+    toppings: Tuple[str, ...]
+    edges: Tuple[str, ...]
+    mandatory: Tuple[str, ...]  # names of the groups a choice is required from
+    size_keys: FrozenSet[Tuple[str, bool]] = field(default=frozenset(), repr=False)
+    topping_keys: FrozenSet[str] = field(default=frozenset(), repr=False)
+
+    def allows_size(self, size: Optional[str]) -> bool:
+        return size_key(size or "") in self.size_keys
+
+    def allows_topping(self, topping: str) -> bool:
+        return normalize(topping) in self.topping_keys
+
+    @property
+    def requires_size(self) -> bool:
+        return SIZE_GROUP in self.mandatory
+
+
+@dataclass(frozen=True)
+class CartProblem:
+    product_name: str
+    kind: str  # "unknown_product", "invalid_size", "missing_size" or "invalid_topping"
+    value: str = ""
+
+
+def _unique(items: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(item for item in items if item))
+
+
+class OptionsIndex:
+    def __init__(self, price_book: PriceBook):
+        self.price_book = price_book
+        self._by_groups: Dict[Tuple[str, ...], Tuple] = {}
+
+    def _group_options(self, product_id: str) -> Tuple:
+        extras = self.price_book.extras
+        group_ids = extras.product_groups.get(str(product_id), ())
+        options = self._by_groups.get(group_ids)
+        if options is None:
+            sizes, toppings, edges, mandatory = [], [], [], []
+            for group in extras.groups_for_product(product_id):
+                if group.name == SIZE_GROUP:
+                    sizes.extend(map(canonical_size, group.options))
+                elif group.name == TOPPINGS_GROUP:
+                    toppings.extend(group.options)
+                elif is_edge_group(group):
+                    edges.extend(group.options)
+                if group.mandatory:
+                    mandatory.append(group.name)
+            sizes, toppings = _unique(sizes), _unique(toppings)
+            options = self._by_groups[group_ids] = (
+                sizes,
+                toppings,
+                _unique(edges),
+                _unique(mandatory),
+                frozenset(map(size_key, sizes)),
+                frozenset(map(normalize, toppings)),
+            )
+        return options
+
+    def for_product(self, product_name: str) -> Optional[ProductOptions]:
+        product = self.price_book.resolve(product_name)
+        if product is None:
+            return None
+        return ProductOptions(product["title"], *self._group_options(product["id"]))
+
+    def check_cart(self, items: Iterable[dict], sized: bool = False) -> List[CartProblem]:
+        """
+        Problems of cart items ({product_name, toppings, size}) against the menu, in one pass. With
+        `sized` the size of every item is checked too (a product with a mandatory size group needs one).
+        """
+        problems = []
+        for item in items:
+            name = item.get("product_name") or ""
+            options = self.for_product(name)
+            if options is None:
+                problems.append(CartProblem(name, "unknown_product"))
+                continue
+            for topping in item.get("toppings") or ():
+                if not options.allows_topping(topping):
+                    problems.append(CartProblem(name, "invalid_topping", topping))
+            if sized:
+                size = item.get("size")
+                if not size:
+                    if options.requires_size:
+                        problems.append(CartProblem(name, "missing_size"))
+                elif not options.allows_size(size):
+                    problems.append(CartProblem(name, "invalid_size", size))
+        return problems
+
+    def allowed_sizes(self, product_names: Iterable[str]) -> Tuple[str, ...]:
+        """Sizes at least one of the products can be ordered in, for the size tool's enum."""
+        sizes = []
+        for name in product_names:
+            options = self.for_product(name)
+            if options is not None:
+                sizes.extend(options.sizes)
+        return _unique(sizes)
+
+
+_options_indexes: Dict[int, OptionsIndex] = {}
+
+
+def options_index_for_catalog(catalog) -> OptionsIndex:
+    """Options index of a `catalog_cache.Catalog`, rebuilt together with its price book."""
+    price_book = price_book_for_catalog(catalog)
+    index = _options_indexes.get(catalog.client_id)
+    if index is None or index.price_book is not price_book:
+        index = _options_indexes[catalog.client_id] = OptionsIndex(price_book)
+    return index
+
+
+def evict_options_index(client_id: int):
+    _options_indexes.pop(client_id, None)
@@ -0,0 +1,191 @@
+"""
+Local stand-in for the Foodticket API, for load tests and offline development.
+
+Serves `/1/products`, `/1/extras`, `/1/zipcodes` and `/1/orders` from XML fixtures, either files
+written by `fixtures` (or recorded from the real API) or generated at startup. Latency, jitter and
+a 503 error rate can be set to see how the client's retries, the catalog cache and the call flow
+behave when the API is slow or failing. Responses carry an ETag, so conditional GETs get a 304.
+Query parameters are accepted but not applied: `/orders` returns the same orders for every phone.
+POST `/orders` answers with a new order id, or with the id of the first order that carried the same
+Idempotency-Key; a body without `orderlines` that each have a `product_id` is rejected with a 422.
+
+Usage (from django-backend/):
+    python -m integrations.foodticket_client.standin_server --port 8765 --scale 10 --latency-ms 150 --error-rate 0.05
+    FOODTICKET_BASE_URL=http://127.0.0.1:8765/1 daphne backend.asgi:application
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from integrations.foodticket_client.fixtures import extras_xml, orders_xml, products_xml, zipcodes_xml
+from integrations.foodticket_client.xml_stream import CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/1/"
+ENDPOINTS = ("products", "extras", "zipcodes", "orders")
+
+
+def valid_order(body: bytes) -> bool:
+    try:
+        lines = json.loads(body).get("orderlines")
+    except (ValueError, AttributeError):
+        return False
+    return bool(lines) and all(isinstance(line, dict) and line.get("product_id") for line in lines)
+
+
+class Fixture:
+    def __init__(self, content: bytes):
+        self.content = content
+        self.etag = f'"{hashlib.sha1(content).hexdigest()}"'
+        self.last_modified = formatdate(usegmt=True)
+
+
+def generated_fixtures(scale: int = 1) -> Dict[str, Fixture]:
+    return {
+        "products": Fixture(products_xml(200 * scale)),
+        "extras": Fixture(extras_xml(200 * scale)),
+        "zipcodes": Fixture(zipcodes_xml(500 * scale)),
+        "orders": Fixture(orders_xml(1000 * scale)),
+    }
+
+
+def load_fixtures(directory: Path, scale: int = 1) -> Dict[str, Fixture]:
+    """`<endpoint>.xml` files from `directory`; missing ones are generated."""
+    fixtures = generated_fixtures(scale)
+    for endpoint in ENDPOINTS:
+        path = directory / f"{endpoint}.xml"
+        if path.exists():
+            fixtures[endpoint] = Fixture(path.read_bytes())
+    return fixtures
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fixtures: Dict[str, Fixture], latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, seed: Optional[int] = None):
+        super().__init__(address, StandinHandler)
+        self.fixtures = fixtures
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.requests = Counter()
+        self.orders: Dict[str, int] = {}  # Idempotency-Key -> order id
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server: StandinServer
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API behind its load balancer
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        endpoint = path[len(API_PREFIX) :] if path.startswith(API_PREFIX) else None
+        self.server.requests[endpoint or path] += 1
+        time.sleep(self.server.delay())
+
+        if endpoint not in self.server.fixtures:
+            return self._empty(404)
+        if not self.headers.get("X-OrderBuddy-Reseller-Key"):
+            return self._empty(401)
+        if self.server.should_fail():
+            return self._empty(503)
+
+        fixture = self.server.fixtures[endpoint]
+        if self.headers.get("If-None-Match") == fixture.etag:
+            return self._empty(304, {"ETag": fixture.etag})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(fixture.content)))
+        self.send_header("ETag", fixture.etag)
+        self.send_header("Last-Modified", fixture.last_modified)
+        self.end_headers()
+        try:
+            for start in range(0, len(fixture.content), CHUNK_SIZE):
+                self.wfile.write(fixture.content[start : start + CHUNK_SIZE])
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away: a lookup that stopped early, a cancelled hedge or a timeout
+            self.close_connection = True
+
+    def do_POST(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        self.server.requests[f"POST {path}"] += 1
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        time.sleep(self.server.delay())
+
+        if path != f"{API_PREFIX}orders":
+            return self._empty(404)
+        if not self.headers.get("X-OrderBuddy-Reseller-Key"):
+            return self._empty(401)
+        if self.server.should_fail():
+            return self._empty(503)
+        if not valid_order(body):
+            return self._empty(422)
+
+        key = self.headers.get("Idempotency-Key") or f"anonymous-{len(self.server.orders)}"
+        with self.server._lock:
+            created = key not in self.server.orders
+            order_id = self.server.orders.setdefault(key, len(self.server.orders) + 1)
+        content = f"<?xml version='1.0' encoding='utf-8'?><order><id>{order_id}</id></order>".encode()
+        self.send_response(201 if created else 200)
+        self.send_header("Content-Type", "application/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _empty(self, status: int, headers: Optional[dict] = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Foodticket API responses from XML fixtures")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", type=Path, help="directory with products.xml, extras.xml, zipcodes.xml, orders.xml")
+    parser.add_argument("--scale", type=int, default=1, help="size of the generated fixtures (see fixtures.write_fixtures)")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests answered with 503")
+    parser.add_argument("--seed", type=int)
+    options = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    fixtures = load_fixtures(options.fixtures, options.scale) if options.fixtures else generated_fixtures(options.scale)
+    server = StandinServer((options.host, options.port), fixtures, options.latency_ms, options.jitter_ms, options.error_rate, options.seed)
+    for endpoint, fixture in fixtures.items():
+        logger.info(f"{API_PREFIX}{endpoint}: {len(fixture.content) / 1024:.0f} KiB")
+    logger.info(f"Foodticket stand-in on http://{options.host}:{options.port}{API_PREFIX.rstrip('/')}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Requests served: {dict(server.requests)}, orders created: {len(server.orders)}")
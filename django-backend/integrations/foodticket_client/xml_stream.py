@@ -0,0 +1,63 @@
+"""
+Incremental parsing of Foodticket XML responses.
+
+Foodticket lists are a flat sequence of records (`<row>`, `<order>`) under one root element.
+`iter_records` / `aiter_records` feed the response chunks to an `XMLPullParser` and yield each
+record as soon as its end tag arrives. After the consumer moves on, the record is cleared and
+detached from its parent, so memory stays bounded by one record plus one chunk whatever the
+response size. Stopping the iteration early stops reading the response.
+
+A yielded element is only valid until the next one is requested: read what you need from it first.
+"""
+
+import xml.etree.ElementTree as ET
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, Optional
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _drain(parser: ET.XMLPullParser, stack: list, tag: str) -> Iterator[ET.Element]:
+    for event, elem in parser.read_events():
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        # Only outermost records, a nested element with the same tag stays part of its record
+        if elem.tag == tag and all(parent.tag != tag for parent in stack):
+            yield elem
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+
+
+def iter_records(chunks: Iterable[bytes], tag: str, on_chunk: Optional[Callable[[bytes], None]] = None) -> Iterator[ET.Element]:
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack = []
+    for chunk in chunks:
+        if on_chunk is not None:
+            on_chunk(chunk)
+        parser.feed(chunk)
+        yield from _drain(parser, stack, tag)
+    parser.close()
+    yield from _drain(parser, stack, tag)
+
+
+async def aiter_records(
+    chunks: AsyncIterable[bytes], tag: str, on_chunk: Optional[Callable[[bytes], None]] = None
+) -> AsyncIterator[ET.Element]:
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack = []
+    async for chunk in chunks:
+        if on_chunk is not None:
+            on_chunk(chunk)
+        parser.feed(chunk)
+        for elem in _drain(parser, stack, tag):
+            yield elem
+    parser.close()
+    for elem in _drain(parser, stack, tag):
+        yield elem
+
+
+def iter_content_records(content: bytes, tag: str) -> Iterator[ET.Element]:
+    """`iter_records` over a response body that is already in memory."""
+    return iter_records((content[i : i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE)), tag)
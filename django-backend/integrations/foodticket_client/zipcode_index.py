@@ -0,0 +1,87 @@
+"""
+In-memory index of the restaurant's delivery zipcodes.
+
+The zipcode list is downloaded once and kept as a dict keyed by the 4-digit postcode prefix.
+When the TTL expires the next lookup schedules a background refresh and keeps answering from
+the current copy, so a lookup never waits on the network. The dict is replaced as a whole on
+refresh, readers never see a half built index.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Union
+
+from common.utils.metrics import metrics
+from integrations.foodticket_client.client import FoodticketClient, foodticket_client, foodticket_setting
+from integrations.foodticket_client.parsers import zipcode_not_found
+
+logger = logging.getLogger(__name__)
+
+ZIPCODE_INDEX_TTL_SECONDS = foodticket_setting("FOODTICKET_ZIPCODE_TTL_SECONDS", "3600", int)
+RETRY_AFTER_FAILURE_SECONDS = 60
+
+
+class ZipcodeIndex:
+    def __init__(self, client: FoodticketClient, ttl_seconds: int = ZIPCODE_INDEX_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self._entries: Optional[Dict[str, Dict]] = None
+        self._loaded_at = 0.0
+        self._refresh_task = None
+        self._next_attempt = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._entries is not None
+
+    def is_stale(self) -> bool:
+        return self._entries is None or time.monotonic() - self._loaded_at > self.ttl_seconds
+
+    def lookup(self, postcode: str) -> Optional[Dict]:
+        """Zipcode info for the postcode's 4-digit prefix, None if it is not a delivery area or the index is not loaded yet."""
+        self.refresh_if_stale()
+        entries = self._entries
+        if entries is None:
+            return None
+        return entries.get(postcode.replace(" ", "")[:4])
+
+    def get_zipcode_info(self, postcode: str) -> Union[Dict, str]:
+        """Same contract as `postcode_check.get_zipcode_info`."""
+        return self.lookup(postcode) or zipcode_not_found(postcode)
+
+    async def refresh(self):
+        started = time.perf_counter()
+        zipcodes = await self.client.fetch_zipcodes()
+        self._entries = {zipcode["postcode"]: zipcode for zipcode in zipcodes if zipcode["postcode"]}
+        self._loaded_at = time.monotonic()
+        metrics.set_gauge("foodticket.zipcodes.size", len(self._entries))
+        metrics.observe("foodticket.zipcodes.refresh_ms", (time.perf_counter() - started) * 1000)
+        logger.info(f"Zipcode index loaded with {len(self._entries)} prefixes")
+
+    async def ensure_loaded(self):
+        if self._entries is None:
+            await self.refresh()
+
+    def refresh_if_stale(self):
+        """Schedules a background refresh on the running event loop when the index is missing or expired."""
+        if not self.is_stale() or self._refresh_task is not None or time.monotonic() < self._next_attempt:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No event loop (scripts, simulator): callers get the current copy
+        self._refresh_task = loop.create_task(self._refresh_in_background())
+
+    async def _refresh_in_background(self):
+        try:
+            await self.refresh()
+        except Exception:
+            self._next_attempt = time.monotonic() + RETRY_AFTER_FAILURE_SECONDS
+            metrics.increment("foodticket.zipcodes.refresh_failed")
+            logger.exception("Zipcode index refresh failed, keeping the previous copy")
+        finally:
+            self._refresh_task = None
+
+
+zipcode_index = ZipcodeIndex(foodticket_client)
@@ -0,0 +1,219 @@
+"""
+Offline index of Dutch addresses: 6-character postcode + house number -> street and city.
+
+Built once from a bulk postcode dataset (a BAG export as CSV) by `manage.py build_address_index`
+and memory-mapped at runtime, so it costs no load time and the pages are shared between worker
+processes. The file is a set of sorted little-endian uint32 arrays:
+
+    header      magic, version and the section lengths
+    postcodes   sorted postcode codes ("1234AB" -> 1234 * 676 + A * 26 + B)
+    starts      for each postcode, where its house numbers start (one extra entry for the end)
+    houses      house numbers, sorted within each postcode
+    places      for each house number, the (street, city) pair it belongs to
+    streets, cities
+                string ids of every (street, city) pair
+    offsets     byte offsets of the strings in the UTF-8 blob that follows
+
+A lookup is two binary searches (postcode, then house number within its slice), a few
+microseconds. House number additions ("12A", "12-2") share the street of their number and are
+not stored.
+"""
+
+import bisect
+import csv
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+from common.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ADDRESS_INDEX_PATH = os.getenv("ADDRESS_INDEX_PATH", str(Path(__file__).resolve().parents[2] / "address_index" / "nl_addresses.idx"))
+
+MAGIC = b"NLAI"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIII")
+MAX_HOUSE_NUMBER = 99999
+
+_POSTCODE = re.compile(r"^\s*([1-9]\d{3})\s*([A-Za-z]{2})\s*$")
+_HOUSE_NUMBER = re.compile(r"^\s*(\d+)")
+
+
+def normalize_postcode(text: str) -> Optional[str]:
+    """"1234 ab" -> "1234AB", None when it is not a Dutch postcode."""
+    match = _POSTCODE.match(text or "")
+    return f"{match.group(1)}{match.group(2).upper()}" if match else None
+
+
+def parse_house_number(text) -> Optional[int]:
+    """The number of "12", "12A" or "12-2", None without one."""
+    match = _HOUSE_NUMBER.match(str(text or ""))
+    return int(match.group(1)) if match else None
+
+
+def postcode_code(postcode: str) -> int:
+    return int(postcode[:4]) * 676 + (ord(postcode[4]) - 65) * 26 + (ord(postcode[5]) - 65)
+
+
+@dataclass(frozen=True)
+class Address:
+    postcode: str
+    house_number: int
+    street: str
+    city: str
+
+    def __str__(self) -> str:
+        return f"{self.street} {self.house_number}, {self.postcode} {self.city}"
+
+
+class AddressIndex:
+    def __init__(self, path):
+        self.path = Path(path)
+        if sys.byteorder != "little":
+            raise RuntimeError("The address index is stored little-endian")
+        with open(self.path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, postcode_count, house_count, place_count, string_count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{self.path} is not an address index of version {VERSION}")
+        view = memoryview(self._mmap)
+        position = HEADER.size
+
+        def section(count: int) -> memoryview:
+            nonlocal position
+            data = view[position : position + 4 * count].cast("I")
+            position += 4 * count
+            return data
+
+        self._postcodes = section(postcode_count)
+        self._starts = section(postcode_count + 1)
+        self._houses = section(house_count)
+        self._places = section(house_count)
+        self._streets = section(place_count)
+        self._cities = section(place_count)
+        self._offsets = section(string_count + 1)
+        self._strings = view[position:]
+        metrics.set_gauge("address_index.addresses", house_count)
+        logger.info(f"Address index {self.path} mapped: {postcode_count} postcodes, {house_count} addresses")
+
+    def __len__(self) -> int:
+        return len(self._houses)
+
+    def _string(self, string_id: int) -> str:
+        return bytes(self._strings[self._offsets[string_id] : self._offsets[string_id + 1]]).decode()
+
+    def _postcode_slice(self, postcode: str) -> Optional[Tuple[int, int]]:
+        code = postcode_code(postcode)
+        position = bisect.bisect_left(self._postcodes, code)
+        if position == len(self._postcodes) or self._postcodes[position] != code:
+            return None
+        return self._starts[position], self._starts[position + 1]
+
+    def has_postcode(self, postcode: str) -> bool:
+        postcode = normalize_postcode(postcode)
+        return postcode is not None and self._postcode_slice(postcode) is not None
+
+    def lookup(self, postcode: str, house_number) -> Optional[Address]:
+        """The address at a postcode and house number ("1234 ab", "12a" are accepted), None if it does not exist."""
+        postcode, number = normalize_postcode(postcode), parse_house_number(house_number)
+        if postcode is None or number is None:
+            return None
+        bounds = self._postcode_slice(postcode)
+        if bounds is None:
+            return None
+        position = bisect.bisect_left(self._houses, number, *bounds)
+        if position == bounds[1] or self._houses[position] != number:
+            return None
+        place = self._places[position]
+        return Address(postcode, number, self._string(self._streets[place]), self._string(self._cities[place]))
+
+    def close(self):
+        for name in ("_postcodes", "_starts", "_houses", "_places", "_streets", "_cities", "_offsets", "_strings"):
+            getattr(self, name).release()
+        self._mmap.close()
+
+
+@lru_cache(maxsize=None)
+def default_address_index() -> Optional[AddressIndex]:
+    """The index at ADDRESS_INDEX_PATH, None when it has not been built (addresses are then not checked)."""
+    if not os.path.exists(ADDRESS_INDEX_PATH):
+        logger.warning(f"No address index at {ADDRESS_INDEX_PATH}, run manage.py build_address_index")
+        return None
+    return AddressIndex(ADDRESS_INDEX_PATH)
+
+
+def read_csv_addresses(
+    path, postcode_column: str = "postcode", house_number_column: str = "huisnummer", street_column: str = "straat", city_column: str = "woonplaats"
+) -> Iterator[Tuple[str, str, str, str]]:
+    """(postcode, house number, street, city) rows of a CSV export; the delimiter is detected."""
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        dialect = csv.Sniffer().sniff(file.read(64 * 1024), delimiters=",;\t|")
+        file.seek(0)
+        for row in csv.DictReader(file, dialect=dialect):
+            yield row[postcode_column], row[house_number_column], row[street_column], row[city_column]
+
+
+def build_address_index(rows: Iterable[Tuple[str, str, str, str]], path) -> dict:
+    """
+    Writes the index file for (postcode, house number, street, city) rows, atomically. Rows with an
+    invalid postcode or house number are skipped. Returns counts for the builder's report.
+    """
+    strings, places = {}, {}
+    # postcode code (23 bits) | house number (17 bits) | place id (24 bits): sorting the packed keys sorts the addresses
+    keys = array("Q")
+    skipped = 0
+    for postcode, house_number, street, city in rows:
+        postcode, number = normalize_postcode(postcode), parse_house_number(house_number)
+        street, city = (street or "").strip(), (city or "").strip()
+        if postcode is None or number is None or number > MAX_HOUSE_NUMBER or not street or not city:
+            skipped += 1
+            continue
+        pair = (strings.setdefault(street, len(strings)), strings.setdefault(city, len(strings)))
+        place = places.setdefault(pair, len(places))
+        keys.append(postcode_code(postcode) << 41 | number << 24 | place)
+    if len(places) >= 1 << 24:
+        raise ValueError(f"{len(places)} street/city pairs do not fit the index")
+
+    postcodes, starts, houses, house_places = array("I"), array("I"), array("I"), array("I")
+    previous = None
+    for key in sorted(keys):
+        code, number = key >> 41, key >> 24 & 0x1FFFF
+        if postcodes and postcodes[-1] == code:
+            if number == previous:
+                continue  # Additions of the same number
+        else:
+            postcodes.append(code)
+            starts.append(len(houses))
+        houses.append(number)
+        house_places.append(key & 0xFFFFFF)
+        previous = number
+    starts.append(len(houses))
+
+    streets, cities = array("I", [0]) * len(places), array("I", [0]) * len(places)
+    for (street_id, city_id), place in places.items():
+        streets[place], cities[place] = street_id, city_id
+    blob, offsets = bytearray(), array("I", [0])
+    for text in strings:  # Insertion order is the string id
+        blob += text.encode()
+        offsets.append(len(blob))
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix(path.suffix + ".tmp")
+    with open(temporary, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, len(postcodes), len(houses), len(places), len(strings)))
+        for section in (postcodes, starts, houses, house_places, streets, cities, offsets):
+            section.tofile(file)
+        file.write(blob)
+    os.replace(temporary, path)
+    return {"postcodes": len(postcodes), "addresses": len(houses), "places": len(places), "skipped": skipped, "bytes": path.stat().st_size}
@@ -1,3 +1,237 @@
-from django.test import TestCase
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.test import SimpleTestCase, override_settings
+
+from common.utils.resilience import BudgetExceeded, CircuitBreaker, CircuitOpenError, budget_timeout, hedged, latency_budget, remaining_budget
+
+from integrations.foodticket_client.client import FoodticketAPIError, FoodticketClient, foodticket_setting, is_upstream_failure
+from integrations.foodticket_client.extras_index import ExtraGroup, ExtrasIndex
+from integrations.foodticket_client.pricing import OrderLine, PriceBook
+from integrations.foodticket_client.product_options import CartProblem, OptionsIndex, canonical_size
+from integrations.nl_addresses.address_index import Address, AddressIndex, build_address_index, normalize_postcode, read_csv_addresses
+from voice_assistant.state_machine.verifiers import test_address as verify_address
+
+PRODUCTS = [
+    {"id": "1", "title": "Margherita Pizza", "price": "10.00"},
+    {"id": "2", "title": "Coca-Cola", "price": "2.50"},
+    {"id": "3", "title": "Funghi Pizza", "price": "11.00"},
+]
+
+
+def _extras():
+    groups = {
+        "10": ExtraGroup("10", "Bodem", True, ("Medium 30cm", "Large 35cm"), (0, 250), ("1001", "1002")),
+        "20": ExtraGroup("20", "Toppings", False, ("Ham", "Extra kaas"), (100, 150), ("2001", "2002")),
+        "30": ExtraGroup("30", "Heerlijke zaadjes voor de rand van je pizza", False, ("Sesam", "Geen"), (50, 0), ("3001", "3002")),
+    }
+    return ExtrasIndex(groups, {"1": ("10", "20", "30"), "3": ("10", "20", "30")})
+
+
+class PriceBookTests(SimpleTestCase):
+    def setUp(self):
+        self.book = PriceBook(PRODUCTS, _extras())
+
+    def test_line_adds_size_and_toppings(self):
+        priced = self.book.price_line(OrderLine("margherita pizza", 2, "Large 35cm", ("Ham", "Extra kaas")))
+        self.assertEqual(priced.unit_cents, 1000 + 250 + 100 + 150)
+        self.assertEqual(priced.total_cents, 2 * 1500)
+        self.assertEqual((priced.product_id, priced.option_ids), ("1", ("1002", "2001", "2002")))
+
+    def test_unknown_size_is_not_priced(self):
+        self.assertIsNone(self.book.price_line(OrderLine("Margherita Pizza", 1, "Family 45cm")))
+        self.assertIsNone(self.book.price_line(OrderLine("Margherita Pizza", 1, "other")))
+        # A product without a size table does not come in any size
+        self.assertIsNone(self.book.price_line(OrderLine("Coca-Cola", 1, "Medium 30cm")))
+
+    def test_unknown_topping_is_not_priced(self):
+        self.assertIsNone(self.book.price_line(OrderLine("Margherita Pizza", 1, "Medium 30cm", ("Ananas",))))
+
+    def test_quote_with_an_unpriced_line_is_incomplete(self):
+        quote = self.book.quote([OrderLine("Margherita Pizza", 1, "Medium 30cm"), OrderLine("Margherita Pizza", 1, "Family 45cm")])
+        self.assertFalse(quote.complete)
+        self.assertEqual(quote.unpriced, ("Margherita Pizza Family 45cm",))
+        self.assertFalse(quote.below_minimum)
+
+    def test_delivery_costs_and_minimum(self):
+        lines = [OrderLine("Margherita Pizza", 1, "Medium 30cm"), OrderLine("Coca-Cola", 2)]
+        quote = self.book.quote(lines, {"costs": "2.50", "min_order": "20.00", "free_delivery": False})
+        self.assertEqual((quote.subtotal_cents, quote.delivery_cents, quote.total_cents), (1500, 250, 1750))
+        self.assertTrue(quote.below_minimum)
+        free = self.book.quote(lines, {"costs": "2.50", "min_order": "15.00", "free_delivery": True})
+        self.assertEqual((free.total_cents, free.below_minimum), (1500, False))
+
+
+ADDRESSES = [
+    ("1012 AB", "1", "Damstraat", "Amsterdam"),
+    ("1012AB", "3", "Damstraat", "Amsterdam"),
+    ("1012ab", "3A", "Damstraat", "Amsterdam"),  # Addition of a number that is already there
+    ("3511 CE", "12", "Oudegracht", "Utrecht"),
+    ("9999 ZZ", "", "Nergensweg", "Nergens"),  # No house number
+    ("0123 AB", "5", "Ongeldig", "Nergens"),  # Dutch postcodes do not start with 0
+]
+
+
+class AddressIndexTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.stats = build_address_index(ADDRESSES, self.directory / "nl_addresses.idx")
+        self.index = AddressIndex(self.directory / "nl_addresses.idx")
+        self.addCleanup(self.index.close)
+
+    def test_lookup_accepts_spoken_forms(self):
+        expected = Address("1012AB", 3, "Damstraat", "Amsterdam")
+        self.assertEqual(self.index.lookup("1012ab", 3), expected)
+        self.assertEqual(self.index.lookup(" 1012 AB ", "3-2"), expected)
+        self.assertEqual(str(self.index.lookup("3511CE", "12b")), "Oudegracht 12, 3511CE Utrecht")
+
+    def test_unknown_addresses_are_not_found(self):
+        self.assertIsNone(self.index.lookup("1012AB", 2))
+        self.assertIsNone(self.index.lookup("1012AC", 1))
+        self.assertIsNone(self.index.lookup("not a postcode", 1))
+        self.assertIsNone(self.index.lookup("1012AB", ""))
+        self.assertTrue(self.index.has_postcode("3511 ce"))
+        self.assertFalse(self.index.has_postcode("9999ZZ"))
+
+    def test_invalid_rows_and_additions_are_not_stored(self):
+        self.assertEqual((self.stats["postcodes"], self.stats["addresses"], self.stats["skipped"]), (2, 3, 2))
+        self.assertEqual(len(self.index), 3)
+
+    def test_csv_export_is_read_with_its_delimiter(self):
+        path = self.directory / "bag.csv"
+        path.write_text("postcode;huisnummer;straat;woonplaats\n1012AB;1;Damstraat;Amsterdam\n", encoding="utf-8")
+        self.assertEqual(list(read_csv_addresses(path)), [("1012AB", "1", "Damstraat", "Amsterdam")])
+        self.assertIsNone(normalize_postcode("1012 A"))
+
+    def test_address_verifier_takes_street_and_city_from_the_index(self):
+        fsm = SimpleNamespace(collected_info={"params": {}})
+        with mock.patch("voice_assistant.state_machine.verifiers.default_address_index", return_value=self.index):
+            self.assertEqual(verify_address(fsm, {"zip_code": "1012 ab", "house_number": "2", "city": "Amsterdam"}), "False")
+            self.assertEqual(verify_address(fsm, {"zip_code": "1012 ab", "house_number": "3", "city": "Amsterdm"}), "True")
+        params = fsm.collected_info["params"]
+        self.assertEqual((params["street"], params["city"]), ("Damstraat", "Amsterdam"))
+        self.assertEqual(params["full_address"], "Damstraat 3, 1012AB Amsterdam")
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_the_threshold_and_probes_once(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout_seconds=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        # Cool-down over: one probe, the next request waits for its outcome
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.check()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_opens_again(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_seconds=60)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow_request())
+        breaker.reset_timeout_seconds = 0
+        breaker.check()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_released_probe_lets_the_next_one_through(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout_seconds=0)
+        breaker.record_failure()
+        breaker.check()
+        breaker.release()
+        breaker.check()
+
+    def test_only_upstream_failures_count(self):
+        self.assertTrue(is_upstream_failure(FoodticketAPIError(503)))
+        self.assertTrue(is_upstream_failure(httpx.ConnectError("refused")))
+        self.assertTrue(is_upstream_failure(asyncio.TimeoutError()))
+        self.assertFalse(is_upstream_failure(FoodticketAPIError(404)))
+        self.assertFalse(is_upstream_failure(BudgetExceeded()))
+
+
+class LatencyBudgetTests(SimpleTestCase):
+    def test_nested_budgets_only_shrink(self):
+        self.assertIsNone(remaining_budget())
+        self.assertEqual(budget_timeout(5), 5)
+        with latency_budget(1):
+            with latency_budget(10):
+                self.assertLessEqual(remaining_budget(), 1)
+                self.assertLessEqual(budget_timeout(5), 1)
+            with latency_budget(0):
+                with self.assertRaises(BudgetExceeded):
+                    budget_timeout(5)
+        self.assertIsNone(remaining_budget())
+
+    def test_hedged_returns_the_first_answer(self):
+        delays = [1.0, 0.0]
+
+        async def attempt():
+            delay = delays.pop(0)
+            await asyncio.sleep(delay)
+            return delay
+
+        self.assertEqual(asyncio.run(hedged(attempt, hedge_after=0.01)), 0.0)
+
+
+class OptionsIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = OptionsIndex(PriceBook(PRODUCTS, _extras()))
+
+    def test_product_options_come_from_its_groups(self):
+        options = self.index.for_product("margherita pizza")
+        self.assertEqual((options.sizes, options.toppings, options.edges), (("30cm", "35cm"), ("Ham", "Extra kaas"), ("Sesam", "Geen")))
+        self.assertTrue(options.requires_size)
+        self.assertFalse(self.index.for_product("Coca-Cola").requires_size)
+        self.assertIsNone(self.index.for_product("Sushi"))
+        self.assertEqual(canonical_size("Medium Dunne Bodem 30cm"), "30cm (Dunne Bodem)")
+
+    def test_cart_problems_in_one_pass(self):
+        items = [
+            {"product_name": "Margherita Pizza", "toppings": ["Ham", "Ananas"], "size": "35cm"},
+            {"product_name": "Funghi Pizza", "size": "45cm"},
+            {"product_name": "Funghi Pizza"},
+            {"product_name": "Coca-Cola"},
+            {"product_name": "Sushi"},
+        ]
+        self.assertEqual(
+            self.index.check_cart(items, sized=True),
+            [
+                CartProblem("Margherita Pizza", "invalid_topping", "Ananas"),
+                CartProblem("Funghi Pizza", "invalid_size", "45cm"),
+                CartProblem("Funghi Pizza", "missing_size"),
+                CartProblem("Sushi", "unknown_product"),
+            ],
+        )
+        # Before the size question only toppings and products are checked
+        self.assertEqual(len(self.index.check_cart(items)), 2)
+
+    def test_allowed_sizes_of_the_cart(self):
+        self.assertEqual(self.index.allowed_sizes(["Coca-Cola", "Funghi Pizza", "Margherita Pizza"]), ("30cm", "35cm"))
+        self.assertEqual(self.index.allowed_sizes(["Coca-Cola"]), ())
+
+
+class FoodticketSettingTests(SimpleTestCase):
+    @override_settings(FOODTICKET_BASE_URL="http://127.0.0.1:8765/1")
+    def test_django_settings_are_used_when_configured(self):
+        self.assertEqual(FoodticketClient().base_url, "http://127.0.0.1:8765/1")
+        self.assertEqual(FoodticketClient(base_url="http://other/1").base_url, "http://other/1")
+
+    def test_scripts_without_settings_read_the_environment(self):
+        unconfigured = SimpleNamespace(configured=False)
+        with mock.patch("integrations.foodticket_client.client.settings", unconfigured), mock.patch.dict(
+            "os.environ", {"FOODTICKET_BASE_URL": "http://env/1", "FOODTICKET_CLIENT_ID": "77"}
+        ):
+            os.environ.pop("DJANGO_SETTINGS_MODULE", None)
+            self.assertEqual(FoodticketClient().base_url, "http://env/1")
+            self.assertEqual(foodticket_setting("FOODTICKET_CLIENT_ID", "3517", int), 77)
+            self.assertEqual(foodticket_setting("FOODTICKET_CATALOG_TTL_SECONDS", "900", int), 900)
@@ -0,0 +1,89 @@
+"""
+Async calls to the Twilio REST API that are made while a call is live.
+
+The twilio SDK's `Client` is synchronous: every request blocks the event loop that also carries
+the audio of all calls in the process. Requests on the hot path go through `TwilioRestClient`
+instead, one `httpx.AsyncClient` with a pool of keep-alive connections to api.twilio.com, a short
+timeout and a few retries. Hanging up is a single POST to the call's own resource.
+
+`twilio_rest` is created once per process and shared by every call, so calls do not build their
+own clients or pay a TLS handshake. Credentials come from the Django settings (TWILIO_ACCOUNT_SID,
+TWILIO_AUTH_TOKEN), which read the environment and `.env`.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+import httpx
+from django.conf import settings
+
+from common.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL", "https://api.twilio.com/2010-04-01")
+
+TIMEOUT = httpx.Timeout(3.0, connect=1.0)
+LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=5, keepalive_expiry=60.0)
+MAX_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 0.2
+
+
+class TwilioRestClient:
+    def __init__(self, account_sid: Optional[str], auth_token: Optional[str], base_url: str = TWILIO_API_BASE_URL):
+        self.account_sid = account_sid or ""
+        self.auth_token = auth_token or ""
+        self.base_url = base_url
+        self._http = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        # Created lazily so the pool is bound to the event loop that uses it
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=f"{self.base_url}/Accounts/{self.account_sid}",
+                auth=(self.account_sid, self.auth_token),
+                timeout=TIMEOUT,
+                limits=LIMITS,
+            )
+        return self._http
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def hangup(self, call_sid: str) -> bool:
+        """
+        Completes the call. Connection errors, timeouts, 429 and 5xx are retried (completing a call
+        twice is harmless); other errors, e.g. the call already ended, are not. Returns True on success.
+        """
+        started = time.perf_counter()
+        error = None
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = await self.http.post(f"/Calls/{call_sid}.json", data={"Status": "completed"})
+            except httpx.TransportError as e:
+                error = repr(e)
+            else:
+                if response.status_code < 300:
+                    metrics.observe("twilio.hangup_ms", (time.perf_counter() - started) * 1000)
+                    metrics.increment("twilio.hangups")
+                    return True
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code < 500 and response.status_code != 429:
+                    break
+            if attempt < MAX_RETRIES:
+                metrics.increment("twilio.hangup_retries")
+                logger.warning(f"Hanging up call {call_sid} failed ({error}), retrying")
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS * 2**attempt)
+        metrics.observe("twilio.hangup_ms", (time.perf_counter() - started) * 1000)
+        metrics.increment("twilio.hangup_failed")
+        logger.error(f"Failed to end call {call_sid}: {error}")
+        return False
+
+
+twilio_rest = TwilioRestClient(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
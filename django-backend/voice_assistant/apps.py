@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class VoiceAssistantConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "voice_assistant"
+
+    def ready(self):
+        # Compile and validate the conversation flows at startup
+        import voice_assistant.state_machine.manager  # noqa: F401
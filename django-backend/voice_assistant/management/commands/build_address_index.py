@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from integrations.nl_addresses.address_index import ADDRESS_INDEX_PATH, AddressIndex, build_address_index, read_csv_addresses
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the offline Dutch address index (postcode + house number -> street, city) from a CSV export of the BAG. "
+        "Running servers map the new file on their next start."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path")
+        parser.add_argument("--output", default=ADDRESS_INDEX_PATH)
+        parser.add_argument("--postcode-column", default="postcode")
+        parser.add_argument("--house-number-column", default="huisnummer")
+        parser.add_argument("--street-column", default="straat")
+        parser.add_argument("--city-column", default="woonplaats")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = read_csv_addresses(
+            options["csv_path"], options["postcode_column"], options["house_number_column"], options["street_column"], options["city_column"]
+        )
+        stats = build_address_index(rows, options["output"])
+        self.stdout.write(
+            f"{options['output']}: {stats['addresses']} addresses in {stats['postcodes']} postcodes, {stats['places']} streets, "
+            f"{stats['bytes'] / 1024 / 1024:.1f} MiB, built in {time.perf_counter() - started:.1f}s"
+        )
+        if stats["skipped"]:
+            self.stdout.write(self.style.WARNING(f"{stats['skipped']} rows skipped (invalid postcode, house number, street or city)"))
+        index = AddressIndex(options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Index opened with {len(index)} addresses"))
+        index.close()
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+
+from db.models import OrderOutbox
+from voice_assistant.services.order_outbox import order_outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Submits the orders in the outbox that are due, e.g. after a restart without calls or from cron. "
+        "Safe next to running servers: rows are claimed, and resubmissions carry the same Idempotency-Key."
+    )
+
+    async def _drain(self) -> int:
+        attempted = 0
+        while True:
+            count = await order_outbox.process_due()
+            attempted += count
+            if count < order_outbox.batch_size:
+                return attempted
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        attempted = asyncio.run(self._drain())
+        self.stdout.write(f"{attempted} orders attempted in {time.perf_counter() - started:.2f}s")
+        for status, _ in OrderOutbox.STATUS_CHOICES:
+            self.stdout.write(f"{status}: {OrderOutbox.objects.filter(status=status).count()}")
@@ -0,0 +1,33 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+
+from integrations.foodticket_client.catalog_cache import catalog_cache
+from integrations.foodticket_client.client import DEFAULT_CLIENT_ID
+from voice_assistant.services.catalog_sync import vocabularies_from_catalog, vocabulary_diff
+from voice_assistant.state_machine.conversation_openai_tools import vocabularies
+
+
+class Command(BaseCommand):
+    help = (
+        "Refreshes the Foodticket catalog snapshot of a client and shows how the order flow vocabularies "
+        "differ from the hand-maintained defaults. Running servers pick the menu up through their own catalog sync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--client-id", type=int, default=DEFAULT_CLIENT_ID)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        catalog = asyncio.run(catalog_cache.refresh(options["client_id"]))
+        diff = vocabulary_diff(vocabularies, vocabularies_from_catalog(catalog, vocabularies))
+        self.stdout.write(f"Catalog of client {catalog.client_id}: {len(catalog.products)} products, synced in {time.perf_counter() - started:.2f}s")
+        if not diff:
+            self.stdout.write(self.style.SUCCESS("Vocabularies match the catalog"))
+        for name, (added, removed) in diff.items():
+            self.stdout.write(f"{name}: +{len(added)} -{len(removed)}")
+            for item in added:
+                self.stdout.write(self.style.SUCCESS(f"  + {item}"))
+            for item in removed:
+                self.stdout.write(self.style.WARNING(f"  - {item}"))
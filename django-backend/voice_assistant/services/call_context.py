@@ -0,0 +1,105 @@
+"""
+Per-call context with data prefetched as soon as the call arrives.
+
+The caller's latest order is fetched from Foodticket in the background when the call starts, so
+when the caller asks for the order status (`test_order_status`) the answer is already in memory.
+The FSM reaches the context through `collected_info["call_context"]`. The prefetch runs under its
+own latency budget and is skipped while the Foodticket circuit is open; the caller then gets the
+"status not found" answer instead of waiting. A status question asked while the prefetch is still
+running waits for it within the turn's budget, and gets a "still looking" answer if it does not finish.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.conf import settings
+
+from common.utils.metrics import metrics
+from common.utils.resilience import CircuitOpenError, latency_budget, remaining_budget
+from integrations.foodticket_client.client import FoodticketClient, foodticket_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CallContext:
+    call_sid: str
+    caller_number: Optional[str] = None
+    # First order line of the caller's latest order, None when there is none
+    last_order: Optional[dict] = None
+    order_history_loaded: bool = False
+    # Client of the restaurant the call is for (see `restaurants`)
+    client: FoodticketClient = field(default=foodticket_client, repr=False)
+    _order_history_task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    def prefetch_order_history(self):
+        """Starts the order history fetch on the running event loop, once per call."""
+        if self._order_history_task is not None:
+            return
+        if not self.caller_number or self.caller_number == "Unknown":
+            # Nothing to look up; the number may still arrive with a later `CallContextRegistry.start`
+            self.order_history_loaded = True
+            return
+        self.order_history_loaded = False
+        self._order_history_task = asyncio.get_running_loop().create_task(self._fetch_order_history())
+
+    async def _fetch_order_history(self):
+        started = time.perf_counter()
+        try:
+            with latency_budget(settings.ORDER_HISTORY_PREFETCH_BUDGET_SECONDS):
+                order = await self.client.fetch_flat_orders_by_phone(self.caller_number.lstrip("+"))
+            self.last_order = order if isinstance(order, dict) else None
+            metrics.observe("call_context.order_history_ms", (time.perf_counter() - started) * 1000)
+        except CircuitOpenError:
+            metrics.increment("call_context.order_history_skipped")
+            logger.warning(f"Foodticket circuit is open, no order history for call {self.call_sid}")
+        except Exception:
+            metrics.increment("call_context.order_history_failed")
+            logger.exception(f"Prefetching the order history of call {self.call_sid} failed")
+        finally:
+            self.order_history_loaded = True
+
+    async def wait_for_order_history(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """For async callers that can afford to wait a little when the prefetch has not finished yet; by default the turn's remaining budget."""
+        if timeout is None:
+            timeout = remaining_budget()
+            timeout = settings.TURN_LATENCY_BUDGET_SECONDS if timeout is None else timeout
+        if self._order_history_task is not None and not self._order_history_task.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(self._order_history_task), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.last_order
+
+    def cancel(self):
+        if self._order_history_task is not None:
+            self._order_history_task.cancel()
+
+
+class CallContextRegistry:
+    def __init__(self):
+        self._contexts: dict[str, CallContext] = {}
+
+    def start(self, call_sid: str, caller_number: Optional[str], client: FoodticketClient = foodticket_client) -> CallContext:
+        """Creates (or completes) the call's context and starts prefetching; safe to call from the webhook and the stream."""
+        context = self._contexts.get(call_sid)
+        if context is None:
+            context = self._contexts[call_sid] = CallContext(call_sid, caller_number, client=client)
+        elif caller_number and not context.caller_number:
+            context.caller_number = caller_number
+        context.prefetch_order_history()
+        return context
+
+    def get(self, call_sid: str) -> Optional[CallContext]:
+        return self._contexts.get(call_sid)
+
+    def release(self, call_sid: str):
+        context = self._contexts.pop(call_sid, None)
+        if context is not None:
+            context.cancel()
+
+
+call_contexts = CallContextRegistry()
@@ -4,14 +4,30 @@ import asyncio
 import time
 import traceback
 import os
+from typing import Optional
+from django.conf import settings
 from voice_assistant.services.twilio_service import TwilioService
 from voice_assistant.services.openai_service import OpenAIService
 from voice_assistant.services.call_session_manager import CallSessionManager
+from voice_assistant.services.call_context import call_contexts
+from voice_assistant.services.restaurants import restaurants
+from voice_assistant.services.call_snapshot_store import call_snapshot_store
+from voice_assistant.services.order_outbox import order_from_fsm, order_outbox
+from voice_assistant.services.language_detector import detect_language
+from voice_assistant.services.language_preferences import load_language_preference, save_language_preference
+from voice_assistant.state_machine.manager import APPLICATION_FLOW, ORDER_FLOW, flow_registry, get_fsm_for_call, release_fsm
+from voice_assistant.state_machine.slot_filling import handle_tool_call
+from voice_assistant.state_machine.verifiers import GREETING_STATE, LANGUAGE_CODES, ORDER_HISTORY_VERIFIERS, run_state_tool
 from common.utils.enums import TwilioEvent, OpenAIEvent
+from common.utils.metrics import metrics
+from common.utils.resilience import latency_budget
 
 
 logger = logging.getLogger(__name__)
 
+# Longest wait for the goodbye to be played before the call is hung up
+END_CALL_PLAYBACK_SECONDS = 10
+
 
 class CallOrchestrator:
     def __init__(self, consumer, is_test=False):
@@ -25,6 +41,9 @@ class CallOrchestrator:
         self.openai_service.twilio_service = self.twilio_service
         self.twilio_service.openai_service = self.openai_service
         self.session_manager = CallSessionManager()
+        # Only order flow calls have an FSM, a restaurant and tool calls; the visa assistant is prompt only
+        self.uses_order_flow = settings.CONVERSATION_FLOW == ORDER_FLOW
+        self.fsm = None
         self.openai_ws = None
         self.openai_listener_task = None
         self.mark_timestamps = []
@@ -33,6 +52,14 @@ class CallOrchestrator:
         self.active_item_id = None
         self.latest_media_timestamp = None
         self.caller_number = None
+        # Partition of the dialed restaurant (menu, zipcodes, compiled flows), held for the whole call
+        self.restaurant = None
+        self._order_queued = False
+        # The Realtime API allows one response at a time; a response.create asked for meanwhile waits for response.done
+        self._response_idle = asyncio.Event()
+        self._response_idle.set()
+        self._response_requested = False
+        self.end_call_task = None
         self._is_shutting_down = False
         self._shutdown_event = asyncio.Event()
         self.is_twillio_printed = False
@@ -83,6 +110,10 @@ class CallOrchestrator:
                 call_sid = data.get("start", {}).get("callSid")
                 self.call_sid = call_sid
                 logger.info(f"CURRENT_Call_SID: {call_sid}")
+                if self.uses_order_flow:
+                    self.restaurant = restaurants.acquire(data.get("start", {}).get("customParameters", {}).get("dialedNumber"))
+                    # Before opening the OpenAI connection, so the order history arrives while the greeting plays
+                    call_contexts.start(call_sid, self.caller_number, self.restaurant.client)
                 # stream_sid = data.get("streamSid")
 
                 await self.start()
@@ -92,7 +123,7 @@ class CallOrchestrator:
                 # TODO: Twilio'dan gelen start event verisini session manager'e kaydet
                 stream_sid_and_caller_number = await self.twilio_service.get_stream_sid_and_caller_number_from_start_event_payload(data)
                 self.stream_sid = stream_sid_and_caller_number["stream_sid"]
-                await self.openai_service.send_initial_config()
+                await self._start_conversation()
 
             elif event_type == TwilioEvent.MEDIA.value:
                 # raise NotImplementedError("Twilio MEDIA event handling is not implemented yet.")
@@ -165,12 +196,18 @@ class CallOrchestrator:
 
                 elif event_type == OpenAIEvent.RESPONSE_FUNCTION_CALL_ARGUMENTS_DONE.value:
                     logger.info(f"[EVENT] RESPONSE_FUNCTION_CALL_ARGUMENTS_DONE: {parsed}")
+                    await self._handle_function_call(parsed)
+
+                elif event_type == OpenAIEvent.RESPONSE_CREATED.value:
+                    self._response_idle.clear()
 
                 elif event_type == OpenAIEvent.INPUT_TRANSCRIPTION_DONE.value:
                     logger.info(f"[EVENT] INPUT_TRANSCRIPTION_DONE : {parsed}")
                     logger.debug("!!! OpenAI input transcription done !!!")
                     transcript = parsed.get("transcript", "")
                     logger.debug(f"Input transcript: {transcript}")
+                    self.session_manager.append_transcript("user", transcript)
+                    await self._detect_language(transcript)
 
                     # Log to EventLog table
                     from db.models import EventLog
@@ -184,6 +221,7 @@ class CallOrchestrator:
                     logger.debug("!!! OpenAI response audio transcript done !!!")
                     transcript = parsed.get("transcript", "")
                     logger.debug(f"Response audio transcript: {transcript}")
+                    self.session_manager.append_transcript("assistant", transcript)
 
                     # Log to EventLog table
                     from db.models import EventLog
@@ -195,6 +233,15 @@ class CallOrchestrator:
                 elif event_type == OpenAIEvent.RESPONSE_DONE.value:
                     logger.info(f"[EVENT] RESPONSE_DONE: {parsed}")
                     self.awaiting_new_deltas = True
+                    self._response_idle.set()
+                    if self._response_requested:
+                        self._response_requested = False
+                        await self._request_response()
+
+                elif event_type == OpenAIEvent.ERROR.value:
+                    logger.error(f"[EVENT] ERROR: {parsed}")
+                    # A rejected response.create is not followed by response.done
+                    self._response_idle.set()
 
                 elif event_type == OpenAIEvent.RESPONSE_TEXT_DONE.value:
                     logger.info(f"[EVENT] RESPONSE_TEXT_DONE")
@@ -266,6 +313,158 @@ class CallOrchestrator:
         # Mark gönderildiği anın timestamp'ini sıraya al
         self.mark_timestamps.append(self._now_timestamp())
 
+    async def _start_conversation(self):
+        """Configures the session with the call's flow: the visa assistant's prompts, or the prompt and tools of the FSM state the call starts in."""
+        if not self.uses_order_flow:
+            # Prompts are read per call so edited flow files apply to new calls without a restart
+            prompts = flow_registry.get(APPLICATION_FLOW).prompts
+            await self.openai_service.send_initial_config(prompts["instructions"], first_message=prompts["first_message"])
+            return
+        await self._start_fsm()
+        state = self.fsm.get_current()
+        await self.openai_service.send_initial_config(state.prompt, state.tools)
+
+    async def _start_fsm(self):
+        """Creates the call FSM and resumes it when the same caller dropped an unfinished order recently."""
+        collected_info = self.openai_service.collected_info
+        collected_info["call_context"] = call_contexts.start(self.call_sid, self.caller_number, self.restaurant.client)
+        collected_info["restaurant"] = self.restaurant
+        self.fsm = get_fsm_for_call(self.call_sid, collected_info, self.restaurant.flows)
+        self.restaurant.warm_up()
+        order_outbox.start()
+        call_snapshot_store.start()
+        snapshot = await call_snapshot_store.load_recent(self._snapshot_key())
+        if snapshot and self.fsm.restore(snapshot):
+            logger.info(f"Call {self.call_sid} resumed at state {self.fsm.current_state} from a snapshot saved at {snapshot['saved_at']:.0f}")
+        self.fsm.on_transition = self._save_fsm_snapshot
+        if self.fsm.lang is None and self.caller_number:
+            preferred_lang = await load_language_preference(self.caller_number)
+            if preferred_lang and self._answer_greeting(preferred_lang):
+                # The call opens with the order question instead of the greeting
+                logger.info(f"Using the language preference '{preferred_lang}' of the caller for call {self.call_sid}")
+
+    def _answer_greeting(self, lang: Optional[str]) -> bool:
+        """Answers the greeting state with the caller's language; None asks for it explicitly (language_selection)."""
+        if self.fsm is None or self.fsm.current_state != GREETING_STATE:
+            return False
+        language_names = {code: name for name, code in LANGUAGE_CODES.items()}
+        run_state_tool(self.fsm, {"language": language_names.get(lang, "unknown")})
+        return True
+
+    async def _detect_language(self, transcript: str):
+        """Detects the language from the caller's first transcript; the language question is only asked below the confidence threshold."""
+        if self.fsm is None or self.fsm.current_state != GREETING_STATE:
+            return
+        guess = detect_language(transcript, self.caller_number)
+        logger.info(f"Detected language {guess.lang} with confidence {guess.confidence:.2f} for call {self.call_sid}")
+        confident = guess.lang is not None and guess.confidence >= settings.LANGUAGE_DETECTION_MIN_CONFIDENCE
+        if self._answer_greeting(guess.lang if confident else None):
+            await self._push_state()
+
+    async def _request_response(self):
+        """Starts a response now, or once the active one is done."""
+        if self._response_idle.is_set():
+            self._response_idle.clear()
+            await self.openai_service.create_response()
+        else:
+            self._response_requested = True
+
+    async def _push_state(self):
+        """Moves the session to the prompt and tools of the FSM's current state and lets the model speak it."""
+        state = self.fsm.get_current()
+        await self.openai_service.send_session_update(state.prompt, state.tools)
+        await self._request_response()
+
+    async def _handle_function_call(self, event: dict):
+        """Applies a function call of the model to the call FSM and answers it with the output and the next state."""
+        tool_name, call_id = event.get("name"), event.get("call_id")
+        if self.fsm is None:
+            logger.warning(f"Function call {tool_name} without a conversation flow, ignored")
+            return
+        try:
+            args = json.loads(event.get("arguments") or "{}")
+        except ValueError:
+            args = None
+        if tool_name == self.openai_service.end_call_key and self.fsm.is_finished():
+            # The goodbye of the final state's prompt is part of the same response
+            if self.end_call_task is None:
+                self.end_call_task = asyncio.create_task(self._end_call())
+            return
+
+        state = self.fsm.current_state
+        offered = {tool["name"] for tool in self.fsm.states[state].tools}
+        if not isinstance(args, dict):
+            output = {"error": "the arguments are not a JSON object"}
+        elif tool_name not in offered:
+            # A call that was in flight while the session moved on (e.g. after language detection)
+            output = {"error": f"{tool_name} is not available in this step"}
+        else:
+            started = time.perf_counter()
+            try:
+                # Everything the turn waits on (prefetches, upstream lookups) shares one budget
+                with latency_budget(settings.TURN_LATENCY_BUDGET_SECONDS):
+                    await self._await_prefetch(state)
+                    handle_tool_call(self.fsm, tool_name, args)
+                output = {"status": "ok"}
+            except (ValueError, KeyError, TypeError) as e:
+                # The FSM stays in the state and the model asks again
+                logger.error(f"Tool call {tool_name} failed in state {state} of call {self.call_sid}: {str(e)}")
+                output = {"error": "the answer could not be processed, ask the question again"}
+            metrics.observe("call.tool_call_ms", (time.perf_counter() - started) * 1000)
+        logger.info(f"Tool call {tool_name} in state {state} -> {self.fsm.current_state}: {output}")
+        await self.openai_service.send_function_call_output(call_id, output)
+        await self._push_state()
+
+    async def _await_prefetch(self, state: str):
+        """Lets a still running order history prefetch finish (within the turn's budget) before a state that reads it."""
+        verify = self.fsm.states[state].verify_from_func
+        context = self.fsm.collected_info.get("call_context")
+        if verify is None or verify["func"] not in ORDER_HISTORY_VERIFIERS or context is None or context.order_history_loaded:
+            return
+        started = time.perf_counter()
+        await context.wait_for_order_history()
+        logger.info(f"Waited {(time.perf_counter() - started) * 1000:.0f} ms for the order history of call {self.call_sid}")
+
+    async def _end_call(self):
+        """Hangs up once the goodbye has been generated and Twilio has played it (every mark came back), at most END_CALL_PLAYBACK_SECONDS later."""
+        deadline = time.monotonic() + END_CALL_PLAYBACK_SECONDS
+        try:
+            await asyncio.wait_for(self._response_idle.wait(), END_CALL_PLAYBACK_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        while self.mark_timestamps and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+        await self.twilio_service.end_call()
+        await self.shutdown()
+
+    def _snapshot_key(self) -> str:
+        # Per restaurant, a caller who drops an order at one restaurant does not resume it at another
+        return f"{self.restaurant.client_id}:{self.caller_number}" if self.caller_number else ""
+
+    def _save_fsm_snapshot(self, fsm):
+        """Called on every FSM transition, finished orders do not need to be resumed."""
+        if fsm.is_finished():
+            call_snapshot_store.delete(self._snapshot_key())
+            self._queue_order(fsm)
+        else:
+            call_snapshot_store.save(self._snapshot_key(), fsm.snapshot())
+
+    def _queue_order(self, fsm):
+        """Hands a confirmed cart to the order outbox, once per call; the caller does not wait for the submission."""
+        if fsm is None or self.restaurant is None or self._order_queued:
+            return
+        order = order_from_fsm(fsm, self.caller_number, self.restaurant.client_id)
+        if order is None:
+            return
+        self._order_queued = True
+        order_outbox.enqueue_later(self.call_sid, self.restaurant.client_id, order)
+        # A call back must not resume (and submit) the same order again
+        call_snapshot_store.delete(self._snapshot_key())
+
+    def _release_restaurant(self):
+        restaurants.release(self.restaurant)
+        self.restaurant = None
+
     def set_caller_number(self, caller_number):
         self.caller_number = caller_number
         self.openai_service.collected_info_update("caller_number", caller_number)
@@ -307,8 +506,18 @@ class CallOrchestrator:
             # Close OpenAI WebSocket
             await self.openai_service.close_websocket()
 
+            # The caller may hang up after confirming, before end_call
+            self._queue_order(self.fsm)
+
+            # Remember the caller's language for the next call
+            if self.fsm is not None and self.fsm.lang and self.caller_number:
+                await save_language_preference(self.caller_number, self.fsm.lang)
+
             # Clean up session
             self.session_manager.delete_session()
+            release_fsm(self.call_sid)
+            call_contexts.release(self.call_sid)
+            self._release_restaurant()
 
             logger.info(f"Shutdown completed for call {self.call_sid}")
 
@@ -348,6 +557,10 @@ class CallOrchestrator:
         # Clean up session
         if hasattr(self, "session_manager") and self.session_manager:
             self.session_manager.delete_session()
+        self._queue_order(self.fsm)
+        release_fsm(self.call_sid)
+        call_contexts.release(self.call_sid)
+        self._release_restaurant()
 
         # Execute all cleanup tasks with timeout
         if cleanup_tasks:
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Marks a pending delete in CallSnapshotStore._pending
+_DELETE = None
+
+
+class CallSnapshotStore:
+    """
+    Local store for FSM snapshots keyed by caller number.
+
+    One small JSON file per caller, replaced atomically (write to a temp file + os.replace). A
+    snapshot holds only what resuming needs (state, language and the slots collected so far, see
+    `ConversationFSM.snapshot`), never the transcript. File I/O runs in a thread: saves and deletes
+    are queued per caller and written in order by one task, so a burst of transitions costs one
+    write and the event loop never waits on the disk. Snapshots older than the resume window are
+    removed by a periodic sweep, whether or not the caller calls again.
+    """
+
+    def __init__(self, directory, resume_window_seconds: int):
+        self.directory = Path(directory)
+        self.resume_window_seconds = resume_window_seconds
+        self._pending: Dict[str, Optional[dict]] = {}
+        self._writers: Dict[str, asyncio.Task] = {}
+        self._sweep_task: Optional[asyncio.Task] = None
+
+    def _path(self, caller_number: str) -> Path:
+        # Hashed so phone numbers are not visible in file names
+        return self.directory / f"{hashlib.sha1(caller_number.encode()).hexdigest()}.json"
+
+    def _write(self, caller_number: str, snapshot: dict):
+        path = self._path(caller_number)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, separators=(",", ":"), ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to write call snapshot: {str(e)}")
+
+    def _remove(self, caller_number: str):
+        try:
+            os.remove(self._path(caller_number))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Failed to delete call snapshot: {str(e)}")
+
+    def _read(self, caller_number: str) -> Optional[dict]:
+        try:
+            with open(self._path(caller_number), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read call snapshot: {str(e)}")
+            return None
+
+    def save(self, caller_number: str, snapshot: dict):
+        """Queues the snapshot for writing; needs a running event loop."""
+        self._queue(caller_number, snapshot)
+
+    def delete(self, caller_number: str):
+        self._queue(caller_number, _DELETE)
+
+    def _queue(self, caller_number: str, snapshot: Optional[dict]):
+        if not caller_number:
+            return
+        # Only the latest save or delete of a caller is written
+        self._pending[caller_number] = snapshot
+        if caller_number not in self._writers:
+            self._writers[caller_number] = asyncio.get_running_loop().create_task(self._flush(caller_number))
+
+    async def _flush(self, caller_number: str):
+        try:
+            while caller_number in self._pending:
+                snapshot = self._pending.pop(caller_number)
+                if snapshot is _DELETE:
+                    await asyncio.to_thread(self._remove, caller_number)
+                else:
+                    await asyncio.to_thread(self._write, caller_number, snapshot)
+        finally:
+            self._writers.pop(caller_number, None)
+
+    async def load_recent(self, caller_number: str) -> Optional[dict]:
+        """Returns the caller's snapshot if it was written within the resume window."""
+        if not caller_number:
+            return None
+        if caller_number in self._pending:
+            snapshot = self._pending[caller_number]
+        else:
+            snapshot = await asyncio.to_thread(self._read, caller_number)
+        if snapshot is None:
+            return None
+        if time.time() - snapshot.get("saved_at", 0) > self.resume_window_seconds:
+            self.delete(caller_number)
+            return None
+        return snapshot
+
+    def sweep(self) -> int:
+        """Removes snapshots (and temp files of crashed writes) older than the resume window. Returns how many."""
+        cutoff = time.time() - self.resume_window_seconds
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Failed to remove expired call snapshot: {str(e)}")
+        if removed:
+            logger.info(f"Removed {removed} expired call snapshot(s)")
+        return removed
+
+    async def _run_sweep(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception:
+                logger.exception("Call snapshot sweep failed")
+            await asyncio.sleep(max(self.resume_window_seconds, 60))
+
+    def start(self):
+        """Starts the periodic sweep on the running event loop; a no-op while it is running."""
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.get_running_loop().create_task(self._run_sweep())
+
+    def stop(self):
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+            self._sweep_task = None
+
+
+call_snapshot_store = CallSnapshotStore(settings.CALL_SNAPSHOT_DIR, settings.CALL_RESUME_WINDOW_SECONDS)
@@ -0,0 +1,145 @@
+"""
+Ingestion of Twilio call status callbacks (ringing, in-progress, completed, with duration).
+
+Twilio posts one callback per call state change to `/call-status` (set it as the "call status
+changes" webhook of the phone numbers, with the events to send). The view validates the request
+signature and the fields and hands the event to `call_status_buffer`; it never writes to the
+database itself. The buffer keeps events in memory and a background task writes them to
+`CallStatusEvent` with one bulk insert every CALL_STATUS_FLUSH_SECONDS, or as soon as
+CALL_STATUS_BATCH_SIZE events are waiting. A failed insert is retried on the next flush. At most
+CALL_STATUS_MAX_BUFFERED events are held, newer ones are dropped (and counted) while the database
+is unreachable; events still buffered when the process dies are lost.
+
+Metrics: `call_status.received|rejected|dropped|written|flush_failed` counters, the
+`call_status.buffered` gauge and `call_status.flush_ms`.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from email.utils import parsedate_to_datetime
+from typing import List, Optional
+
+from django.utils import timezone
+
+from common.utils.metrics import metrics
+from db.models import CallStatusEvent
+
+logger = logging.getLogger(__name__)
+
+CALL_STATUS_FLUSH_SECONDS = float(os.getenv("CALL_STATUS_FLUSH_SECONDS", "5"))
+CALL_STATUS_BATCH_SIZE = int(os.getenv("CALL_STATUS_BATCH_SIZE", "500"))
+CALL_STATUS_MAX_BUFFERED = int(os.getenv("CALL_STATUS_MAX_BUFFERED", "20000"))
+
+CALL_STATUSES = {"queued", "initiated", "ringing", "in-progress", "completed", "busy", "no-answer", "canceled", "failed"}
+
+
+def _optional_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _occurred_at(timestamp: Optional[str]):
+    """Twilio's RFC 2822 Timestamp ("Mon, 16 Aug 2010 03:45:01 +0000"), the receive time without one."""
+    if timestamp:
+        try:
+            return parsedate_to_datetime(timestamp)
+        except (TypeError, ValueError):
+            pass
+    return timezone.now()
+
+
+def event_from_callback(params) -> Optional[CallStatusEvent]:
+    """The unsaved row of a callback's form parameters, None when it has no CallSid or an unknown CallStatus."""
+    call_sid, status = params.get("CallSid", ""), params.get("CallStatus", "")
+    if not call_sid or len(call_sid) > 50 or status not in CALL_STATUSES:
+        return None
+    return CallStatusEvent(
+        call_session_id=call_sid,
+        status=status,
+        sequence_number=_optional_int(params.get("SequenceNumber")),
+        duration=_optional_int(params.get("CallDuration")),
+        direction=params.get("Direction", "")[:20],
+        from_number=params.get("From", "")[:32],
+        to_number=params.get("To", "")[:32],
+        occurred_at=_occurred_at(params.get("Timestamp")),
+    )
+
+
+class CallStatusBuffer:
+    def __init__(
+        self, batch_size: int = CALL_STATUS_BATCH_SIZE, flush_seconds: float = CALL_STATUS_FLUSH_SECONDS, max_buffered: int = CALL_STATUS_MAX_BUFFERED
+    ):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_buffered = max_buffered
+        self._events: List[CallStatusEvent] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def add(self, event: CallStatusEvent) -> bool:
+        """Buffers the event for the next flush; False when the buffer is full and it was dropped."""
+        if len(self._events) >= self.max_buffered:
+            metrics.increment("call_status.dropped")
+            return False
+        self._events.append(event)
+        metrics.increment("call_status.received")
+        if len(self._events) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+        return True
+
+    async def flush(self) -> int:
+        """Writes the buffered events in one bulk insert. Returns how many were written."""
+        events, self._events = self._events, []
+        if not events:
+            return 0
+        started = time.perf_counter()
+        try:
+            await CallStatusEvent.objects.abulk_create(events, batch_size=self.batch_size)
+        except Exception:
+            # Back in front of the events that arrived meanwhile, within the buffer limit
+            kept = events[: max(self.max_buffered - len(self._events), 0)]
+            self._events[:0] = kept
+            metrics.increment("call_status.flush_failed")
+            if len(kept) < len(events):
+                metrics.increment("call_status.dropped", len(events) - len(kept))
+            raise
+        finally:
+            metrics.set_gauge("call_status.buffered", len(self._events))
+        metrics.observe("call_status.flush_ms", (time.perf_counter() - started) * 1000)
+        metrics.increment("call_status.written", len(events))
+        return len(events)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception(f"Writing {len(self._events)} call status events failed, retrying on the next flush")
+                # A full batch would wake the flush again right away; give the database time to recover
+                await asyncio.sleep(self.flush_seconds)
+
+    def start(self):
+        """Starts the periodic flush on the running event loop; a no-op while it is running."""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+call_status_buffer = CallStatusBuffer()
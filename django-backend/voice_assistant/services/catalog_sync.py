@@ -0,0 +1,153 @@
+"""
+Keeps the order flow's vocabularies (tool enums and `{@...}` prompt lists) in line with the Foodticket menu.
+
+The hand-maintained lists in `conversation_openai_tools` are only the defaults. One `CatalogSync`
+runs per restaurant (see `restaurants`): a background task re-reads the client's catalog from
+`catalog_cache` every CATALOG_SYNC_INTERVAL_SECONDS and, when the menu changed, derives new
+vocabularies from it and recompiles the restaurant's flows with them.
+Running calls keep the flow they started with; new calls get the new enums. A vocabulary the
+catalog cannot provide keeps its current list.
+
+The new vocabularies are built and the flows compiled in a worker thread without publishing them
+(`FlowRegistry.compile_all`). Back on the event loop the compiled flows and `current` are installed
+together (`FlowRegistry.install`), so a call never gets the new tool enums with the old vocabularies,
+and `current` is replaced, never changed in place, so verifiers always see one whole snapshot.
+The module-level lists in `conversation_openai_tools` stay the hand-maintained defaults.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+from common.utils.metrics import metrics
+from integrations.foodticket_client.catalog_cache import Catalog, catalog_cache
+from integrations.foodticket_client.client import DEFAULT_CLIENT_ID
+from integrations.foodticket_client.pricing import SIZE_GROUP
+from integrations.foodticket_client.product_options import DRINKS_GROUP, TOPPINGS_GROUP, canonical_size
+from voice_assistant.state_machine.conversation_openai_tools import vocabularies
+from voice_assistant.state_machine.manager import flow_registry
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SYNC_INTERVAL_SECONDS = int(os.getenv("CATALOG_SYNC_INTERVAL_SECONDS", "900"))
+
+
+def _unique(items) -> list:
+    return list(dict.fromkeys(item for item in items if item))
+
+
+def vocabularies_from_catalog(catalog: Catalog, current: Mapping[str, list]) -> Dict[str, list]:
+    """Products are the titles that come with a size choice (the pizzas); sizes, toppings and drinks are extra options."""
+    pizzas, sizes, toppings, drinks = [], [], [], []
+    for product in catalog.products:
+        groups = catalog.extras.groups_for_product(product["id"])
+        if any(group.name == SIZE_GROUP for group in groups):
+            pizzas.append(product["title"])
+        for group in groups:
+            if group.name == SIZE_GROUP:
+                sizes.extend(map(canonical_size, group.options))
+            elif group.name == TOPPINGS_GROUP:
+                toppings.extend(group.options)
+            elif group.name == DRINKS_GROUP:
+                drinks.extend(group.options)
+    synced = {"products": _unique(pizzas), "sizes": sorted(_unique(sizes)), "toppings": sorted(_unique(toppings)), "drinks": sorted(_unique(drinks))}
+    return {name: synced.get(name) or list(items) for name, items in current.items()}
+
+
+def vocabulary_diff(old: Mapping[str, list], new: Mapping[str, list]) -> Dict[str, Tuple[list, list]]:
+    """{name: (added, removed)} for every vocabulary that changed."""
+    diff = {}
+    for name, items in new.items():
+        previous = old.get(name, [])
+        added = [item for item in items if item not in previous]
+        removed = [item for item in previous if item not in items]
+        if added or removed:
+            diff[name] = (added, removed)
+    return diff
+
+
+def log_diff(client_id: int, diff: Dict[str, Tuple[list, list]]):
+    for name, (added, removed) in diff.items():
+        logger.info(f"Vocabulary '{name}' of client {client_id}: +{len(added)} {added} -{len(removed)} {removed}")
+
+
+def _catalog_version(catalog: Catalog) -> tuple:
+    return (id(catalog.products), id(catalog.extras))
+
+
+class CatalogSync:
+    def __init__(self, registry, current: Mapping[str, list], client_id: int = DEFAULT_CLIENT_ID, interval_seconds: int = CATALOG_SYNC_INTERVAL_SECONDS):
+        self.registry = registry
+        # Latest vocabularies snapshot, replaced by `_swap` and never mutated
+        self.current = current
+        self.client_id = client_id
+        self.interval_seconds = interval_seconds
+        self._applied_version = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _build(self, catalog: Catalog) -> Tuple[Optional[Dict[str, list]], Optional[dict], Dict[str, Tuple[list, list]]]:
+        """
+        Derives new vocabularies and compiles the flows with them, publishing nothing.
+        Returns (new or None, compiled flows or None, diff).
+        """
+        started = time.perf_counter()
+        new = vocabularies_from_catalog(catalog, self.current)
+        diff = vocabulary_diff(self.current, new)
+        compiled = self.registry.compile_all(new) if diff else None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.observe("catalog_sync.apply_ms", elapsed_ms)
+        logger.info(f"Catalog sync for client {catalog.client_id}: {len(diff)} vocabularies changed in {elapsed_ms:.1f} ms")
+        return (new if diff else None), compiled, diff
+
+    def _swap(
+        self, catalog: Catalog, new: Optional[Dict[str, list]], compiled: Optional[dict], diff: Dict[str, Tuple[list, list]]
+    ) -> Dict[str, Tuple[list, list]]:
+        if new is not None:
+            # Flows and vocabularies change together, with no await in between
+            self.registry.install(new, compiled)
+            self.current = new
+            log_diff(catalog.client_id, diff)
+            metrics.increment("catalog_sync.vocabulary_changes")
+        self._applied_version = _catalog_version(catalog)
+        return diff
+
+    def apply(self, catalog: Catalog) -> Dict[str, Tuple[list, list]]:
+        """Swaps in the catalog's vocabularies when they differ from the current ones. Returns the diff."""
+        if _catalog_version(catalog) == self._applied_version:
+            return {}
+        return self._swap(catalog, *self._build(catalog))
+
+    async def sync(self) -> Dict[str, Tuple[list, list]]:
+        catalog = catalog_cache.peek(self.client_id)
+        if catalog is None or catalog_cache.is_stale(catalog):
+            catalog = await catalog_cache.refresh(self.client_id)
+        if _catalog_version(catalog) == self._applied_version:
+            return {}
+        # Recompiling the flows is CPU work, keep it off the event loop that serves the audio streams;
+        # the result is installed back on the loop, where calls read it
+        new, compiled, diff = await asyncio.to_thread(self._build, catalog)
+        return self._swap(catalog, new, compiled, diff)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync()
+            except Exception:
+                metrics.increment("catalog_sync.failed")
+                logger.exception(f"Catalog sync for client {self.client_id} failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """Starts the periodic sync on the running event loop; a no-op while it is running."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+catalog_sync = CatalogSync(flow_registry, vocabularies)
@@ -0,0 +1,91 @@
+"""
+Fast local language detection for Turkish, Dutch and English caller transcripts.
+
+Scores a transcript with marker words, language specific letters and suffixes, optionally
+biased by the caller's country code. Language codes are the ones used by the FSM: "tr", "du", "en".
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+LANGUAGES = ("tr", "du", "en")
+
+MARKER_WORDS = {
+    "tr": {
+        "merhaba", "selam", "evet", "hayır", "hayir", "tamam", "bir", "iki", "üç", "uc", "dört", "istiyorum", "isterim",
+        "sipariş", "siparis", "siparişimi", "vermek", "teslim", "almak", "getirin", "lütfen", "lutfen", "teşekkürler",
+        "tesekkurler", "ne", "zaman", "nerede", "ve", "bu", "şu", "için", "icin", "büyük", "küçük", "orta", "adresim",
+        "türkçe", "turkce",
+    },
+    "du": {
+        "hallo", "goedemiddag", "goedenavond", "goedemorgen", "ja", "nee", "ik", "wil", "graag", "een", "twee", "drie",
+        "bestellen", "bestelling", "bezorgen", "ophalen", "alstublieft", "alsjeblieft", "dank", "bedankt", "het", "de",
+        "van", "mijn", "met", "voor", "maar", "niet", "wat", "hoe", "groot", "klein", "nederlands", "dutch",
+    },
+    "en": {
+        "hello", "hi", "yes", "no", "i", "want", "would", "like", "order", "please", "the", "to", "two", "three",
+        "deliver", "delivery", "pickup", "pick", "up", "thanks", "thank", "you", "my", "with", "for", "what", "how",
+        "large", "small", "medium", "english",
+    },
+}
+
+LETTERS = {"tr": set("çğışöüÇĞİŞÖÜ")}
+
+SUFFIXES = {
+    "tr": re.compile(r"(iyorum|ıyorum|uyorum|üyorum|yorum|mısınız|misiniz|lar|ler|sınız|siniz)\b"),
+    "du": re.compile(r"(ij|sch|aa|oo|uu|oe|ui)"),
+    "en": re.compile(r"(th|ing\b|ould\b)"),
+}
+
+COUNTRY_CODES = {"+90": "tr", "+31": "du", "+32": "du", "+44": "en", "+1": "en", "+353": "en"}
+
+WORD_WEIGHT = 1.0
+LETTER_WEIGHT = 1.5
+SUFFIX_WEIGHT = 0.3
+COUNTRY_WEIGHT = 0.75
+MIN_EVIDENCE = 1.0
+STRONG_EVIDENCE = 2.0  # A single marker word ("yes", "ja") is not enough for full confidence
+
+_tokenizer = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+@dataclass(frozen=True)
+class LanguageGuess:
+    lang: Optional[str]
+    confidence: float
+
+
+def language_from_country_code(phone_number: Optional[str]) -> Optional[str]:
+    if not phone_number:
+        return None
+    # Longest prefix first so "+353" is not read as "+3"
+    for prefix in sorted(COUNTRY_CODES, key=len, reverse=True):
+        if phone_number.startswith(prefix):
+            return COUNTRY_CODES[prefix]
+    return None
+
+
+def detect_language(transcript: str, phone_number: Optional[str] = None) -> LanguageGuess:
+    """Returns the most likely language and a 0..1 confidence (share of the total score, damped for little evidence)."""
+    scores = dict.fromkeys(LANGUAGES, 0.0)
+    tokens = _tokenizer.findall(transcript.lower())
+    for token in set(tokens):
+        for lang in LANGUAGES:
+            if token in MARKER_WORDS[lang]:
+                scores[lang] += WORD_WEIGHT
+    for lang, letters in LETTERS.items():
+        scores[lang] += LETTER_WEIGHT * min(3, sum(1 for char in transcript if char in letters))
+    for lang, pattern in SUFFIXES.items():
+        scores[lang] += SUFFIX_WEIGHT * min(3, len(pattern.findall(transcript.lower())))
+
+    best = max(scores, key=scores.get)
+    if scores[best] < MIN_EVIDENCE:
+        return LanguageGuess(None, 0.0)
+
+    country_lang = language_from_country_code(phone_number)
+    if country_lang:
+        scores[country_lang] += COUNTRY_WEIGHT
+        best = max(scores, key=scores.get)
+    share = scores[best] / sum(scores.values())
+    return LanguageGuess(best, share * min(1.0, scores[best] / STRONG_EVIDENCE))
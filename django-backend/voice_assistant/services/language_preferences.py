@@ -0,0 +1,41 @@
+"""
+The language a caller spoke on their last call, so a call back opens in that language.
+
+Kept in the database (`CallerLanguagePreference`) so every worker process sees it; a preference
+older than LANGUAGE_PREFERENCE_TTL_SECONDS is ignored. A database error only costs the shortcut:
+the call then starts with the greeting and the language is detected again.
+"""
+
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from db.models import CallerLanguagePreference
+
+logger = logging.getLogger(__name__)
+
+
+def caller_hash(caller_number: str) -> str:
+    return hashlib.sha1(caller_number.encode()).hexdigest()
+
+
+async def load_language_preference(caller_number: str) -> Optional[str]:
+    oldest = timezone.now() - timedelta(seconds=settings.LANGUAGE_PREFERENCE_TTL_SECONDS)
+    try:
+        preference = await CallerLanguagePreference.objects.filter(caller_hash=caller_hash(caller_number), updated_at__gte=oldest).afirst()
+    except DatabaseError:
+        logger.exception("Loading the caller's language preference failed")
+        return None
+    return preference.lang if preference else None
+
+
+async def save_language_preference(caller_number: str, lang: str):
+    try:
+        await CallerLanguagePreference.objects.aupdate_or_create(caller_hash=caller_hash(caller_number), defaults={"lang": lang})
+    except DatabaseError:
+        logger.exception("Saving the caller's language preference failed")
@@ -10,61 +10,10 @@ from collections import defaultdict
 from functools import partial
 from django.conf import settings
 from common.utils.enums import OpenAIEvent
-from integrations.foodticket_client.postcode_check import get_zipcode_info
-from integrations.foodticket_client.menu_pull import find_product_by_name
-from integrations.foodticket_client.order_info_retrieve import fetch_flat_orders_by_phone_last_3_days
-from voice_assistant.state_machine.order_flow import order_flow_states, application_detail_prompt
 
 logger = logging.getLogger(__name__)
 
 
-INSTRUCTION_PROMPT = """
-ROL: Sen "VizeDanışman Ltd." isimli bir vize danışmanlık firmasının telefon asistanısın. 
-AMAÇ: Arayan müşterilere sadece aşağıdaki şirket dokümanındaki bilgilerden yararlanarak yardımcı ol. 
-DAVRANIŞ: 
-- Kısa, net ve nazik cevaplar ver. 
-- Eğer dokümanda olmayan bir bilgi sorulursa, "Bu konuda elimde bilgi yok, danışmanlarımız size yardımcı olacaktır." de. 
-- Asla tahmin yürütme veya uydurma. 
-- Gerektiğinde ek bilgi için yönlendirme yapabilirsin (ör. "Detay için ofisimizle iletişime geçebilirsiniz"). 
-- Cevapları konuşma diliyle ver, yazılı rapor gibi değil. 
-
---- ŞİRKET BİLGİ DOKÜMANI ---
-VizeDanışman Ltd., 2010 yılından beri Türkiye’de öğrenci, iş ve turistik vizeler konusunda danışmanlık hizmeti vermektedir. İstanbul, Ankara ve İzmir’de ofislerimiz bulunmaktadır. Her yıl yaklaşık 5000 başvuru sürecinde danışanlarımıza destek olmaktayız.  
-
-Misyonumuz, vize süreçlerini karmaşık ve stresli olmaktan çıkararak hızlı, güvenilir ve şeffaf bir hizmet sunmaktır.  
-
-Çalıştığımız ülkeler:  
-- Avrupa: Almanya, Hollanda, Fransa, İtalya, İspanya, Belçika  
-- Kuzey Amerika: ABD, Kanada  
-- Asya: Japonya, Güney Kore, Çin  
-- Orta Doğu: BAE, Katar  
-
-Hizmetlerimiz:  
-1. Danışmanlık görüşmesi  
-2. Belgelerin hazırlanması  
-3. Başvuru takibi  
-4. Dil desteği (çeviri)  
-5. Ek hizmetler: seyahat sigortası, uçak/otel rezervasyonu  
-
-Ücretler:  
-- Standart Paket: 2500 TL  
-- Öğrenci İndirimli Paket: 1800 TL  
-- VIP Paket: 5000 TL  
-(Konsolosluk harçları dahil değildir.)  
-
-Sık Sorulan Sorular:  
-- Vizeyi garanti ediyor musunuz? → Hayır, onay tamamen konsolosluk kararına bağlıdır.  
-- Ortalama sonuç süresi → Avrupa: 15 iş günü, ABD: 4–6 hafta, Kanada: 6–8 hafta  
-- Red alırsam ne olur? → Ret mektubu incelenir, yeni başvuru stratejisi hazırlanır.  
-
-İletişim:  
-- Telefon: +90 212 555 00 00  
-- E-posta: info@vizedanisman.com  
-- Adresler: İstanbul/Şişli, Ankara/Çankaya, İzmir/Konak  
-- Çalışma Saatleri: Hafta içi 09:00–18:00, Cumartesi 10:00–15:00  
-"""
-
-
 class OpenAIService:
     def __init__(self, end_call_callback=None):
         self.collected_info = {}
@@ -78,6 +27,9 @@ class OpenAIService:
         self._connection_lock = asyncio.Lock()
         self.is_pick_up = False
 
+    def collected_info_update(self, key, value):
+        self.collected_info["params"][key] = value
+
     async def open_websocket(self):
         # logger.info(f'Connecting to OpenAI Realtime API with key: {settings.OPENAI_API_KEY}')
         """OpenAI Realtime API'a bağlan."""
@@ -101,10 +53,31 @@ class OpenAIService:
                 raise
 
     async def send_session_update_with_prompt(self, prompt: str, tools: list):
-        await self.websocket.send(json.dumps({"type": "session.update", "session": {"instructions": prompt, "tools": tools, "tool_choice": "auto"}}))
-        await self.websocket.send(json.dumps({"type": "response.create", "response": {"modalities": ["text", "audio"]}}))
+        await self.send_session_update(prompt, tools)
+        await self.create_response()
+
+    async def send_session_update(self, prompt: str, tools: list):
+        """Switches the instructions and tools for the following responses, without starting one."""
+        await self.websocket.send(
+            json.dumps({"type": OpenAIEvent.SESSION_UPDATE.value, "session": {"instructions": prompt, "tools": tools, "tool_choice": "auto"}})
+        )
+
+    async def create_response(self):
+        await self.websocket.send(json.dumps({"type": OpenAIEvent.RESPONSE_CREATE.value, "response": {"modalities": ["text", "audio"]}}))
+
+    async def send_function_call_output(self, call_id: str, output: dict):
+        """Answers a function call of the model; it continues with the next response.create."""
+        await self.websocket.send(
+            json.dumps(
+                {
+                    "type": OpenAIEvent.CONVERSATION_ITEM_CREATE.value,
+                    "item": {"type": "function_call_output", "call_id": call_id, "output": json.dumps(output)},
+                }
+            )
+        )
 
-    async def send_initial_config(self):
+    async def send_initial_config(self, instructions: str, tools: list = None, first_message: str = None):
+        """Configures the session and starts the first response; `first_message` is sent as the caller's opening line."""
         try:
             if not self.websocket or self.websocket.closed:
                 raise ConnectionError("WebSocket is not open or already closed")
@@ -112,56 +85,44 @@ class OpenAIService:
             logger.info("Sending initial configuration to OpenAI")
 
             # Session config (basic prompt ve config)
-            await self.websocket.send(
-                json.dumps(
-                    {
-                        "type": OpenAIEvent.SESSION_UPDATE.value,
-                        "session": {
-                            "turn_detection": {
-                                "type": "semantic_vad",
-                                "eagerness": "medium",  # You can use "low", "medium", "high", or "auto"
-                                "create_response": True,
-                                "interrupt_response": True,
-                            },
-                            "temperature": 0.8,
-                            "input_audio_format": "g711_ulaw",
-                            "output_audio_format": "g711_ulaw",
-                            "voice": "sage",
-                            "modalities": ["text", "audio"],
-                            "input_audio_transcription": {"model": "whisper-1"},
-                            "instructions": application_detail_prompt,
-                            "tool_choice": "auto",
-                        },
-                    }
-                )
-            )
+            session = {
+                "turn_detection": {
+                    "type": "semantic_vad",
+                    "eagerness": "medium",  # You can use "low", "medium", "high", or "auto"
+                    "create_response": True,
+                    "interrupt_response": True,
+                },
+                "temperature": 0.8,
+                "input_audio_format": "g711_ulaw",
+                "output_audio_format": "g711_ulaw",
+                "voice": "sage",
+                "modalities": ["text", "audio"],
+                "input_audio_transcription": {"model": "whisper-1"},
+                "instructions": instructions,
+                "tool_choice": "auto",
+            }
+            if tools is not None:
+                session["tools"] = tools
+            await self.websocket.send(json.dumps({"type": OpenAIEvent.SESSION_UPDATE.value, "session": session}))
 
             # 2. İlk kullanıcı mesajını gönder (konuşmayı başlatmak için)
-            await self.websocket.send(
-                json.dumps(
-                    {
-                        "type": "conversation.item.create",
-                        "item": {
-                            "type": "message",
-                            "role": "user",
-                            "content": [
-                                {"type": "input_text", "text": "Merhaba, VizeDanışman Ltd.’ye hoş geldiniz. Size nasıl yardımcı olabilirim?"}
-                            ],
-                        },
-                    }
+            if first_message:
+                await self.websocket.send(
+                    json.dumps(
+                        {
+                            "type": "conversation.item.create",
+                            "item": {
+                                "type": "message",
+                                "role": "user",
+                                "content": [{"type": "input_text", "text": first_message}],
+                            },
+                        }
+                    )
                 )
-            )
 
             # İlk response.create gönderiyoruz ki AI sesli yanıt vermeye başlasın.
             # Sadece yukarıdaki session.update'i göndermek konuşmayı başlatmıyor.
-            await self.websocket.send(
-                json.dumps(
-                    {
-                        "type": OpenAIEvent.RESPONSE_CREATE.value,
-                        "response": {"modalities": ["text", "audio"]},
-                    }
-                )
-            )
+            await self.create_response()
             logger.info("Initial configuration HAS SENT to OpenAI")
 
         except Exception as e:
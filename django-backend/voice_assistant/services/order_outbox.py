@@ -0,0 +1,228 @@
+"""
+Durable submission of confirmed orders to Foodticket.
+
+A call never waits on the order POST. When a call with a confirmed cart ends (end_call, or the
+caller hangs up after confirming) the order is written to the `OrderOutbox` table under an
+idempotency key derived from the call_sid, and the background worker submits it. Failed
+submissions are retried with exponential backoff and jitter; every attempt sends the same
+Idempotency-Key, so a retry after a lost response does not create a second order. Orders that
+still fail after ORDER_OUTBOX_MAX_ATTEMPTS (or are rejected with a 4xx) are marked failed.
+
+The payload refers to the catalog by Foodticket ids: every order line carries the product id, the
+extra ids of its size and toppings, and its unit price; amounts are integer cents. It is priced
+from the same cached catalog the caller was quoted from (`verifiers.order_quote`), so a confirmed
+cart with a line that does not resolve to catalog ids is not queued (logged and counted as
+`order_outbox.unpriced`) rather than submitted as free text. Neither is a cart whose delivery type
+was never settled (`order_outbox.no_delivery_type`): the flow confirms pickup or delivery before
+confirm_order, and the outbox does not guess one.
+
+Rows are claimed by pushing `next_attempt_at` forward by a lease, so several worker processes can
+share the table and a row whose worker died is picked up again once the lease expires. Pending
+rows left by a restart are sent when the worker starts (first call) or by `manage.py submit_orders`.
+
+Metrics: `order_outbox.enqueued|enqueue_failed|unpriced|no_delivery_type|submitted|retried|failed` counters, the
+`order_outbox.pending` gauge, `order_outbox.submit_ms` (POST latency) and
+`order_outbox.queue_seconds` (call end to submission).
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.utils import timezone
+
+from common.utils.metrics import metrics
+from common.utils.resilience import CircuitOpenError
+from db.models import OrderOutbox
+from integrations.foodticket_client.client import BREAKER_RESET_SECONDS, DEFAULT_CLIENT_ID, FoodticketAPIError, FoodticketClient, foodticket_client
+from voice_assistant.state_machine.verifiers import order_quote
+
+logger = logging.getLogger(__name__)
+
+ORDER_OUTBOX_POLL_SECONDS = float(os.getenv("ORDER_OUTBOX_POLL_SECONDS", "10"))
+ORDER_OUTBOX_BATCH_SIZE = int(os.getenv("ORDER_OUTBOX_BATCH_SIZE", "20"))
+ORDER_OUTBOX_MAX_ATTEMPTS = int(os.getenv("ORDER_OUTBOX_MAX_ATTEMPTS", "12"))
+ORDER_OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("ORDER_OUTBOX_RETRY_BASE_SECONDS", "5"))
+ORDER_OUTBOX_RETRY_MAX_SECONDS = float(os.getenv("ORDER_OUTBOX_RETRY_MAX_SECONDS", "600"))
+# A claimed row is not picked up by another worker for this long
+ORDER_OUTBOX_LEASE_SECONDS = 60
+
+# Rejections that may succeed later: timeout, conflict with a submission still in progress, rate limit
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429}
+
+
+def idempotency_key(call_sid: str) -> str:
+    """One order per call."""
+    return f"order-{call_sid}"
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, so orders failed by the same outage are not retried in lockstep."""
+    delay = min(ORDER_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), ORDER_OUTBOX_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def order_from_fsm(fsm, caller_number: Optional[str], client_id: int = DEFAULT_CLIENT_ID) -> Optional[dict]:
+    """The order payload of a call, None unless the caller confirmed pickup or delivery and a cart that resolves to catalog ids."""
+    params = fsm.collected_info.get("params", {})
+    if not params.get("order_confirmed"):
+        return None
+    delivery_type = params.get("delivery_type")
+    if delivery_type not in ("pickup", "delivery"):
+        metrics.increment("order_outbox.no_delivery_type")
+        logger.error(f"Confirmed order of client {client_id} not queued, the caller never confirmed pickup or delivery")
+        return None
+    quote = order_quote(params, client_id)
+    if quote is None or not quote.complete or not quote.lines:
+        metrics.increment("order_outbox.unpriced")
+        logger.error(f"Confirmed order of client {client_id} not queued, lines without catalog ids: {quote.unpriced if quote else 'no catalog'}")
+        return None
+    order = {
+        "phone": caller_number or "",
+        "lang": fsm.lang,
+        "delivery_type": delivery_type,
+        "orderlines": [
+            {
+                "product_id": priced_line.product_id,
+                "quantity": priced_line.line.quantity,
+                "extras": list(priced_line.option_ids),
+                "price_cents": priced_line.unit_cents,
+            }
+            for priced_line in quote.lines
+        ],
+        "note": params.get("note", ""),
+        "delivery_costs_cents": quote.delivery_cents,
+        "total_cents": quote.total_cents,
+    }
+    if delivery_type == "delivery":
+        order["address"] = {key: params.get(key, "") for key in ("street", "house_number", "zip_code", "city")}
+    return order
+
+
+def _log_enqueue_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        metrics.increment("order_outbox.enqueue_failed")
+        logger.error("Queueing an order failed", exc_info=task.exception())
+
+
+class OrderOutboxWorker:
+    def __init__(self, batch_size: int = ORDER_OUTBOX_BATCH_SIZE, poll_seconds: float = ORDER_OUTBOX_POLL_SECONDS):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self._clients: Dict[int, FoodticketClient] = {DEFAULT_CLIENT_ID: foodticket_client}
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def client_for(self, client_id: int) -> FoodticketClient:
+        client = self._clients.get(client_id)
+        if client is None:
+            client = self._clients[client_id] = FoodticketClient(client_id)
+        return client
+
+    async def enqueue(self, call_sid: str, client_id: int, order: dict) -> bool:
+        """Writes the order to the outbox; False when the call's order was queued before."""
+        _, created = await OrderOutbox.objects.aget_or_create(
+            idempotency_key=idempotency_key(call_sid), defaults={"call_sid": call_sid, "client_id": client_id, "payload": order}
+        )
+        if created:
+            metrics.increment("order_outbox.enqueued")
+            logger.info(f"Order of call {call_sid} queued for client {client_id}")
+            if self._wake is not None:
+                self._wake.set()
+        return created
+
+    def enqueue_later(self, call_sid: str, client_id: int, order: dict) -> asyncio.Task:
+        """`enqueue` as a task, for callers on the audio path that must not wait for the database."""
+        task = asyncio.get_running_loop().create_task(self.enqueue(call_sid, client_id, order))
+        task.add_done_callback(_log_enqueue_failure)
+        return task
+
+    async def _claim_due(self) -> list:
+        now = timezone.now()
+        pending = OrderOutbox.objects.filter(status=OrderOutbox.PENDING)
+        due = [row async for row in pending.filter(next_attempt_at__lte=now).order_by("next_attempt_at")[: self.batch_size]]
+        lease_until = now + timedelta(seconds=ORDER_OUTBOX_LEASE_SECONDS)
+        claimed = []
+        for row in due:
+            # Only one worker moves a row from its old next_attempt_at
+            if await pending.filter(pk=row.pk, next_attempt_at=row.next_attempt_at).aupdate(next_attempt_at=lease_until):
+                claimed.append(row)
+        return claimed
+
+    async def _submit(self, row: OrderOutbox):
+        started = time.perf_counter()
+        row.attempts += 1
+        try:
+            row.external_order_id = await self.client_for(row.client_id).submit_order(row.payload, row.idempotency_key)
+        except CircuitOpenError:
+            # Not an attempt: wait for the breaker to let a probe through
+            row.attempts -= 1
+            row.next_attempt_at = timezone.now() + timedelta(seconds=BREAKER_RESET_SECONDS)
+            await row.asave(update_fields=["next_attempt_at"])
+            return
+        except Exception as e:
+            metrics.observe("order_outbox.submit_ms", (time.perf_counter() - started) * 1000)
+            await self._failed(row, e)
+            return
+        metrics.observe("order_outbox.submit_ms", (time.perf_counter() - started) * 1000)
+        row.status = OrderOutbox.SUBMITTED
+        row.submitted_at = timezone.now()
+        row.last_error = ""
+        await row.asave(update_fields=["status", "attempts", "external_order_id", "submitted_at", "last_error"])
+        metrics.increment("order_outbox.submitted")
+        metrics.observe("order_outbox.queue_seconds", (row.submitted_at - row.created_at).total_seconds())
+        logger.info(f"Order of call {row.call_sid} submitted as {row.external_order_id or '?'} after {row.attempts} attempt(s)")
+
+    async def _failed(self, row: OrderOutbox, error: Exception):
+        row.last_error = repr(error)
+        rejected = isinstance(error, FoodticketAPIError) and error.status_code < 500 and error.status_code not in RETRYABLE_STATUS_CODES
+        if rejected or row.attempts >= ORDER_OUTBOX_MAX_ATTEMPTS:
+            row.status = OrderOutbox.FAILED
+            metrics.increment("order_outbox.failed")
+            logger.error(f"Order of call {row.call_sid} failed after {row.attempts} attempt(s): {error!r}")
+        else:
+            delay = retry_delay(row.attempts)
+            row.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+            metrics.increment("order_outbox.retried")
+            logger.warning(f"Order of call {row.call_sid} attempt {row.attempts} failed ({error!r}), retrying in {delay:.0f}s")
+        await row.asave(update_fields=["status", "attempts", "next_attempt_at", "last_error"])
+
+    async def process_due(self) -> int:
+        """Submits the orders that are due, concurrently. Returns how many were attempted."""
+        rows = await self._claim_due()
+        if rows:
+            await asyncio.gather(*(self._submit(row) for row in rows))
+        metrics.set_gauge("order_outbox.pending", await OrderOutbox.objects.filter(status=OrderOutbox.PENDING).acount())
+        return len(rows)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                # A full batch means more rows may be due right away
+                if await self.process_due() == self.batch_size:
+                    continue
+            except Exception:
+                logger.exception("Order outbox run failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Starts the worker on the running event loop; a no-op while it is running."""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+order_outbox = OrderOutboxWorker()
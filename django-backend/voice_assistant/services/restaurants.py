@@ -0,0 +1,134 @@
+"""
+Per-restaurant state, partitioned by Foodticket client_id.
+
+Every restaurant the deployment answers for gets a `Restaurant` partition with its own Foodticket
+client, zipcode index, menu vocabularies, compiled flows and catalog sync. The number the caller
+dialed selects the partition (RESTAURANT_CLIENT_IDS); numbers that are not listed go to the default
+restaurant, which is built from the process-wide instances and never evicted.
+
+Partitions are created on the first call for a restaurant. Beyond MAX_RESTAURANT_PARTITIONS the
+least recently used partition without a running call is evicted: its catalog, matcher, price book,
+zipcodes and compiled flows leave memory, the catalog snapshot on disk stays so a return is cheap.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional
+
+from django.conf import settings
+
+from common.utils.metrics import metrics
+from integrations.foodticket_client.catalog_cache import catalog_cache
+from integrations.foodticket_client.client import DEFAULT_CLIENT_ID, FoodticketClient, foodticket_client
+from integrations.foodticket_client.pricing import evict_price_book
+from integrations.foodticket_client.product_matcher import evict_matcher
+from integrations.foodticket_client.product_options import evict_options_index
+from integrations.foodticket_client.zipcode_index import ZipcodeIndex, zipcode_index
+from voice_assistant.services.catalog_sync import CatalogSync, catalog_sync
+from voice_assistant.state_machine.conversation_openai_tools import vocabularies
+from voice_assistant.state_machine.flow_loader import FlowRegistry
+from voice_assistant.state_machine.manager import flow_registry, flows_dir
+from voice_assistant.state_machine.verifiers import verify_functions
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Restaurant:
+    client_id: int
+    client: FoodticketClient
+    zipcodes: ZipcodeIndex
+    flows: FlowRegistry
+    catalog_sync: CatalogSync
+    active_calls: int = 0
+
+    @property
+    def vocabularies(self) -> Mapping[str, list]:
+        """The latest menu vocabularies; the sync replaces the snapshot instead of changing it."""
+        return self.catalog_sync.current
+
+    def warm_up(self):
+        """Starts the background loads a call needs before the caller gets to ordering."""
+        self.zipcodes.refresh_if_stale()  # Loaded before the caller reaches ask_address
+        self.catalog_sync.start()
+
+    def close(self):
+        self.catalog_sync.stop()
+        catalog_cache.evict(self.client_id)
+        evict_matcher(self.client_id)
+        evict_price_book(self.client_id)
+        evict_options_index(self.client_id)
+        try:
+            asyncio.get_running_loop().create_task(self.client.aclose())
+        except RuntimeError:
+            pass
+
+
+def _default_restaurant() -> Restaurant:
+    return Restaurant(DEFAULT_CLIENT_ID, foodticket_client, zipcode_index, flow_registry, catalog_sync)
+
+
+def _new_restaurant(client_id: int) -> Restaurant:
+    client = FoodticketClient(client_id)
+    # Starts from the default lists until the first sync replaces them with this restaurant's menu
+    restaurant_vocabularies = {name: list(items) for name, items in vocabularies.items()}
+    flows = FlowRegistry(flows_dir, restaurant_vocabularies, verify_functions=verify_functions)
+    return Restaurant(client_id, client, ZipcodeIndex(client), flows, CatalogSync(flows, restaurant_vocabularies, client_id))
+
+
+class RestaurantRegistry:
+    def __init__(self, numbers: Dict[str, int], max_partitions: int):
+        self.numbers = {self._normalize(number): int(client_id) for number, client_id in numbers.items()}
+        self.max_partitions = max_partitions
+        self.default = _default_restaurant()
+        self._partitions: "OrderedDict[int, Restaurant]" = OrderedDict()
+
+    @staticmethod
+    def _normalize(number: str) -> str:
+        return "".join(char for char in number or "" if char.isdigit())
+
+    def client_id_for_number(self, dialed_number: Optional[str]) -> int:
+        return self.numbers.get(self._normalize(dialed_number), DEFAULT_CLIENT_ID)
+
+    def get(self, client_id: int) -> Restaurant:
+        if client_id == self.default.client_id:
+            return self.default
+        restaurant = self._partitions.get(client_id)
+        if restaurant is None:
+            restaurant = self._partitions[client_id] = _new_restaurant(client_id)
+            metrics.increment("restaurants.partitions_created")
+            logger.info(f"Restaurant partition for client {client_id} created")
+            self._evict_if_needed(keep=client_id)
+        self._partitions.move_to_end(client_id)
+        metrics.set_gauge("restaurants.partitions", len(self._partitions) + 1)
+        return restaurant
+
+    def acquire(self, dialed_number: Optional[str]) -> Restaurant:
+        """The partition of the dialed restaurant, held until `release` so it is not evicted during the call."""
+        restaurant = self.get(self.client_id_for_number(dialed_number))
+        restaurant.active_calls += 1
+        return restaurant
+
+    def release(self, restaurant: Optional[Restaurant]):
+        if restaurant is not None:
+            restaurant.active_calls = max(0, restaurant.active_calls - 1)
+
+    def _evict_if_needed(self, keep: int):
+        # The default restaurant counts towards the limit
+        for client_id in list(self._partitions):
+            if len(self._partitions) + 1 <= self.max_partitions:
+                return
+            restaurant = self._partitions[client_id]
+            if restaurant.active_calls or client_id == keep:
+                continue
+            del self._partitions[client_id]
+            restaurant.close()
+            metrics.increment("restaurants.partitions_evicted")
+            logger.info(f"Restaurant partition for client {client_id} evicted")
+        if len(self._partitions) + 1 > self.max_partitions:
+            logger.warning(f"{len(self._partitions) + 1} restaurant partitions in use, above the limit of {self.max_partitions}")
+
+
+restaurants = RestaurantRegistry(settings.RESTAURANT_CLIENT_IDS, settings.MAX_RESTAURANT_PARTITIONS)
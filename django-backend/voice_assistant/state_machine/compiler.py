@@ -0,0 +1,268 @@
+"""
+Startup-time compiler for conversation flows.
+
+`compile_flow` checks a hand-written `dict[str, ConversationState]` before any call
+is served and turns it into an immutable, index-based transition table that
+`ConversationFSM` uses at runtime. Every problem found in the flow is collected
+and raised together in a single `FlowCompilationError`, so a broken flow stops
+the process at boot instead of failing in the middle of a live call.
+
+Checks:
+    - every state key matches `state.name`
+    - every transition target (`next_states`, `verify_from_func.next_state_condition`,
+      `previous_state`, `fallback_state`) is an existing state
+    - `next_state_key` enums of the tools have a matching transition
+    - every `{placeholder}` in prompts and tool descriptions is guaranteed to be
+      available when the state is rendered (initial params + params produced by
+      the `verify_from_func` functions on every path leading to the state)
+    - the `params` a state lists are ones its verify function declares (`writes`)
+    - every state is reachable from the initial state
+
+What a verify function produces comes from its `@writes` declaration: the params it
+always writes are available on the transitions of the conditions it writes them for.
+Functions without a declaration fall back to the `verify_from_func.params` of the state,
+available on every transition.
+"""
+
+import string
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Callable, Iterable, Mapping, Optional
+
+from voice_assistant.state_machine.states import ConversationState
+
+_formatter = string.Formatter()
+
+
+@dataclass(frozen=True)
+class ParamWrites:
+    """Params a verify function writes: `always` when it returns one of `conditions` (None: any), `optional` at most."""
+
+    always: frozenset
+    conditions: Optional[frozenset] = None
+    optional: frozenset = frozenset()
+
+    @property
+    def allowed(self) -> frozenset:
+        return self.always | self.optional
+
+    def guaranteed(self, condition: str) -> frozenset:
+        return self.always if self.conditions is None or condition in self.conditions else frozenset()
+
+
+def writes(*params: str, on: Optional[Iterable[str]] = None, optional: Iterable[str] = ()):
+    """Declares the params a verify function writes, see `ParamWrites`."""
+
+    def decorate(func):
+        func.writes = ParamWrites(frozenset(params), frozenset(on) if on is not None else None, frozenset(optional))
+        return func
+
+    return decorate
+
+
+def param_write_problems(func: Callable, condition: str, before: Mapping, after: Mapping) -> list[str]:
+    """Differences between what a verify function wrote in one call and its `@writes` declaration."""
+    declared: Optional[ParamWrites] = getattr(func, "writes", None)
+    if declared is None:
+        return []
+    problems = []
+    changed = {key for key, value in after.items() if key not in before or before[key] is not value}
+    undeclared = changed - declared.allowed
+    if undeclared:
+        problems.append(f"{func.__name__} wrote undeclared param(s) {sorted(undeclared)}")
+    missing = declared.guaranteed(condition) - set(after)
+    if missing:
+        problems.append(f"{func.__name__} returned '{condition}' without writing {sorted(missing)}")
+    return problems
+
+
+class FlowCompilationError(ValueError):
+    def __init__(self, flow_name: str, errors: list[str]):
+        self.flow_name = flow_name
+        self.errors = errors
+        details = "\n".join(f"  - {error}" for error in errors)
+        super().__init__(f"Flow '{flow_name}' has {len(errors)} error(s):\n{details}")
+
+
+@dataclass(frozen=True)
+class CompiledFlow:
+    """Immutable transition table of a validated flow. States are addressed by index."""
+
+    name: str
+    states: Mapping[str, ConversationState]
+    state_names: tuple[str, ...]
+    index: Mapping[str, int]
+    initial_index: int
+    transitions: tuple[Mapping[str, int], ...]  # condition -> target index (next_states or next_state_condition)
+    previous: tuple[Optional[int], ...]
+    fallback: tuple[Optional[int], ...]
+    is_verified: tuple[bool, ...]  # True when the state is driven by verify_from_func
+    terminal: frozenset[int]
+
+    def state_at(self, idx: int) -> ConversationState:
+        return self.states[self.state_names[idx]]
+
+    def target(self, idx: int, condition: str) -> Optional[int]:
+        return self.transitions[idx].get(condition)
+
+
+def placeholders(template: str) -> set[str]:
+    """Returns the top level field names used in a str.format template."""
+    fields = set()
+    for _, field_name, _, _ in _formatter.parse(template or ""):
+        if field_name is None:
+            continue
+        # "{a.b}" / "{a[0]}" only need "a" in the parameters
+        fields.add(field_name.split(".")[0].split("[")[0])
+    return fields
+
+
+def state_placeholders(state: ConversationState) -> set[str]:
+    """Placeholders formatted by `ConversationState.build_state` for this state."""
+    fields = placeholders(state.prompt_en) | placeholders(state.prompt_tr) | placeholders(state.prompt_du)
+    for tool in state.tools:
+        fields |= placeholders(tool.get("description", ""))
+        for prop in tool.get("parameters", {}).get("properties", {}).values():
+            fields |= placeholders(prop.get("description", ""))
+    return fields
+
+
+def _state_transitions(state: ConversationState) -> dict[str, str]:
+    if state.verify_from_func is not None:
+        return dict(state.verify_from_func.get("next_state_condition", {}))
+    return dict(state.next_states or {})
+
+
+def _declared_writes(state: ConversationState, verify_functions: Mapping[str, Callable]) -> Optional[ParamWrites]:
+    func = verify_functions.get(state.verify_from_func.get("func")) if state.verify_from_func is not None else None
+    return getattr(func, "writes", None)
+
+
+def _produced_params(state: ConversationState, condition: str, declared: Optional[ParamWrites]) -> set[str]:
+    """Params guaranteed to be set after the state's tool returned `condition`."""
+    if state.verify_from_func is None:
+        return set()
+    if declared is not None:
+        return set(declared.guaranteed(condition))
+    return set(state.verify_from_func.get("params", []))
+
+
+def compile_flow(
+    states: dict[str, ConversationState],
+    initial_state: str,
+    initial_params: Iterable[str] = (),
+    flow_name: str = "flow",
+    verify_functions: Optional[Mapping[str, Callable]] = None,
+) -> CompiledFlow:
+    """`verify_functions` maps the `verify_from_func.func` names to the functions; without it names are not checked."""
+    errors = []
+    state_names = tuple(states.keys())
+    index = {name: i for i, name in enumerate(state_names)}
+
+    if initial_state not in index:
+        raise FlowCompilationError(flow_name, [f"initial state '{initial_state}' does not exist"])
+
+    known_functions = set(verify_functions) if verify_functions is not None else None
+    declared_writes = [_declared_writes(state, verify_functions or {}) for state in states.values()]
+    transitions, previous, fallback, is_verified, terminal = [], [], [], [], set()
+
+    for i, (key, state) in enumerate(states.items()):
+        if state.name != key:
+            errors.append(f"state '{key}' is declared with name '{state.name}'")
+        if state.verify_from_func is not None and state.next_states:
+            errors.append(f"state '{key}' defines both next_states and verify_from_func")
+
+        if state.verify_from_func is not None:
+            func = state.verify_from_func.get("func")
+            if not func:
+                errors.append(f"state '{key}' has verify_from_func without 'func'")
+            elif known_functions is not None and func not in known_functions:
+                errors.append(f"state '{key}' uses unknown verify function '{func}'")
+
+        declared = declared_writes[i]
+        if declared is not None:
+            listed = set(state.verify_from_func.get("params", []))
+            if listed - declared.allowed:
+                errors.append(f"state '{key}' lists param(s) {sorted(listed - declared.allowed)} that '{func}' never writes")
+            unknown_conditions = (declared.conditions or set()) - set(_state_transitions(state))
+            if unknown_conditions:
+                errors.append(f"'{func}' writes params on condition(s) {sorted(unknown_conditions)} that state '{key}' has no transition for")
+
+        table = {}
+        for condition, target in _state_transitions(state).items():
+            if target not in index:
+                errors.append(f"state '{key}' transition '{condition}' points to unknown state '{target}'")
+                continue
+            table[condition] = index[target]
+        transitions.append(MappingProxyType(table))
+        if not table:
+            terminal.add(i)
+
+        for attr, collected in (("previous_state", previous), ("fallback_state", fallback)):
+            target = getattr(state, attr)
+            if target is not None and target not in index:
+                errors.append(f"state '{key}' {attr} points to unknown state '{target}'")
+                target = None
+            collected.append(index[target] if target is not None else None)
+        is_verified.append(state.verify_from_func is not None)
+
+        if state.verify_from_func is None and state.next_states:
+            for tool in state.tools:
+                enum = tool.get("parameters", {}).get("properties", {}).get("next_state_key", {}).get("enum")
+                for value in enum or []:
+                    if value not in state.next_states:
+                        errors.append(f"state '{key}' tool '{tool.get('name')}' can return '{value}' which has no transition")
+
+    # Reachability from the initial state
+    initial_index = index[initial_state]
+    reachable = {initial_index}
+    stack = [initial_index]
+    while stack:
+        for target in transitions[stack.pop()].values():
+            if target not in reachable:
+                reachable.add(target)
+                stack.append(target)
+    for i, name in enumerate(state_names):
+        if i not in reachable:
+            errors.append(f"state '{name}' is not reachable from '{initial_state}'")
+
+    # Params guaranteed to be set when a state is rendered: intersection over all incoming paths
+    produced = [
+        {condition: _produced_params(states[name], condition, declared_writes[i]) for condition in transitions[i]}
+        for i, name in enumerate(state_names)
+    ]
+    available: list[Optional[set[str]]] = [None] * len(state_names)
+    available[initial_index] = set(initial_params)
+    changed = True
+    while changed:
+        changed = False
+        for i in reachable:
+            if available[i] is None:
+                continue
+            for condition, target in transitions[i].items():
+                out = available[i] | produced[i][condition]
+                incoming = out if available[target] is None else available[target] & out
+                if incoming != available[target]:
+                    available[target] = incoming
+                    changed = True
+
+    for i in sorted(reachable):
+        missing = state_placeholders(states[state_names[i]]) - available[i]
+        if missing:
+            errors.append(f"state '{state_names[i]}' uses placeholder(s) {sorted(missing)} that are not set on every path to it")
+
+    if errors:
+        raise FlowCompilationError(flow_name, errors)
+
+    return CompiledFlow(
+        name=flow_name,
+        states=MappingProxyType(dict(states)),
+        state_names=state_names,
+        index=MappingProxyType(index),
+        initial_index=initial_index,
+        transitions=tuple(transitions),
+        previous=tuple(previous),
+        fallback=tuple(fallback),
+        is_verified=tuple(is_verified),
+        terminal=frozenset(terminal),
+    )
@@ -1,3 +1,5 @@
+# Catalog vocabularies referenced from the flow files as "@products", "{@products}" etc.
+# The tool schemas themselves live in voice_assistant/flows/*.json
 products = [
                     'Vegan Margherita Pizza',
                     'Vegan Boeren Pizza',
@@ -204,392 +206,12 @@ toppings = [
 sizes = [
     '25cm', '30cm', '30cm (Dunne Bodem)', '35cm', '35cm (Dunne bodem)'
 ]
-select_language_tool = {
-    "type": "function",
-    "name": "select_language_tool",
-    "description": "selects language one of turkish, english or dutch",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "language": {
-                "type": "string",
-                "enum": ['turkish', 'english', 'dutch'],
-                "description": "specified language in user input",
-            }
-        },
-        "required": ["language"],
-    },
-}
-
-get_address_tool = {
-    "type": "function",
-    "name": "get_address",
-    "description": "Extracts and returns the city name, zip code (Dutch format), and house number from a full address string. city should be in the holland, zipcode is 4 digits followed by 2 letters, and house number can include digit and letters. Ask user untill you get address matching the format",
-    "parameters": {
-        "type": "object",
-        "properties": {
-        "city": {
-            "type": "string",
-            "description": "City or locality name."
-        },
-        "zip_code": {
-            "type": "string",
-            "description": "Dutch postal code in the format of 4 digits followed by 2 letters."
-        },
-        "house_number": {
-            "type": "string",
-            "description": "House number including any letter suffix."
-        }
-        },
-        "required": ["location", "zip_code"]
-    }
-}
-
-get_address_failed_tool = {
-    "type": "function",
-    "name": "ask_address_failed",
-    "description": "yes or no question to whater user wants to pickup or not? return yes if they said yes or want to pickup",
-    "parameters": {
-        "type": "object",
-        "properties": {"next_state_key": {"type": "string", "enum": ["yes", "no"]}},
-        "required": ["next_state_key"],
-    },
-}
-
-confirm_address_tool = {
-    "type": "function",
-    "name": "confirm_address",
-    "description": "understand given address is correct or not?",
-    "parameters": {
-        "type": "object",
-        "properties": {"next_state_key": {"type": "string", "enum": ["yes", "no"]}},
-        "required": ["next_state_key"],
-    },
-}
-
-get_order_item_tool = {
-    "type": "function",
-    "name": "get_order_item",
-    "description":  (
-        "Extract pizza orders from user input in any language (English, Turkish, Dutch). "
-        "Look for pizza names and quantities. User may say pizza names in different languages. "
-        "Examples: 'I want two pepperoni and a margherita' → [{{'product_name': 'Pepperoni Pizza', 'quantity': 2}}, {{'product_name': 'Margherita Pizza', 'quantity': 1}}] "
-        "Examples: 'iki pepperoni bir margherita' → [{{'product_name': 'Pepperoni Pizza', 'quantity': 2}}, {{'product_name': 'Margherita Pizza', 'quantity': 1}}] "
-        "If the user does not specify a quantity, ask for clarification. Do not assume a default quantity. "
-        "Carefully match each pizza type with its correct quantity, even if the user lists multiple types in one sentence."
-    ),
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "pizza_items": {
-                "type": "array",
-                "description": "List of pizzas the user wants to order",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "product_name": {
-                            "type": "string",
-                            "description": "Name of the pizza or meal they want",
-                            "enum": products  # e.g. ["margherita", "shaurma", "pepperoni"]
-                        },
-                        "quantity": {
-                            "type": "integer",
-                            "description": "Please specify how many of this pizza you would like to order. For example: '1 margherita pizza' should return 1, '2 pepperoni' should return 2",
-                            "minimum": 1
-                        },
-                        # "size": {
-                        #     "type": "string",
-                        #     "description": "Size of the pizza",
-                        #     "enum": sizes
-                        # },
-                        # "crust": {
-                        #     "type": "string",
-                        #     "description": "Type of crust",
-                        #     "enum": ["thin", "thick", "stuffed"]
-                        # },
-                        "toppings": {
-                            "type": "array",
-                            "description": "Extra toppings to include for each pizza",
-                            "items": {
-                                "type": "string",
-                                 "description": "Size of the pizza",
-                                "enum": toppings
-                            }
-                        }
-                    },
-                    "required": ["product_name", "quantity"]
-                }
-            }
-        },
-        "required": ["pizza_items"]
-    }
-}
-
-choose_intent_tool = {
-    "type": "function",
-    "name": "choose_intent",
-    "description": "Determines whether the user wants to place an order or check the status of an existing one.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "intent": {
-                "type": "string",
-                "enum": ["place_order", "check_status"],
-                "description": "User's intention: place_order or check_status.",
-            }
-        },
-        "required": ["intent"],
-    },
-}
-
-choose_delivery_type_tool = {
-    "type": "function",
-    "name": "choose_delivery_type",
-    "description": "Extract delivery preference from user response. User may choose pickup (self-collection) or delivery. Look for keywords like 'pickup', 'pick up', 'collect', 'self', 'delivery', 'deliver', 'bring', 'teslim al', 'kendim al', 'getir', 'teslimat' etc.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "next_state_key": {
-                "type": "string",
-                "description": "User's delivery preference: pickup (self-collection) or delivery (home delivery)",
-                "enum": ["pickup", "delivery"]
-            }},
-        "required": ["next_state_key"],
-    },
-}
-
-confirm_branch_tool = {
-    "type": "function",
-    "name": "confirm_branch",
-    "description": "Extract confirmation response from user. User may confirm or deny with words like 'yes', 'no', 'okay', 'sure', 'right', 'evet', 'hayir', 'tamam', 'dogru' etc.",
-    "parameters": {
-        "type": "object",
-        "properties": {"next_state_key": {
-                "type": "string",
-                "description": "User's confirmation: yes (confirm/agree) or no (deny/disagree)",
-                "enum": ["yes", "no"]
-            }},
-        "required": ["next_state_key"],
-    },
-}
-
-
-ask_size_items_tool = {
-    "type": "function",
-    "name": "ask_size_items_tool",
-    "description": """Extract pizza size preferences from user input in any language. Available sizes: {size_options}. User may specify sizes for individual pizzas or groups.
-     Examples: 'all 25cm', 'two 30cm', 'hepsi 25cm', 'iki tane 30cm' etc. 
-     Only accept exact size values from size_options. If user provides any other size value, return error.
-     Do not try to map or approximate size values. If size is not exactly 25cm, 30cm, or 35cm, return error.""",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "pizza_size_items": {
-                "type": "array",
-                "description": "List of pizzas the user wants to order",
-                "items": {
-                    "type": "object",
-                    "properties": {
-                        "product_name": {
-                            "type": "string",
-                            "description": "Name of the pizza or meal they want",
-                            "enum": products  # e.g. ["margherita", "shaurma", "pepperoni"]
-                        },
-                        "size": {
-                            "type": "string",
-                            "description": "Size of the pizza. Only accept exact values from size_options. If size is not exactly 25cm, 30cm, or 35cm, return other",
-                            "enum": sizes + ["other"]
-                        },
-                        "quantity": {
-                            "type": "integer",
-                            "description": "How many of this pizza specified in this group of pizza",
-                            "minimum": 1
-                        },
-                    },
-                }
-            },
-        },
-    },
-}
-
-order_info_retrieve_tool = {
-    "type": "function",
-    "name": "order_info_retrieve",
-    "description": "Asks users to listen prompt again or not.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "next_state_key": {
-                "type": "string",
-                "description": "is user want to listen again? values: 'yes',no",
-            }
-        },
-        "required": ["next_state_key"],
-    },
-}
-
-ask_toppings_tobe_added_tool = {
-    "type": "function",
-    "name": "ask_toppings_tobe_added",
-    "description": "Asks users to do they want to add toppings",
-    "parameters": {
-        "type": "object",
-        "properties": {"next_state_key": {"type": "string", "enum": ["yes", "no"]}},
-        "required": ["next_state_key"],
-    },
-}
-
-ask_toppings_tool = {
-    "type": "function",
-    "name": "ask_toppings",
-    "description": "returns user requested toppings some of {toppings}. asks untill matches and put comma without space between them",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "toppings": {
-                "type": "string",
-                "description": "The user's selected toppings for the product (e.g., {toppings}).",
-            }
-        },
-        "required": ["topping"],
-    },
-}
-
-ask_toppings_failed_tool = {
-    "type": "function",
-    "name": "ask_more_items",
-    "description": "Asks users to do they want to try to add toppings again",
-    "parameters": {
-        "type": "object",
-        "properties": {"next_state_key": {"type": "string", "enum": ["yes", "no"]}},
-        "required": ["next_state_key"],
-    },
-}
-
-ask_drinks_tobe_added_tool = {
-    "type": "function",
-    "name": "ask_drinks_tobe_added",
-    "description": "Asks users to do they want to add drinks",
-    "parameters": {
-        "type": "object",
-        "properties": {"next_state_key": {"type": "string", "enum": ["yes", "no"]}},
-        "required": ["next_state_key"],
-    },
-}
-
-ask_drinks_tool = {
-    "type": "function",
-    "name": "ask_drinks",
-    "description": "returns user requested drinks some of {drinks}. asks untill matches and put comma without space between them",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "drinks": {
-                "type": "string",
-                "description": "The user's selected toppings for the product (e.g., {drinks}).",
-            }
-        },
-        "required": ["topping"],
-    },
-}
-
-ask_drinks_failed_tool = {
-    "type": "function",
-    "name": "ask_more_items",
-    "description": "Asks users to do they want to try to add drink again",
-    "parameters": {
-        "type": "object",
-        "properties": {"next_state_key": {"type": "string", "enum": ["yes", "no"]}},
-        "required": ["next_state_key"],
-    },
-}
-
-
-ask_more_items_tool = {
-    "type": "function",
-    "name": "ask_more_items",
-    "description": "Asks users to do they want to add more item",
-    "parameters": {
-        "type": "object",
-        "properties": {"next_state_key": {"type": "string", "enum": ["yes", "no"]}},
-        "required": ["next_state_key"],
-    },
-}
 
-confirm_order_tool = {
-    "type": "function",
-    "name": "confirm_order",
-    "description": "confirm the order.",
-    "parameters": {
-        "type": "object",
-        "properties": {"next_state_key": {"type": "string", "enum": ["yes", "no"]}},
-        "required": ["next_state_key"],
-    },
+# Hand-maintained defaults, never changed at runtime; `catalog_sync` keeps the live menu of each restaurant
+# in its own snapshot (`Restaurant.vocabularies`)
+vocabularies = {
+    "products": products,
+    "drinks": drinks,
+    "toppings": toppings,
+    "sizes": sizes,
 }
-
-status_check_failed_tool = {
-    "type": "function",
-    "name": "status_check_failed",
-    "description": "status check has failed ask do you want to return to main menu or not",
-    "parameters": {
-        "type": "object",
-        "properties": {"next_state_key": {"type": "string", "enum": ["yes", "no"]}},
-        "required": ["next_state_key"],
-    },
-}
-
-end_call_tool = {
-    "type": "function",
-    "name": "end_call",
-    "description": "Say goodbye and end the call.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "message": {
-                "type": "string",
-                "description": "The message to end the call with.",
-            },
-        },
-        "required": ["message"],
-    },
-}
-
-ask_notes_tool = {
-    "type": "function",
-    "name": "ask_notes",
-    "description": "Get  user want to add order note or do not want.",
-    "parameters": {
-        "type": "object",
-        "properties": {"next_state_key": {"type": "string", "enum": ["yes", "no"]}},
-        "required": ["next_state_key"],
-        },
-    }
-
-get_order_note_tool = {
-    "type": "function",
-    "name": "get_order_note",
-    "description": "Get and confirm the order note from user input in any language.",
-    "parameters": {
-        "type": "object",
-        "properties": {
-            "note": {
-                "type": "string",
-                "description": "The order note provided by the user.",
-            }
-        },
-        "required": ["note"],
-    },
-}
-
-confirm_note_tool = {
-    "type": "function",
-    "name": "confirm_note",
-    "description": "confirm the note.",
-    "parameters": {
-        "type": "object",
-        "properties": {"next_state_key": {"type": "string", "enum": ["yes", "no"]}},
-        "required": ["next_state_key"],
-    },
-}
-
-
@@ -0,0 +1,262 @@
+"""
+Loads conversation flows, prompts and tool schemas from versioned JSON files.
+
+A flow file looks like:
+
+    {
+        "name": "pizzadam_order",
+        "version": 1,
+        "initial_state": "greeting",
+        "initial_params": ["caller_number"],
+        "prompts": {"instructions": "..."},
+        "tools": {"choose_intent_tool": {...OpenAI tool schema...}},
+        "states": {"entry": {"prompt_en": "...", "tools": ["choose_intent_tool"], "next_states": {...}}}
+    }
+
+Files without "states" only carry prompts. Catalog lists are referenced by name instead
+of being copied into the file: "@products" inside an "enum" list expands to the vocabulary
+items and "{@products}" inside a prompt is replaced by the comma separated items.
+
+`FlowRegistry` compiles every file once per content hash and swaps the new version in
+atomically when the file changes on disk; on the event loop that recompile runs in a worker
+thread. The last COMPILED_CACHE_SIZE compilations are kept, so a file or vocabulary that
+changes back is not recompiled; older ones are dropped. Calls keep a reference to the
+`LoadedFlow` they started with, so in-flight calls finish on their version while new calls
+get the new one.
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Mapping, Optional
+
+from voice_assistant.state_machine.compiler import CompiledFlow, compile_flow
+from voice_assistant.state_machine.states import ConversationState
+
+logger = logging.getLogger(__name__)
+
+# Compiled versions kept per registry: the current one of each flow plus a few previous ones
+COMPILED_CACHE_SIZE = 4
+
+
+@dataclass(frozen=True)
+class LoadedFlow:
+    name: str
+    version: str  # "<file version>-<content hash prefix>"
+    content_hash: str
+    prompts: Mapping[str, str]
+    compiled: Optional[CompiledFlow] = None  # None for prompt-only files
+    initial_state: Optional[str] = None
+
+    @property
+    def states(self) -> Mapping[str, ConversationState]:
+        return self.compiled.states if self.compiled else MappingProxyType({})
+
+
+def _expand_enums(schema, vocabularies: Mapping[str, list]):
+    if isinstance(schema, dict):
+        expanded = {}
+        for key, value in schema.items():
+            if key == "enum" and isinstance(value, list):
+                items = []
+                for item in value:
+                    if isinstance(item, str) and item.startswith("@"):
+                        items.extend(vocabularies[item[1:]])
+                    else:
+                        items.append(item)
+                expanded[key] = items
+            else:
+                expanded[key] = _expand_enums(value, vocabularies)
+        return expanded
+    if isinstance(schema, list):
+        return [_expand_enums(item, vocabularies) for item in schema]
+    return schema
+
+
+def _expand_prompt(prompt: str, vocabularies: Mapping[str, list]) -> str:
+    for name, items in vocabularies.items():
+        token = "{@" + name + "}"
+        if token in prompt:
+            # Escape braces so the vocabulary text survives str.format in build_state
+            prompt = prompt.replace(token, ",".join(items).replace("{", "{{").replace("}", "}}"))
+    return prompt
+
+
+def build_states(document: dict, vocabularies: Mapping[str, list]) -> dict[str, ConversationState]:
+    tools = {name: _expand_enums(schema, vocabularies) for name, schema in document.get("tools", {}).items()}
+    states = {}
+    for name, spec in document["states"].items():
+        missing_tools = [tool for tool in spec.get("tools", []) if tool not in tools]
+        if missing_tools:
+            raise ValueError(f"state '{name}' uses undefined tool(s) {missing_tools}")
+        states[name] = ConversationState(
+            name=name,
+            prompt_en=_expand_prompt(spec.get("prompt_en", ""), vocabularies),
+            prompt_tr=_expand_prompt(spec.get("prompt_tr", ""), vocabularies),
+            prompt_du=_expand_prompt(spec.get("prompt_du", ""), vocabularies),
+            tools=[copy.deepcopy(tools[tool]) for tool in spec.get("tools", [])],
+            next_states=spec.get("next_states"),
+            previous_state=spec.get("previous_state"),
+            fallback_state=spec.get("fallback_state"),
+            verify_from_func=spec.get("verify_from_func"),
+        )
+    return states
+
+
+def load_flow(raw: bytes, vocabularies: Mapping[str, list], content_hash: str = None, verify_functions: Mapping[str, Callable] = None) -> LoadedFlow:
+    document = json.loads(raw)
+    content_hash = content_hash or hashlib.sha256(raw).hexdigest()
+    compiled = None
+    if "states" in document:
+        compiled = compile_flow(
+            build_states(document, vocabularies),
+            initial_state=document["initial_state"],
+            initial_params=document.get("initial_params", []),
+            flow_name=document["name"],
+            verify_functions=verify_functions,
+        )
+    return LoadedFlow(
+        name=document["name"],
+        version=f"{document.get('version', 0)}-{content_hash[:8]}",
+        content_hash=content_hash,
+        prompts=MappingProxyType(dict(document.get("prompts", {}))),
+        compiled=compiled,
+        initial_state=document.get("initial_state"),
+    )
+
+
+def _vocabulary_hash(vocabularies: Mapping[str, list]) -> str:
+    return hashlib.sha256(json.dumps(vocabularies, sort_keys=True).encode()).hexdigest()
+
+
+class FlowRegistry:
+    """Serves the latest compiled version of every flow file in `flows_dir`."""
+
+    def __init__(self, flows_dir, vocabularies: Mapping[str, list], check_interval: float = 2.0, verify_functions: Mapping[str, Callable] = None):
+        self.flows_dir = Path(flows_dir)
+        self.check_interval = check_interval
+        self.verify_functions = MappingProxyType(dict(verify_functions)) if verify_functions is not None else None
+        self._vocabularies = dict(vocabularies)
+        self._vocabulary_hash = _vocabulary_hash(self._vocabularies)
+        self._current: dict[str, LoadedFlow] = {}
+        self._file_stamps: dict[str, tuple] = {}
+        self._last_check: dict[str, float] = {}
+        self._compiled_cache: "OrderedDict[tuple[str, str], LoadedFlow]" = OrderedDict()
+        self._reload_lock = threading.Lock()
+        self._pending_checks: set[str] = set()
+
+    def path_for(self, name: str) -> Path:
+        return self.flows_dir / f"{name}.json"
+
+    def get(self, name: str) -> LoadedFlow:
+        """
+        Lock-free for readers; at most one stat() per `check_interval` per flow.
+
+        On an event loop a changed file is recompiled in a worker thread and this call still returns
+        the current version; the next call after the swap gets the new one. Only the first load of a
+        flow compiles inline: that happens at import (manager.py) or when a restaurant partition is
+        created, and takes about a millisecond.
+        """
+        loaded = self._current.get(name)
+        if loaded is None:
+            self._last_check[name] = time.monotonic()
+            return self._reload_if_changed(name, required=True) or self._current[name]
+        now = time.monotonic()
+        if now - self._last_check.get(name, 0.0) >= self.check_interval:
+            self._last_check[name] = now
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return self._reload_if_changed(name, required=False) or loaded
+            if name not in self._pending_checks:
+                self._pending_checks.add(name)
+                future = loop.run_in_executor(None, self._reload_if_changed, name, False)
+                future.add_done_callback(lambda _: self._pending_checks.discard(name))
+        return loaded
+
+    def compile_all(self, vocabularies: Mapping[str, list]) -> dict[str, tuple[LoadedFlow, tuple]]:
+        """
+        Compiles every loaded flow with `vocabularies` without publishing anything, so it can run in a
+        worker thread; `install` makes the result current. A flow that fails to compile is left out.
+        """
+        vocabulary_hash = _vocabulary_hash(vocabularies)
+        compiled = {}
+        with self._reload_lock:
+            for name in list(self._current):
+                try:
+                    compiled[name] = self._compile(name, vocabularies, vocabulary_hash)
+                except Exception:
+                    logger.exception(f"Compiling flow '{name}' with new vocabularies failed, keeping version {self._current[name].version}")
+        return compiled
+
+    def install(self, vocabularies: Mapping[str, list], compiled: Mapping[str, tuple[LoadedFlow, tuple]]):
+        """Makes `vocabularies` and the flows `compile_all` compiled with them current in one step."""
+        with self._reload_lock:
+            self._vocabularies = dict(vocabularies)
+            self._vocabulary_hash = _vocabulary_hash(self._vocabularies)
+            for name in list(self._current):
+                if name in compiled:
+                    self._publish(name, *compiled[name])
+                else:
+                    # Compiled with the old vocabularies: the next check recompiles it
+                    self._file_stamps.pop(name, None)
+
+    def set_vocabularies(self, vocabularies: Mapping[str, list]):
+        """Recompiles all loaded flows with new catalog vocabularies and publishes them (scripts, tests)."""
+        self.install(vocabularies, self.compile_all(vocabularies))
+
+    def _compile(self, name: str, vocabularies: Mapping[str, list], vocabulary_hash: str) -> tuple[LoadedFlow, tuple]:
+        """Compiled flow and file stamp, from the compiled cache when this content and vocabulary were seen before. Needs `_reload_lock`."""
+        path = self.path_for(name)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        raw = path.read_bytes()
+        content_hash = hashlib.sha256(raw).hexdigest()
+        cache_key = (content_hash, vocabulary_hash)
+        loaded = self._compiled_cache.get(cache_key)
+        if loaded is None:
+            loaded = load_flow(raw, vocabularies, content_hash, self.verify_functions)
+            self._compiled_cache[cache_key] = loaded
+            # Running calls hold their own reference, evicting only stops reuse
+            while len(self._compiled_cache) > COMPILED_CACHE_SIZE:
+                self._compiled_cache.popitem(last=False)
+        self._compiled_cache.move_to_end(cache_key)
+        return loaded, stamp
+
+    def _publish(self, name: str, loaded: LoadedFlow, stamp: tuple) -> LoadedFlow:
+        self._file_stamps[name] = stamp
+        previous = self._current.get(name)
+        if previous is not loaded:
+            # Single reference swap: new calls see the new version, running calls keep theirs
+            self._current[name] = loaded
+            if previous is not None:
+                logger.info(f"Flow '{name}' reloaded: {previous.version} -> {loaded.version}")
+        return loaded
+
+    def _reload_if_changed(self, name: str, required: bool) -> Optional[LoadedFlow]:
+        path = self.path_for(name)
+        with self._reload_lock:
+            stamp = None
+            try:
+                stat = os.stat(path)
+                stamp = (stat.st_mtime_ns, stat.st_size)
+                if name in self._current and self._file_stamps.get(name) == stamp:
+                    return None
+                loaded, stamp = self._compile(name, self._vocabularies, self._vocabulary_hash)
+            except Exception:
+                if required:
+                    raise
+                # Remember the broken file so it is not recompiled on every check
+                self._file_stamps[name] = stamp
+                logger.exception(f"Reloading flow '{name}' from {path} failed, keeping version {self._current[name].version}")
+                return None
+            return self._publish(name, loaded, stamp)
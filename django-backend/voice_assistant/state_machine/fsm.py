@@ -1,36 +1,112 @@
+import time
+from typing import Callable, Optional
+
+from voice_assistant.state_machine.compiler import CompiledFlow, compile_flow
 from voice_assistant.state_machine.states import ConversationState
 
+# Bump when the snapshot layout changes, older snapshots are ignored on resume
+SNAPSHOT_VERSION = 2
+
 
 class ConversationFSM:
-    def __init__(self, states: dict[str, ConversationState], initial_state: str, collected_info: dict):
-        self.states = states
-        self.current_state = initial_state
+    def __init__(
+        self,
+        states: dict[str, ConversationState],
+        initial_state: str,
+        collected_info: dict,
+        compiled: Optional[CompiledFlow] = None,
+    ):
+        # Flows are normally compiled once at startup; compiling here keeps ad-hoc usage working,
+        # with the params the FSM starts with as the flow's initial params
+        self.flow = compiled or compile_flow(states, initial_state, initial_params=collected_info.get("params", {}))
+        self.states = self.flow.states
+        self._idx = self.flow.index[initial_state]
         self.collected_info = collected_info
+        # Params the call starts with (caller_number, ...) come from the call, not from a snapshot
+        self._call_params = frozenset(collected_info.get("params", {}))
         self.lang = None
+        self.turns = 0  # Tool calls handled so far, one per caller turn
+        # Called with the FSM after every state change (used to persist call snapshots)
+        self.on_transition: Optional[Callable[["ConversationFSM"], None]] = None
+
+    @property
+    def current_state(self) -> str:
+        return self.flow.state_names[self._idx]
+
+    @current_state.setter
+    def current_state(self, name: str):
+        self._move(self.flow.index[name])
+
+    def _move(self, idx: int):
+        changed = idx != self._idx
+        self._idx = idx
+        if changed and self.on_transition is not None:
+            self.on_transition(self)
 
     def get_current(self) -> ConversationState:
-        return self.states[self.current_state].build_state(self.collected_info.get("params", {}), self.lang)
-
-    def advance(self, condition: str= '', new_state: str = None):
-        state = self.get_current()
-        if state.verify_from_func is None and condition not in state.next_states:
-            raise ValueError(f"Invalid transition for condition: {condition}")
-        
-        print("advance with", condition, new_state)
-        if state.verify_from_func is not None:
-            self.current_state = new_state
-            return 
-        self.current_state = state.next_states[condition]
+        return self.flow.state_at(self._idx).build_state(self.collected_info.get("params", {}), self.lang)
+
+    def advance(self, condition: str = "", new_state: str = None):
+        idx = self._idx
+        if self.flow.is_verified[idx]:
+            # verify_from_func states either pass the verification result or the resolved state name
+            target = self.flow.target(idx, condition)
+            if target is None and new_state is not None:
+                target = self.flow.index.get(new_state)
+                if target not in self.flow.transitions[idx].values():
+                    target = None
+            if target is None:
+                raise ValueError(f"Invalid transition from {self.current_state} to: {new_state or condition}")
+        else:
+            target = self.flow.target(idx, condition)
+            if target is None:
+                raise ValueError(f"Invalid transition for condition: {condition}")
+        self._move(target)
 
     def go_back(self):
-        self.current_state = self.get_current().previous_state or self.current_state
+        previous = self.flow.previous[self._idx]
+        if previous is not None:
+            self._move(previous)
 
     def fallback(self):
-        self.current_state = self.get_current().fallback_state or self.current_state
-    
+        fallback = self.flow.fallback[self._idx]
+        if fallback is not None:
+            self._move(fallback)
+
+    def available_conditions(self) -> tuple[str, ...]:
+        return tuple(self.flow.transitions[self._idx])
+
+    def is_finished(self) -> bool:
+        return self._idx in self.flow.terminal
+
     def set_lang(self, lang):
+        # States are rebuilt with the current language on every get_current call
         self.lang = lang
-        # Force rebuild of current state with new language
-        if self.current_state in self.states:
-            # Reset the state to allow rebuilding
-            self.states[self.current_state].is_build = False
+
+    def snapshot(self) -> dict:
+        """What resuming needs: the state, the language and the slots collected during the call."""
+        params = self.collected_info.get("params", {})
+        return {
+            "v": SNAPSHOT_VERSION,
+            "flow": self.flow.name,
+            "state": self.current_state,
+            "lang": self.lang,
+            "turns": self.turns,
+            "params": {key: value for key, value in params.items() if key not in self._call_params},
+            "saved_at": time.time(),
+        }
+
+    def restore(self, snapshot: dict) -> bool:
+        """Resumes from a snapshot of the same flow. Returns False when the snapshot can not be used."""
+        if snapshot.get("v") != SNAPSHOT_VERSION or snapshot.get("flow") != self.flow.name:
+            return False
+        if snapshot.get("state") not in self.flow.index:
+            # The flow was changed and the state does not exist anymore
+            return False
+        params = self.collected_info.setdefault("params", {})
+        # Values of the current call (e.g. caller_number) win over the saved ones
+        params.update({key: value for key, value in snapshot.get("params", {}).items() if key not in params})
+        self.lang = snapshot.get("lang")
+        self.turns = snapshot.get("turns", 0)
+        self._idx = self.flow.index[snapshot["state"]]
+        return True
@@ -1,10 +1,41 @@
+import os
+from pathlib import Path
+
+from voice_assistant.state_machine.conversation_openai_tools import vocabularies
+from voice_assistant.state_machine.flow_loader import FlowRegistry, LoadedFlow
 from voice_assistant.state_machine.fsm import ConversationFSM
-from voice_assistant.state_machine.order_flow import order_flow_states
+from voice_assistant.state_machine.verifiers import verify_functions
+
+ORDER_FLOW = "pizzadam_order"
+APPLICATION_FLOW = "vize_danisman"
+
+flows_dir = os.getenv("CONVERSATION_FLOWS_DIR", Path(__file__).resolve().parent.parent / "flows")
+flow_registry = FlowRegistry(flows_dir, vocabularies, verify_functions=verify_functions)
+
+# Compiled once at import (VoiceAssistantConfig.ready), an invalid flow fails the boot instead of a live call
+flow_registry.get(ORDER_FLOW)
+flow_registry.get(APPLICATION_FLOW)
 
 fsm_instances = {}
 
 
-def get_fsm_for_call(call_sid: str) -> ConversationFSM:
+def get_order_flow(registry: FlowRegistry = flow_registry) -> LoadedFlow:
+    return registry.get(ORDER_FLOW)
+
+
+def get_fsm_for_call(call_sid: str, collected_info: dict = None, registry: FlowRegistry = flow_registry) -> ConversationFSM:
+    """`registry` holds the flows compiled with the menu of the restaurant the call is for (see `restaurants`)."""
     if call_sid not in fsm_instances:
-        fsm_instances[call_sid] = ConversationFSM(order_flow_states, initial_state="ask_item")
+        # The FSM keeps the flow version it was created with until the call ends
+        flow = get_order_flow(registry)
+        fsm_instances[call_sid] = ConversationFSM(
+            flow.compiled.states,
+            initial_state=flow.initial_state,
+            collected_info=collected_info if collected_info is not None else {"params": {}},
+            compiled=flow.compiled,
+        )
     return fsm_instances[call_sid]
+
+
+def release_fsm(call_sid: str):
+    fsm_instances.pop(call_sid, None)
@@ -0,0 +1,325 @@
+"""
+Headless simulator and fuzzer for conversation flows.
+
+Drives `ConversationFSM` with synthetic tool outputs in English, Turkish and Dutch, without
+OpenAI, Twilio or Django. Tool outputs go through `slot_filling.handle_tool_call` like the
+model's tool calls in a live call; in random runs `ask_item` is sometimes answered with the
+multi-slot tool (items, sizes and sometimes pickup or delivery with the address in one turn).
+Verify functions with a generator below run for real; for the others the params they declare (`@writes`) are filled with stub values. Writes that differ from
+a function's declaration are reported as param errors.
+Every visited state is rendered, so a missing placeholder shows up as a render error.
+Orders are priced against a synthetic catalog (every product 10.00) so the quote params are real.
+
+Usage (from django-backend/):
+    python -m voice_assistant.state_machine.simulator --conversations 20000
+    python -m voice_assistant.state_machine.simulator --script delivery --lang tr
+"""
+
+import argparse
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Optional
+
+from integrations.foodticket_client.catalog_cache import Catalog
+from integrations.foodticket_client.client import DEFAULT_CLIENT_ID
+from integrations.foodticket_client.extras_index import build_extras_index
+from integrations.foodticket_client.fixtures import extras_xml
+from voice_assistant.state_machine.compiler import CompiledFlow, param_write_problems
+from voice_assistant.state_machine.conversation_openai_tools import products, sizes
+from voice_assistant.state_machine.fsm import ConversationFSM
+from voice_assistant.state_machine.slot_filling import SLOT_TOOL_NAME, fast_forward, handle_tool_call
+from voice_assistant.state_machine.states import TOOL_ENUMS_PARAM
+from voice_assistant.state_machine.verifiers import LANGUAGE_CODES, SIZE_TOOL, verify_functions
+
+LANGUAGES = ("en", "tr", "du")
+LANGUAGE_NAMES = {code: name for name, code in LANGUAGE_CODES.items()}
+NOTES = {"en": "please ring the bell twice", "tr": "lutfen zili iki kez calin", "du": "graag twee keer aanbellen"}
+
+# Conditions that move the order forward, preferred with probability `happy_bias`
+HAPPY_CONDITIONS = ("known", "always", "True", "yes", "delivery", "pickup", "pickup_or_delivery", "confirm_order", "no")
+
+# Verify functions whose condition for a "yes" follows from the cart, not from the answer; only yes / "no" is checked
+CART_DECIDED = frozenset({"test_fulfillment"})
+
+
+def _language_args(condition, lang, rng, params):
+    return {"language": LANGUAGE_NAMES[lang]}
+
+
+def _detected_language_args(condition, lang, rng, params):
+    return {"language": LANGUAGE_NAMES[lang] if condition == "known" else "unknown"}
+
+
+def _address_args(condition, lang, rng, params):
+    if condition == "True":
+        return {"city": "Amsterdam", "zip_code": rng.choice(["1018TV", "1018 tv", "1093HK"]), "house_number": str(rng.randint(1, 200))}
+    return {"city": "Amsterdam", "zip_code": rng.choice(["", "1018", "ABCDEF"]), "house_number": ""}
+
+
+def _menu_args(condition, lang, rng, params):
+    if condition == "True":
+        return {"pizza_items": [{"product_name": name, "quantity": rng.randint(1, 3)} for name in rng.sample(products, rng.randint(1, 3))]}
+    return {"pizza_items": []}
+
+
+def _slot_args(condition, lang, rng, params):
+    # Sizes are not narrowed to the products yet, an unavailable one stops the fast path at ask_size_failed
+    items = [{"product_name": name, "quantity": rng.randint(1, 3), "size": rng.choice(sizes)} for name in rng.sample(products, rng.randint(1, 3))]
+    slots = {"pizza_items": items}
+    delivery_type = rng.choice([None, "pickup", "delivery"])
+    if delivery_type is not None:
+        slots["delivery_type"] = delivery_type
+    if delivery_type == "delivery":
+        slots.update(_address_args("True", lang, rng, params))
+    return slots
+
+
+def _size_args(condition, lang, rng, params):
+    items = params.get("pizza_items", [])
+    # Stands in for the caller's zipcode record; only "below_minimum" gets a minimum no order reaches
+    if condition == "below_minimum" or params.get("delivery_type") == "delivery":
+        params.update(delivery_type="delivery", delivery_costs="2.50", free_delivery=False, min_order="1000" if condition == "below_minimum" else "0")
+    # Stands in for how the call got here: with or without the delivery type settled before the items
+    if condition == "pickup_or_delivery":
+        params.pop("delivery_type", None)
+    elif condition == "True":
+        params.setdefault("delivery_type", "pickup")
+    # Like the model, only the sizes of the narrowed tool enum are offered (see `verifiers.test_menu`)
+    offered = [size for size in params.get(TOOL_ENUMS_PARAM, {}).get(SIZE_TOOL, {}).get("size", sizes) if size != "other"]
+    size = (lambda: "other") if condition == "False" else (lambda: rng.choice(offered))
+    return {"pizza_size_items": [{"product_name": item["product_name"], "size": size(), "quantity": item["quantity"]} for item in items]}
+
+
+def _fulfillment_args(condition, lang, rng, params):
+    if condition == "ask_item":
+        # Only a call without a cart goes on to ask_item
+        params.pop("pizza_size_items", None)
+    return {"next_state_key": "no" if condition == "no" else "yes"}
+
+
+def _note_args(condition, lang, rng, params):
+    return {"note": NOTES[lang] if condition == "True" else ""}
+
+
+SYNTHETIC_ARGS = {
+    "test_language": _language_args,
+    "test_detected_language": _detected_language_args,
+    "test_address": _address_args,
+    "test_menu": _menu_args,
+    "test_order_size": _size_args,
+    "test_fulfillment": _fulfillment_args,
+    "test_note": _note_args,
+}
+
+SCRIPTS = {
+    "quick_order": ["known", "True", "pickup_or_delivery", "pickup", "confirm_order", "yes", "no"],
+    "order_with_note": ["known", "True", "pickup_or_delivery", "pickup", "confirm_order", "yes", "yes", "True", "yes"],
+    "size_retry": ["known", "True", "False", "False", "pickup_or_delivery", "pickup", "confirm_order", "yes", "no"],
+    "order_then_delivery": ["known", "True", "pickup_or_delivery", "delivery", "True", "confirm_order", "yes", "no"],
+    "delivery": ["known", "False", "pickup_or_delivery", "delivery", "True", "ask_item", "True", "True", "yes", "no"],
+    "pickup": ["known", "False", "pickup_or_delivery", "pickup", "ask_item", "True", "True", "yes", "no"],
+    "status_check": ["known", "False", "status_check", "no"],
+    "status_check_pending": ["known", "False", "status_check_pending", "status_check", "no"],
+    "below_minimum": ["known", "True", "below_minimum", "yes", "True", "True", "yes", "no"],
+    "language_question": ["unknown", "always", "True", "pickup_or_delivery", "pickup", "confirm_order", "yes", "no"],
+}
+
+
+def synthetic_catalog(client_id: int = DEFAULT_CLIENT_ID) -> Catalog:
+    """Every product of the flow vocabulary at 10.00, with the extras of `fixtures`."""
+    catalog_products = [{"id": str(2649158 + i), "title": title, "price": "10.00"} for i, title in enumerate(products)]
+    return Catalog(client_id, catalog_products, build_extras_index(extras_xml(len(products))), time.time())
+
+
+@dataclass
+class SimulationReport:
+    conversations: int = 0
+    finished: int = 0
+    transitions: int = 0
+    elapsed: float = 0.0
+    stalled: Counter = field(default_factory=Counter)  # state where a conversation hit max_turns
+    loops: Counter = field(default_factory=Counter)  # (from, to) edges that revisit a state
+    render_errors: Counter = field(default_factory=Counter)
+    verifier_mismatches: Counter = field(default_factory=Counter)  # (state, expected, got)
+    param_errors: Counter = field(default_factory=Counter)  # (state, problem) against the `@writes` declarations
+    invalid_transitions: Counter = field(default_factory=Counter)  # (state, condition) from scripts
+    fast_path: Counter = field(default_factory=Counter)  # state the multi-slot tool stopped at
+    turns_by_path: dict = field(default_factory=lambda: defaultdict(Counter))
+    static_dead_ends: tuple = ()
+
+    def summary(self) -> str:
+        lines = [
+            f"conversations: {self.conversations} ({self.finished} finished) in {self.elapsed:.2f}s",
+            f"throughput: {self.conversations / self.elapsed:,.0f} conversations/s, {self.transitions / self.elapsed:,.0f} transitions/s"
+            if self.elapsed
+            else "throughput: n/a",
+            f"static dead ends (terminal unreachable): {list(self.static_dead_ends) or 'none'}",
+            f"stalled at max turns: {dict(self.stalled) or 'none'}",
+            f"render errors: {dict(self.render_errors) or 'none'}",
+            f"verifier mismatches: {dict(self.verifier_mismatches) or 'none'}",
+            f"param errors: {dict(self.param_errors) or 'none'}",
+            f"invalid scripted transitions: {dict(self.invalid_transitions) or 'none'}",
+            f"multi-slot tool calls by stop state: {dict(self.fast_path) or 'none'}",
+            "loops (top 10):",
+        ]
+        lines += [f"  {source} -> {target}: {count}" for (source, target), count in self.loops.most_common(10)]
+        lines.append("turn count per path (top 10 paths):")
+        paths = sorted(self.turns_by_path.items(), key=lambda item: -sum(item[1].values()))[:10]
+        for path, turns in paths:
+            total = sum(turns.values())
+            average = sum(turn * count for turn, count in turns.items()) / total
+            lines.append(f"  [{total}x, avg {average:.1f}, min {min(turns)}, max {max(turns)}] {' > '.join(path)}")
+        return "\n".join(lines)
+
+
+def static_dead_ends(flow: CompiledFlow) -> tuple[str, ...]:
+    """States from which no terminal state can be reached."""
+    can_finish = set(flow.terminal)
+    changed = True
+    while changed:
+        changed = False
+        for idx, table in enumerate(flow.transitions):
+            if idx not in can_finish and any(target in can_finish for target in table.values()):
+                can_finish.add(idx)
+                changed = True
+    return tuple(name for idx, name in enumerate(flow.state_names) if idx not in can_finish)
+
+
+class FlowSimulator:
+    def __init__(self, flow: CompiledFlow, initial_params: Optional[dict] = None, max_turns: int = 40, render: bool = True):
+        self.flow = flow
+        self.initial_params = initial_params or {"caller_number": "+31600000000", "error_message": ""}
+        self.max_turns = max_turns
+        self.render = render
+        self.happy_bias = 0.7
+        self.slot_rate = 0.0  # share of ask_item turns answered with the multi-slot tool
+
+    def new_fsm(self, lang: str) -> ConversationFSM:
+        fsm = ConversationFSM(self.flow.states, self.flow.state_names[self.flow.initial_index], {"params": dict(self.initial_params)}, self.flow)
+        fsm.set_lang(lang)
+        return fsm
+
+    def apply(self, fsm: ConversationFSM, condition: str, lang: str, rng: random.Random, report: SimulationReport):
+        state = fsm.states[fsm.current_state]
+        verify = state.verify_from_func
+        func = verify_functions.get(verify["func"]) if verify else None
+        generator = SYNTHETIC_ARGS.get(verify["func"]) if verify else None
+        params = fsm.collected_info["params"]
+        if generator is not None and func is not None:
+            if state.name == "ask_item" and condition == "True" and rng.random() < self.slot_rate:
+                handle_tool_call(fsm, SLOT_TOOL_NAME, _slot_args(condition, lang, rng, params))
+                report.fast_path[fsm.current_state] += 1
+                return
+            args = generator(condition, lang, rng, params)
+            before = dict(params)
+            # Slots still pending are answered after the check, their writes belong to other states' functions
+            pending = fsm.collected_info.pop("slots", None)
+            got = handle_tool_call(fsm, state.tools[0]["name"], args)
+            for problem in param_write_problems(func, got, before, params):
+                report.param_errors[(state.name, problem)] += 1
+            if pending:
+                fsm.collected_info["slots"] = pending
+                fast_forward(fsm)
+            if got != condition and (verify["func"] not in CART_DECIDED or "no" in (got, condition)):
+                report.verifier_mismatches[(state.name, condition, got)] += 1
+            return
+        if verify is None:
+            handle_tool_call(fsm, state.tools[0]["name"], {"next_state_key": condition})
+            return
+        declared = getattr(func, "writes", None)
+        for param in declared.guaranteed(condition) if declared is not None else verify.get("params", []):
+            params[param] = f"<{param}:{lang}>"
+        fsm.turns += 1
+        fsm.advance(condition)
+
+    def run_conversation(self, conditions, lang: str, rng: random.Random, report: SimulationReport):
+        """`conditions` is an iterator of conditions or None to choose randomly."""
+        fsm = self.new_fsm(lang)
+        path, seen, turns = [fsm.current_state], {fsm.current_state}, 0
+        while not fsm.is_finished() and turns < self.max_turns:
+            available = fsm.available_conditions()
+            condition = next(conditions, None) if conditions is not None else None
+            if condition is None:
+                if conditions is not None:
+                    break  # script exhausted
+                happy = [c for c in available if c in HAPPY_CONDITIONS]
+                condition = rng.choice(happy) if happy and rng.random() < self.happy_bias else rng.choice(available)
+            source = fsm.current_state
+            try:
+                self.apply(fsm, condition, lang, rng, report)
+            except ValueError:
+                report.invalid_transitions[(source, condition)] += 1
+                break
+            turns += 1
+            report.transitions += 1
+            target = fsm.current_state
+            if target in seen:
+                report.loops[(source, target)] += 1
+            else:
+                seen.add(target)
+                path.append(target)
+            if self.render:
+                try:
+                    fsm.get_current()
+                except (KeyError, IndexError) as e:
+                    report.render_errors[(target, str(e))] += 1
+        report.conversations += 1
+        if fsm.is_finished():
+            report.finished += 1
+        elif conditions is None:
+            report.stalled[fsm.current_state] += 1
+        report.turns_by_path[tuple(path)][turns] += 1
+        return fsm
+
+    def run_random(self, conversations: int, seed: int = 0, languages=LANGUAGES, happy_bias: float = 0.7, slot_rate: float = 0.2) -> SimulationReport:
+        self.happy_bias = happy_bias
+        self.slot_rate = slot_rate
+        rng = random.Random(seed)
+        report = SimulationReport(static_dead_ends=static_dead_ends(self.flow))
+        started = time.perf_counter()
+        for i in range(conversations):
+            self.run_conversation(None, languages[i % len(languages)], rng, report)
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def run_scripts(self, scripts: dict, languages=LANGUAGES, seed: int = 0) -> SimulationReport:
+        # Scripts list one condition per state, the multi-slot tool would answer several at once
+        self.slot_rate = 0.0
+        rng = random.Random(seed)
+        report = SimulationReport(static_dead_ends=static_dead_ends(self.flow))
+        started = time.perf_counter()
+        for name, conditions in scripts.items():
+            for lang in languages:
+                fsm = self.run_conversation(iter(conditions), lang, rng, report)
+                if not fsm.is_finished():
+                    report.stalled[f"{name}:{lang}@{fsm.current_state}"] += 1
+        report.elapsed = time.perf_counter() - started
+        return report
+
+
+if __name__ == "__main__":
+    from integrations.foodticket_client.catalog_cache import catalog_cache
+    from voice_assistant.state_machine.manager import get_order_flow
+
+    parser = argparse.ArgumentParser(description="Simulate conversations against the order flow")
+    parser.add_argument("--conversations", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--lang", choices=LANGUAGES)
+    parser.add_argument("--happy-bias", type=float, default=0.7)
+    parser.add_argument("--slot-rate", type=float, default=0.2, help="share of ask_item turns answered with the multi-slot tool")
+    parser.add_argument("--max-turns", type=int, default=40)
+    parser.add_argument("--no-render", action="store_true", help="skip prompt rendering (measures pure transitions)")
+    parser.add_argument("--script", choices=sorted(SCRIPTS) + ["all"], help="run scripted paths instead of random ones")
+    options = parser.parse_args()
+
+    catalog_cache.put(synthetic_catalog())
+    simulator = FlowSimulator(get_order_flow().compiled, max_turns=options.max_turns, render=not options.no_render)
+    languages = (options.lang,) if options.lang else LANGUAGES
+    if options.script:
+        scripts = SCRIPTS if options.script == "all" else {options.script: SCRIPTS[options.script]}
+        result = simulator.run_scripts(scripts, languages, options.seed)
+    else:
+        result = simulator.run_random(options.conversations, options.seed, languages, options.happy_bias, options.slot_rate)
+    print(result.summary())
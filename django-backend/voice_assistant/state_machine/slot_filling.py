@@ -0,0 +1,87 @@
+"""
+Multi-slot fast path for the order flow.
+
+At `ask_item` the model can call `extract_order_slots` instead of `get_order_item` when the
+caller front-loads information ("two large pepperoni delivered to 1018TV 3a"). The
+extracted values are kept as pending slots and `fast_forward` answers every state whose
+slot is already known by running the same tool handling a normal turn would run. It stops
+at the first state that still needs the caller: a missing slot, a failed verification or
+a confirmation question (confirm_address, confirm_branch, confirm_order are never skipped).
+Slots of states the call has not reached yet stay pending: an order started with the items
+reaches pickup_or_delivery and ask_address after ask_size, and they are answered there.
+
+`handle_tool_call` is how the call orchestrator applies every tool call of the order flow.
+"""
+
+import logging
+from typing import Optional
+
+from common.utils.metrics import metrics
+from voice_assistant.state_machine.verifiers import run_state_tool
+
+logger = logging.getLogger(__name__)
+
+SLOT_TOOL_NAME = "extract_order_slots"
+
+# Safety net against a flow change that makes slot answers loop
+MAX_FAST_FORWARD_STEPS = 10
+
+
+def _slot_answers(slots: dict) -> dict:
+    """Maps a state name to the tool arguments that answer it, built from the pending slots."""
+    answers = {}
+    if slots.get("delivery_type") in ("pickup", "delivery"):
+        answers["pickup_or_delivery"] = {"next_state_key": slots["delivery_type"]}
+    if slots.get("zip_code"):
+        answers["ask_address"] = {key: slots.get(key) for key in ("city", "zip_code", "house_number")}
+    items = slots.get("pizza_items") or []
+    if items:
+        answers["ask_item"] = {"pizza_items": [{k: v for k, v in item.items() if k != "size"} for item in items]}
+        if all(item.get("size") for item in items):
+            answers["ask_size"] = {
+                "pizza_size_items": [
+                    {"product_name": item["product_name"], "size": item["size"], "quantity": item.get("quantity", 1)} for item in items
+                ]
+            }
+    return answers
+
+
+def store_slots(fsm, args: dict):
+    fsm.collected_info["slots"] = _slot_answers(args)
+
+
+def fast_forward(fsm) -> int:
+    """Answers states from pending slots; each slot is used once. Returns the number of skipped turns."""
+    pending = fsm.collected_info.get("slots") or {}
+    skipped = 0
+    while skipped < MAX_FAST_FORWARD_STEPS and fsm.current_state in pending:
+        state = fsm.current_state
+        run_state_tool(fsm, pending.pop(state))
+        skipped += 1
+        logger.info(f"Slot fast path: answered {state} -> {fsm.current_state}")
+    if skipped:
+        metrics.increment("order.fast_path.skipped_turns", skipped)
+    return skipped
+
+
+def handle_tool_call(fsm, tool_name: str, args: dict) -> Optional[str]:
+    """
+    Entry point for tool calls of the order flow: applies the result and skips states that are already answered.
+    Returns the condition of the current state's tool, None for the slot tool. Raises ValueError for a result
+    the state has no transition for.
+    """
+    if fsm.is_finished():
+        return None
+    fsm.turns += 1
+    condition = None
+    if tool_name == SLOT_TOOL_NAME:
+        store_slots(fsm, args)
+        metrics.increment("order.fast_path.used")
+    else:
+        condition = run_state_tool(fsm, args)
+    fast_forward(fsm)
+
+    if fsm.is_finished() and fsm.collected_info["params"].get("order_confirmed"):
+        metrics.increment("order.completed")
+        metrics.observe("order.turns", fsm.turns)
+    return condition
@@ -2,6 +2,19 @@ import copy
 from dataclasses import dataclass
 from typing import Optional
 
+# Param with enums narrowed to the current order: {tool name: {property name: allowed values}}
+TOOL_ENUMS_PARAM = "tool_enums"
+
+
+def narrow_enums(schema: dict, enums: dict):
+    """Replaces the enum of every property named in `enums` (or of its array items), at any depth of the schema."""
+    for name, prop in schema.get("properties", {}).items():
+        target = prop if "enum" in prop else prop.get("items", {})
+        if name in enums and "enum" in target:
+            target["enum"] = list(enums[name])
+        narrow_enums(prop, enums)
+        narrow_enums(prop.get("items", {}), enums)
+
 
 # A dataclass representing a single state in a conversation flow (FSM).
 @dataclass
@@ -44,6 +57,7 @@ class ConversationState:
             for property in tool["parameters"]["properties"].values():
                 property["description"] = property.get("description", "").format(**dynamic_parameters)
                 # print("new description", property["description"])
+            narrow_enums(tool["parameters"], dynamic_parameters.get(TOOL_ENUMS_PARAM, {}).get(tool.get("name"), {}))
     
         return self.__class__(
             name=self.name,
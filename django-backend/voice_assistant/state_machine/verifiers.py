@@ -0,0 +1,369 @@
+"""
+Verification functions referenced by `verify_from_func.func` in the flow files.
+
+Each function receives the call FSM and the arguments of the tool the model called in
+the current state, writes params and returns the condition used to pick the next state.
+The params it writes are declared with `@writes`; the flow compiler derives from that which
+placeholders are set in later states, and `run_state_tool` reports writes that differ from it.
+"""
+
+import logging
+import re
+import time
+from collections import defaultdict, deque
+from typing import List, Optional
+
+from common.utils.metrics import metrics
+from integrations.foodticket_client.catalog_cache import catalog_cache
+from integrations.foodticket_client.client import DEFAULT_CLIENT_ID
+from integrations.foodticket_client.pricing import OrderLine, Quote, format_euros, price_book_for_catalog
+from integrations.foodticket_client.product_options import OptionsIndex, options_index_for_catalog
+from integrations.foodticket_client.zipcode_index import zipcode_index
+from integrations.nl_addresses.address_index import default_address_index
+from voice_assistant.state_machine.compiler import param_write_problems, writes
+from voice_assistant.state_machine.conversation_openai_tools import vocabularies
+from voice_assistant.state_machine.states import TOOL_ENUMS_PARAM
+
+logger = logging.getLogger(__name__)
+
+LANGUAGE_CODES = {"english": "en", "turkish": "tr", "dutch": "du"}
+
+DUTCH_ZIP_CODE = re.compile(r"^\d{4}[A-Z]{2}$")
+
+SIZE_ERRORS = {
+    "en": {"invalid": "{sizes} is not an available size", "missing": "you did not specify a size for {products}"},
+    "tr": {"invalid": "{sizes} mevcut bir boyut degil", "missing": "{products} icin boyut belirtmediniz"},
+    "du": {"invalid": "{sizes} is geen beschikbare maat", "missing": "u heeft geen maat opgegeven voor {products}"},
+}
+
+ORDER_TOTAL_MESSAGES = {
+    "en": {"total": "Your total is {total} euro", "delivery": " including {delivery} euro delivery costs", "separator": "."},
+    "tr": {"total": "Toplam tutariniz {total} euro", "delivery": ", {delivery} euro teslimat ucreti dahil", "separator": ","},
+    "du": {"total": "Het totaalbedrag is {total} euro", "delivery": ", inclusief {delivery} euro bezorgkosten", "separator": ","},
+}
+
+# Confirmations that settle how the order is fulfilled; the order quote only adds delivery costs for "delivery"
+FULFILLMENT_CONFIRMATIONS = {"confirm_address": "delivery", "confirm_branch": "pickup"}
+
+# Tool of ask_size / ask_size_failed, its enums are narrowed to the products in the cart and their sizes
+SIZE_TOOL = "ask_size_items_tool"
+
+# Read the order history prefetch (`CallContext`); the orchestrator gives a prefetch that is still running
+# the turn's latency budget to finish before running them
+ORDER_HISTORY_VERIFIERS = frozenset({"test_order_status", "test_order_status_again"})
+
+# First state of the order flow: the language of the caller's first answer skips the language question
+# (call_orchestrator detects it from the transcript, see `test_detected_language`)
+GREETING_STATE = "greeting"
+
+# The caller's answer in this state decides whether the cart is submitted (`order_outbox`)
+ORDER_CONFIRMATION_STATE = "confirm_order"
+
+
+def format_items(items: list[dict]) -> str:
+    parts = []
+    for item in items:
+        text = f"{item.get('quantity', 1)} {item['product_name']}"
+        if item.get("toppings"):
+            text += f" ({', '.join(item['toppings'])})"
+        parts.append(text)
+    return ", ".join(parts)
+
+
+def _restaurant(fsm):
+    """The call's `restaurants.Restaurant`; without one (simulator, scripts) the process-wide instances and default vocabularies are used."""
+    return fsm.collected_info.get("restaurant")
+
+
+def _vocabularies(fsm) -> dict:
+    restaurant = _restaurant(fsm)
+    return restaurant.vocabularies if restaurant is not None else vocabularies
+
+
+def _zipcode_index(fsm):
+    restaurant = _restaurant(fsm)
+    return restaurant.zipcodes if restaurant is not None else zipcode_index
+
+
+def _client_id(fsm) -> int:
+    restaurant = _restaurant(fsm)
+    return restaurant.client_id if restaurant is not None else DEFAULT_CLIENT_ID
+
+
+def _options_index(fsm) -> Optional[OptionsIndex]:
+    """Option constraints of the restaurant's menu, None while its catalog has not been loaded yet."""
+    catalog = catalog_cache.peek(_client_id(fsm))
+    return options_index_for_catalog(catalog) if catalog is not None else None
+
+
+def order_lines(params: dict) -> List[OrderLine]:
+    """
+    The cart as order lines: each sized item (ask_size) with the toppings of the ask_item line it
+    answers. Items of the same product are paired in order, so two lines of one pizza keep their own toppings.
+    """
+    toppings = defaultdict(deque)
+    for item in params.get("pizza_items", []):
+        toppings[item["product_name"]].append(tuple(item.get("toppings") or ()))
+    lines = []
+    for item in params.get("pizza_size_items", []):
+        queue = toppings.get(item["product_name"])
+        lines.append(OrderLine(item["product_name"], int(item.get("quantity") or 1), item.get("size"), queue.popleft() if queue else ()))
+    return lines
+
+
+def order_quote(params: dict, client_id: int = DEFAULT_CLIENT_ID) -> Optional[Quote]:
+    """Prices the sized order from the cached catalog; None while no catalog has been loaded yet."""
+    catalog = catalog_cache.peek(client_id)
+    if catalog is None:
+        return None
+    lines = order_lines(params)
+    delivery_area = None
+    if params.get("delivery_type") == "delivery" and "min_order" in params:
+        delivery_area = {"costs": params["delivery_costs"], "min_order": params["min_order"], "free_delivery": params["free_delivery"]}
+    return price_book_for_catalog(catalog).quote(lines, delivery_area)
+
+
+def set_quote_params(params: dict, quote: Optional[Quote]):
+    """Writes the quote params; they are empty when the order could not be priced, so prompts skip the total."""
+    priced = quote is not None and quote.complete
+    params["order_total"] = format_euros(quote.total_cents) if priced else ""
+    params["min_order_str"] = format_euros(quote.min_order_cents) if priced else ""
+    for lang, messages in ORDER_TOTAL_MESSAGES.items():
+        text = ""
+        if priced:
+            text = messages["total"].format(total=format_euros(quote.total_cents, messages["separator"]))
+            if quote.delivery_cents:
+                text += messages["delivery"].format(delivery=format_euros(quote.delivery_cents, messages["separator"]))
+            text += ". "
+        params[f"order_total_str_{lang}"] = text
+
+
+@writes()
+def test_language(fsm, args: dict) -> str:
+    fsm.set_lang(LANGUAGE_CODES.get(args.get("language"), "en"))
+    return "always"
+
+
+@writes()
+def test_detected_language(fsm, args: dict) -> str:
+    """Answer to the greeting: "unknown" leads to the explicit language question."""
+    lang = LANGUAGE_CODES.get(args.get("language"))
+    if lang is None:
+        return "unknown"
+    fsm.set_lang(lang)
+    return "known"
+
+
+def _order_status(fsm) -> str:
+    context = fsm.collected_info.get("call_context")
+    if context is not None and not context.order_history_loaded:
+        # The prefetch outlived the wait for it (see ORDER_HISTORY_VERIFIERS); not the same as "no order"
+        return "status_check_pending"
+    order = context.last_order if context is not None else None
+    if order is None:
+        return "status_check_failed"
+    # Set once; the "listen again" loop of status_check re-reads the same params
+    fsm.collected_info["params"].update(
+        product_status=order.get("status") or "",
+        product_title=order.get("product_title") or "",
+        product_price=order.get("product_price") or "",
+    )
+    return "status_check"
+
+
+@writes("product_status", "product_title", "product_price", on=("status_check",))
+def test_order_status(fsm, args: dict) -> str:
+    """`entry`: a status question is answered from the order history prefetched at call start (`CallContext`)."""
+    if args.get("intent") != "check_status":
+        return "pickup_or_delivery"
+    return _order_status(fsm)
+
+
+@writes("product_status", "product_title", "product_price", on=("status_check",))
+def test_order_status_again(fsm, args: dict) -> str:
+    """`status_check_pending`: the caller asked to check again while the order history was still loading."""
+    if args.get("next_state_key") != "yes":
+        return "no"
+    return _order_status(fsm)
+
+
+@writes("zip_code", "house_number", "city", "street", "full_address", on=("True",), optional=("delivery_costs", "min_order", "free_delivery"))
+def test_address(fsm, args: dict) -> str:
+    params = fsm.collected_info["params"]
+    zip_code = (args.get("zip_code") or "").replace(" ", "").upper()
+    house_number = (args.get("house_number") or "").strip()
+    city = (args.get("city") or "").strip()
+    if not DUTCH_ZIP_CODE.match(zip_code) or not house_number:
+        return "False"
+    # With the address index the address must exist; street and city come from it, not from the transcript
+    street = ""
+    addresses = default_address_index()
+    if addresses is not None:
+        address = addresses.lookup(zip_code, house_number)
+        if address is None:
+            metrics.increment("address_index.rejected")
+            return "False"
+        street, city = address.street, address.city
+    # Until the first load finishes the address is accepted and the delivery area is not checked
+    zipcodes = _zipcode_index(fsm)
+    if zipcodes.loaded:
+        zipcode = zipcodes.lookup(zip_code)
+        if zipcode is None or not zipcode["available"]:
+            return "False"
+        params.update(delivery_costs=zipcode["costs"], min_order=zipcode["min_order"], free_delivery=zipcode["free_delivery"])
+    params.update(zip_code=zip_code, house_number=house_number, city=city, street=street)
+    if street:
+        params["full_address"] = f"{street} {house_number}, {zip_code} {city}"
+    else:
+        params["full_address"] = f"{zip_code} {house_number}, {city}".strip(", ")
+    return "True"
+
+
+@writes("pizza_items", "pizza_items_str", "size_options", TOOL_ENUMS_PARAM, on=("True",))
+def test_menu(fsm, args: dict) -> str:
+    items = [item for item in args.get("pizza_items") or [] if item.get("product_name")]
+    if not items:
+        return "False"
+    params = fsm.collected_info["params"]
+    size_options = _vocabularies(fsm)["sizes"]
+    options = _options_index(fsm)
+    if options is not None:
+        problems = options.check_cart(items)
+        if problems:
+            metrics.increment("order.invalid_options", len(problems))
+        if any(problem.kind == "unknown_product" for problem in problems):
+            return "False"
+        # Toppings the pizza does not come with are dropped; ask_size reads the accepted items back
+        invalid_toppings = {(problem.product_name, problem.value) for problem in problems}
+        for item in items:
+            if item.get("toppings"):
+                item["toppings"] = [topping for topping in item["toppings"] if (item["product_name"], topping) not in invalid_toppings]
+        size_options = options.allowed_sizes(item["product_name"] for item in items) or size_options
+    params["pizza_items"] = items
+    params["pizza_items_str"] = format_items(items)
+    params["size_options"] = ", ".join(size_options)
+    product_names = list(dict.fromkeys(item["product_name"] for item in items))
+    params[TOOL_ENUMS_PARAM] = {SIZE_TOOL: {"product_name": product_names, "size": [*size_options, "other"]}}
+    return "True"
+
+
+@writes(
+    "pizza_size_items",
+    "pizza_size_str",
+    "order_total",
+    "min_order_str",
+    *(f"size_error_str_{lang}" for lang in SIZE_ERRORS),
+    *(f"order_total_str_{lang}" for lang in ORDER_TOTAL_MESSAGES),
+)
+def test_order_size(fsm, args: dict) -> str:
+    params = fsm.collected_info["params"]
+    size_items = args.get("pizza_size_items") or []
+    options = _options_index(fsm)
+    if options is not None:
+        # The size must be one the product comes in, not just any size on the menu
+        valid = [bool(item.get("size")) and not options.check_cart([item], sized=True) for item in size_items]
+    else:
+        sizes = _vocabularies(fsm)["sizes"]
+        valid = [item.get("size") in sizes for item in size_items]
+    invalid = sorted({item.get("size") or "other" for item, ok in zip(size_items, valid) if not ok})
+    sized_products = {item.get("product_name") for item, ok in zip(size_items, valid) if ok}
+    missing = [item["product_name"] for item in params.get("pizza_items", []) if item["product_name"] not in sized_products]
+
+    for lang, messages in SIZE_ERRORS.items():
+        errors = []
+        if invalid:
+            errors.append(messages["invalid"].format(sizes=", ".join(invalid)))
+        if missing:
+            errors.append(messages["missing"].format(products=", ".join(missing)))
+        params[f"size_error_str_{lang}"] = ". ".join(errors)
+
+    params["pizza_size_items"] = [item for item, ok in zip(size_items, valid) if ok]
+    params["pizza_size_str"] = ", ".join(
+        f"{item.get('quantity', 1)} {item.get('product_name')} {item.get('size')}" for item in params["pizza_size_items"]
+    )
+    if invalid or missing:
+        set_quote_params(params, None)
+        return "False"
+    if params.get("delivery_type") is None:
+        # Delivery costs and the minimum depend on it: the order is priced once it is settled (`test_fulfillment`)
+        set_quote_params(params, None)
+        return "pickup_or_delivery"
+
+    started = time.perf_counter()
+    quote = order_quote(params, _client_id(fsm))
+    set_quote_params(params, quote)
+    metrics.observe("order.quote_ms", (time.perf_counter() - started) * 1000)
+    if quote is not None and quote.below_minimum:
+        return "below_minimum"
+    return "True"
+
+
+@writes(
+    # pizza_items_str and pizza_size_str come from ask_item / ask_size: only a sized cart leads to confirm_order
+    "pizza_items_str",
+    "pizza_size_str",
+    "order_total",
+    "min_order_str",
+    *(f"order_total_str_{lang}" for lang in ORDER_TOTAL_MESSAGES),
+    on=("confirm_order", "below_minimum"),
+    optional=("delivery_type",),
+)
+def test_fulfillment(fsm, args: dict) -> str:
+    """
+    `confirm_address` / `confirm_branch`: a "yes" settles the delivery type. A call that gave its items first
+    has a sized cart by now, which is priced for it; otherwise the items are asked next.
+    """
+    if args.get("next_state_key") != "yes":
+        return "no"
+    params = fsm.collected_info["params"]
+    params["delivery_type"] = FULFILLMENT_CONFIRMATIONS[fsm.current_state]
+    if not params.get("pizza_size_items"):
+        return "ask_item"
+    quote = order_quote(params, _client_id(fsm))
+    set_quote_params(params, quote)
+    if quote is not None and quote.below_minimum:
+        return "below_minimum"
+    return "confirm_order"
+
+
+@writes("note", on=("True",))
+def test_note(fsm, args: dict) -> str:
+    note = (args.get("note") or "").strip()
+    if not note:
+        return "False"
+    fsm.collected_info["params"]["note"] = note
+    return "True"
+
+
+verify_functions = {
+    "test_language": test_language,
+    "test_detected_language": test_detected_language,
+    "test_order_status": test_order_status,
+    "test_order_status_again": test_order_status_again,
+    "test_address": test_address,
+    "test_menu": test_menu,
+    "test_order_size": test_order_size,
+    "test_fulfillment": test_fulfillment,
+    "test_note": test_note,
+}
+
+
+def run_state_tool(fsm, args: dict) -> str:
+    """Applies the result of the current state's tool to the FSM and returns the condition that was used."""
+    state = fsm.states[fsm.current_state]
+    if state.verify_from_func is None:
+        condition = args.get("next_state_key", "")
+    else:
+        func = verify_functions[state.verify_from_func["func"]]
+        params = fsm.collected_info["params"]
+        before = dict(params)
+        condition = func(fsm, args)
+        problems = param_write_problems(func, condition, before, params)
+        if problems:
+            # The compiler trusted the declaration; a placeholder may now be missing or stale
+            metrics.increment("fsm.param_write_errors")
+            logger.error(f"State {state.name}: {'; '.join(problems)}")
+    if fsm.current_state == ORDER_CONFIRMATION_STATE:
+        fsm.collected_info["params"]["order_confirmed"] = condition == "yes"
+    fsm.advance(condition)
+    return condition
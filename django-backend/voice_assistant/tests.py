@@ -1,3 +1,669 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from twilio.twiml.voice_response import Connect, Stream, VoiceResponse
+
+from db.models import CallerLanguagePreference, CallStatusEvent, OrderOutbox
+from integrations.foodticket_client.catalog_cache import Catalog, catalog_cache
+from integrations.foodticket_client.client import FoodticketAPIError
+from integrations.foodticket_client.extras_index import ExtraGroup, ExtrasIndex
+from voice_assistant.services.call_orchestrator import CallOrchestrator
+from voice_assistant.services.call_snapshot_store import CallSnapshotStore
+from voice_assistant.services.call_status import CallStatusBuffer, call_status_buffer, event_from_callback
+from voice_assistant.services.catalog_sync import CatalogSync
+from voice_assistant.services.language_detector import detect_language
+from voice_assistant.services.language_preferences import load_language_preference, save_language_preference
+from voice_assistant.services.order_outbox import OrderOutboxWorker, idempotency_key, order_from_fsm
+from voice_assistant.services.restaurants import RestaurantRegistry
+from voice_assistant.services.twiml import FIRST_MESSAGE, incoming_call_twiml
+from voice_assistant.state_machine.compiler import FlowCompilationError, compile_flow
+from voice_assistant.state_machine.conversation_openai_tools import products, vocabularies
+from voice_assistant.state_machine.flow_loader import COMPILED_CACHE_SIZE, FlowRegistry
+from voice_assistant.state_machine.fsm import SNAPSHOT_VERSION, ConversationFSM
+from voice_assistant.state_machine.manager import ORDER_FLOW, flows_dir, get_order_flow
+from voice_assistant.state_machine.simulator import SCRIPTS, FlowSimulator, synthetic_catalog
+from voice_assistant.state_machine.slot_filling import SLOT_TOOL_NAME, fast_forward, handle_tool_call
+from voice_assistant.state_machine.states import ConversationState
+from voice_assistant.state_machine.verifiers import SIZE_TOOL, order_lines, verify_functions
+
+
+def _state(name, next_states=None, prompt="", **kwargs):
+    tools = []
+    if next_states:
+        schema = {"type": "object", "properties": {"next_state_key": {"type": "string", "enum": list(next_states)}}}
+        tools.append({"type": "function", "name": f"{name}_tool", "description": "", "parameters": schema})
+    return ConversationState(name=name, prompt_en=prompt, prompt_tr=prompt, prompt_du=prompt, tools=tools, next_states=next_states, **kwargs)
+
+
+def _flow(*states):
+    return {state.name: state for state in states}
+
+
+class FlowCompilerTests(SimpleTestCase):
+    def test_transitions_follow_the_compiled_table(self):
+        states = _flow(_state("ask", {"yes": "done", "no": "ask"}), _state("done"))
+        fsm = ConversationFSM(states, "ask", {"params": {}})
+        fsm.advance("no")
+        self.assertEqual(fsm.current_state, "ask")
+        fsm.advance("yes")
+        self.assertEqual(fsm.current_state, "done")
+        self.assertTrue(fsm.is_finished())
+
+    def test_unknown_condition_raises_and_keeps_the_state(self):
+        fsm = ConversationFSM(_flow(_state("ask", {"yes": "done"}), _state("done")), "ask", {"params": {}})
+        with self.assertRaises(ValueError):
+            fsm.advance("maybe")
+        self.assertEqual(fsm.current_state, "ask")
+
+    def test_transition_to_unknown_state_is_rejected(self):
+        with self.assertRaises(FlowCompilationError) as raised:
+            compile_flow(_flow(_state("ask", {"yes": "missing"})), "ask")
+        self.assertIn("points to unknown state 'missing'", str(raised.exception))
+
+    def test_unreachable_state_is_rejected(self):
+        with self.assertRaises(FlowCompilationError) as raised:
+            compile_flow(_flow(_state("ask", {"yes": "done"}), _state("done"), _state("orphan")), "ask")
+        self.assertIn("state 'orphan' is not reachable", str(raised.exception))
+
+    def test_placeholder_must_be_set_on_every_path(self):
+        states = _flow(_state("ask", {"yes": "done"}), _state("done", prompt="Bye {name}"))
+        with self.assertRaises(FlowCompilationError) as raised:
+            compile_flow(states, "ask")
+        self.assertIn("['name'] that are not set on every path", str(raised.exception))
+        compile_flow(states, "ask", initial_params={"name"})
+
+    def test_tool_result_without_transition_is_rejected(self):
+        state = _state("ask", {"yes": "done"})
+        state.tools[0]["parameters"]["properties"]["next_state_key"]["enum"].append("no")
+        with self.assertRaises(FlowCompilationError) as raised:
+            compile_flow(_flow(state, _state("done")), "ask")
+        self.assertIn("can return 'no' which has no transition", str(raised.exception))
+
+
+class OrderFlowTests(SimpleTestCase):
+    def setUp(self):
+        catalog_cache.put(synthetic_catalog())
+
+    def test_scripted_paths_reach_the_end(self):
+        report = FlowSimulator(get_order_flow().compiled).run_scripts(SCRIPTS)
+        self.assertEqual(report.finished, report.conversations)
+        self.assertEqual(report.static_dead_ends, ())
+        for problems in (report.invalid_transitions, report.verifier_mismatches, report.param_errors, report.render_errors, report.stalled):
+            self.assertEqual(dict(problems), {})
+
+    def test_random_conversations_keep_the_param_declarations(self):
+        report = FlowSimulator(get_order_flow().compiled).run_random(300, seed=1)
+        self.assertEqual(dict(report.verifier_mismatches), {})
+        self.assertEqual(dict(report.param_errors), {})
+        self.assertEqual(dict(report.render_errors), {})
+
+
+class OrderLinesTests(SimpleTestCase):
+    def test_toppings_stay_with_their_own_line(self):
+        params = {
+            "pizza_items": [
+                {"product_name": "Margherita Pizza", "quantity": 1, "toppings": ["Ham"]},
+                {"product_name": "Funghi Pizza", "quantity": 1},
+                {"product_name": "Margherita Pizza", "quantity": 2, "toppings": ["Extra kaas", "Ui"]},
+            ],
+            "pizza_size_items": [
+                {"product_name": "Margherita Pizza", "quantity": 1, "size": "Large 35cm"},
+                {"product_name": "Funghi Pizza", "quantity": 1, "size": "Medium 30cm"},
+                {"product_name": "Margherita Pizza", "quantity": 2, "size": "Medium 30cm"},
+            ],
+        }
+        lines = order_lines(params)
+        self.assertEqual(
+            [(line.product_name, line.size, line.toppings) for line in lines],
+            [
+                ("Margherita Pizza", "Large 35cm", ("Ham",)),
+                ("Funghi Pizza", "Medium 30cm", ()),
+                ("Margherita Pizza", "Medium 30cm", ("Extra kaas", "Ui")),
+            ],
+        )
+        self.assertEqual(lines[2].quantity, 2)
+
+
+class FakeFoodticketClient:
+    """Answers `submit_order` with the queued results in turn: an order id, or an exception to raise."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    async def submit_order(self, order, idempotency_key):
+        self.calls.append((order, idempotency_key))
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class OrderOutboxTests(TestCase):
+    CLIENT_ID = 42
+
+    def setUp(self):
+        self.worker = OrderOutboxWorker()
+
+    def _use_client(self, *results):
+        client = self.worker._clients[self.CLIENT_ID] = FakeFoodticketClient(*results)
+        return client
+
+    async def test_an_order_is_queued_once_per_call(self):
+        self.assertTrue(await self.worker.enqueue("CA1", self.CLIENT_ID, {"orderlines": [{"product_id": "1"}]}))
+        self.assertFalse(await self.worker.enqueue("CA1", self.CLIENT_ID, {"orderlines": [{"product_id": "2"}]}))
+        row = await OrderOutbox.objects.aget(call_sid="CA1")
+        self.assertEqual(row.idempotency_key, idempotency_key("CA1"))
+        self.assertEqual(row.payload["orderlines"][0]["product_id"], "1")
+
+    async def test_retries_send_the_same_idempotency_key(self):
+        client = self._use_client(FoodticketAPIError(503), "9001")
+        await self.worker.enqueue("CA2", self.CLIENT_ID, {"orderlines": []})
+
+        self.assertEqual(await self.worker.process_due(), 1)
+        row = await OrderOutbox.objects.aget(call_sid="CA2")
+        self.assertEqual((row.status, row.attempts), (OrderOutbox.PENDING, 1))
+        self.assertGreater(row.next_attempt_at, timezone.now())
+        # Not due yet
+        self.assertEqual(await self.worker.process_due(), 0)
+
+        await OrderOutbox.objects.filter(pk=row.pk).aupdate(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(await self.worker.process_due(), 1)
+        await row.arefresh_from_db()
+        self.assertEqual((row.status, row.attempts, row.external_order_id), (OrderOutbox.SUBMITTED, 2, "9001"))
+        self.assertEqual([key for _, key in client.calls], [idempotency_key("CA2")] * 2)
+
+    async def test_a_rejected_order_is_not_retried(self):
+        self._use_client(FoodticketAPIError(422))
+        await self.worker.enqueue("CA3", self.CLIENT_ID, {"orderlines": []})
+        await self.worker.process_due()
+        row = await OrderOutbox.objects.aget(call_sid="CA3")
+        self.assertEqual((row.status, row.attempts), (OrderOutbox.FAILED, 1))
+        self.assertIn("422", row.last_error)
+
+
+class OrderPayloadTests(SimpleTestCase):
+    def setUp(self):
+        self.catalog = synthetic_catalog()
+        catalog_cache.put(self.catalog)
+        self.product = self.catalog.products[0]
+        name = self.product["title"]
+        self.params = {
+            "order_confirmed": True,
+            "delivery_type": "pickup",
+            "pizza_items": [{"product_name": name, "quantity": 1, "toppings": ["Ham"]}],
+            "pizza_size_items": [{"product_name": name, "quantity": 2, "size": "Large 35cm"}],
+        }
+
+    def _order(self):
+        return order_from_fsm(SimpleNamespace(collected_info={"params": self.params}, lang="nl"), "+31600000000", self.catalog.client_id)
+
+    def test_lines_refer_to_catalog_ids(self):
+        order = self._order()
+        line = order["orderlines"][0]
+        self.assertEqual((line["product_id"], line["quantity"]), (self.product["id"], 2))
+        groups = {group.name: group for group in self.catalog.extras.groups_for_product(self.product["id"])}
+        size, ham = groups["Bodem"], groups["Toppings"]
+        self.assertEqual(line["extras"], [size.option_ids[size.options.index("Large 35cm")], ham.option_ids[ham.options.index("Ham")]])
+        self.assertEqual(line["price_cents"], 1000 + size.price_of("Large 35cm") + ham.price_of("Ham"))
+        self.assertEqual(order["total_cents"], 2 * line["price_cents"])
+
+    def test_order_without_delivery_type_is_not_queued(self):
+        del self.params["delivery_type"]
+        self.assertIsNone(self._order())
+        self.params["delivery_type"] = "delivery"
+        self.params.update(street="Damrak", house_number="1", zip_code="1012LG", city="Amsterdam")
+        self.assertEqual(self._order()["address"]["street"], "Damrak")
+
+    def test_unconfirmed_or_unpriced_carts_are_not_queued(self):
+        self.params["pizza_size_items"][0]["size"] = "other"
+        self.assertIsNone(self._order())
+        self.params["order_confirmed"] = False
+        self.assertIsNone(self._order())
+
+
+class IncomingCallTwimlTests(SimpleTestCase):
+    def _library_twiml(self, host, caller_number, dialed_number):
+        stream = Stream(url=f"wss://{host}/ws/media-stream/")
+        stream.parameter(name="callerNumber", value=caller_number)
+        stream.parameter(name="dialedNumber", value=dialed_number)
+        stream.parameter(name="firstMessage", value=FIRST_MESSAGE)
+        connect = Connect()
+        connect.append(stream)
+        response = VoiceResponse()
+        response.append(connect)
+        return str(response)
+
+    def test_template_matches_the_twilio_library(self):
+        for caller_number in ("+31612345678", "Anonymous", 'Anonymous <"&">', "{caller_number}", "line\nbreak"):
+            self.assertEqual(
+                incoming_call_twiml("voice.example.com", caller_number, "+31201234567"),
+                self._library_twiml("voice.example.com", caller_number, "+31201234567"),
+            )
+
+    async def test_webhook_connects_the_media_stream(self):
+        response = await self.async_client.post("/incoming-call", {"From": "+31612345678", "To": "+31201234567"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/xml")
+        self.assertEqual(response.content.decode(), incoming_call_twiml("testserver", "+31612345678", "+31201234567"))
+        self.assertEqual((await self.async_client.get("/incoming-call")).status_code, 405)
+
+
+def _callback(call_sid="CA1", status="completed", **fields):
+    return {"CallSid": call_sid, "CallStatus": status, "SequenceNumber": "3", "CallDuration": "61", "From": "+31612345678", **fields}
+
+
+class CallStatusTests(TestCase):
+    def test_callback_fields(self):
+        event = event_from_callback(_callback(Timestamp="Mon, 16 Aug 2010 03:45:01 +0000"))
+        self.assertEqual((event.call_session_id, event.status, event.sequence_number, event.duration), ("CA1", "completed", 3, 61))
+        self.assertEqual(event.occurred_at.isoformat(), "2010-08-16T03:45:01+00:00")
+        self.assertIsNone(event_from_callback(_callback(status="exploded")))
+        self.assertIsNone(event_from_callback(_callback(call_sid="")))
+        self.assertIsNone(event_from_callback(_callback(SequenceNumber="x")).sequence_number)
+
+    async def test_events_are_written_in_one_batch(self):
+        buffer = CallStatusBuffer(batch_size=10, max_buffered=3)
+        for i in range(4):
+            buffer.add(event_from_callback(_callback(call_sid=f"CA{i}")))
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(await buffer.flush(), 3)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(await CallStatusEvent.objects.acount(), 3)
+
+    async def test_failed_flush_keeps_the_events(self):
+        buffer = CallStatusBuffer(max_buffered=3)
+        buffer.add(event_from_callback(_callback(call_sid="CA1")))
+        buffer.add(event_from_callback(_callback(call_sid="CA2")))
+        with mock.patch.object(CallStatusEvent.objects, "abulk_create", side_effect=RuntimeError("database down")):
+            with self.assertRaises(RuntimeError):
+                await buffer.flush()
+        self.assertEqual([event.call_session_id for event in buffer._events], ["CA1", "CA2"])
+        self.assertEqual(await buffer.flush(), 2)
+
+    @override_settings(TWILIO_VALIDATE_SIGNATURES=False)
+    async def test_webhook_buffers_valid_callbacks(self):
+        self.addCleanup(call_status_buffer.stop)
+        self.addCleanup(call_status_buffer._events.clear)
+        self.assertEqual((await self.async_client.post("/call-status", _callback(call_sid="CA9"))).status_code, 204)
+        self.assertEqual((await self.async_client.post("/call-status", _callback(status="exploded"))).status_code, 400)
+        self.assertEqual([event.call_session_id for event in call_status_buffer._events], ["CA9"])
+
+    @override_settings(TWILIO_VALIDATE_SIGNATURES=True, TWILIO_AUTH_TOKEN="secret")
+    async def test_webhook_rejects_unsigned_callbacks(self):
+        self.assertEqual((await self.async_client.post("/call-status", _callback())).status_code, 403)
+
+
+class CatalogSyncTests(SimpleTestCase):
+    def setUp(self):
+        defaults = {name: list(items) for name, items in vocabularies.items()}
+        self.registry = FlowRegistry(flows_dir, defaults, verify_functions=verify_functions)
+        self.sync = CatalogSync(self.registry, defaults, client_id=4242)
+        bodem = ExtraGroup("10", "Bodem", True, ("Medium 30cm",), (0,), ("1001",))
+        self.catalog = Catalog(4242, [{"id": "1", "title": "Test Pizza", "price": "9.00"}], ExtrasIndex({"10": bodem}, {"1": ("10",)}), time.time())
+
+    def _offers_test_pizza(self) -> bool:
+        return "Test Pizza" in json.dumps(self.registry.get(ORDER_FLOW).compiled.states["ask_item"].tools)
+
+    def test_flows_and_vocabularies_are_installed_together(self):
+        before = self.registry.get(ORDER_FLOW)
+        new, compiled, diff = self.sync._build(self.catalog)
+        # Compiled but not published: calls still get the flow that matches `current`
+        self.assertIn("products", diff)
+        self.assertIs(self.registry.get(ORDER_FLOW), before)
+        self.assertNotIn("Test Pizza", self.sync.current["products"])
+
+        self.sync._swap(self.catalog, new, compiled, diff)
+        self.assertIsNot(self.registry.get(ORDER_FLOW), before)
+        self.assertTrue(self._offers_test_pizza())
+        self.assertEqual(self.sync.current["products"], ["Test Pizza"])
+        # Replaced, never mutated: the defaults are untouched
+        self.assertNotIn("Test Pizza", vocabularies["products"])
+
+    def test_unchanged_catalog_is_applied_once(self):
+        self.assertIn("products", self.sync.apply(self.catalog))
+        flow = self.registry.get(ORDER_FLOW)
+        self.assertEqual(self.sync.apply(self.catalog), {})
+        self.assertIs(self.registry.get(ORDER_FLOW), flow)
+
+
+class FlowRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "greeting.json"
+        self._write("Hello")
+
+    def _write(self, greeting: str):
+        self.path.write_text(json.dumps({"name": "greeting", "version": 1, "prompts": {"greeting": greeting}}))
+
+    def test_reloads_after_the_file_changes(self):
+        registry = FlowRegistry(self.tmp.name, {}, check_interval=0)
+        first = registry.get("greeting")
+        self.assertIs(registry.get("greeting"), first)
+        self._write("Hello again")
+        second = registry.get("greeting")
+        self.assertEqual(second.prompts["greeting"], "Hello again")
+        self.assertNotEqual(second.content_hash, first.content_hash)
+        # Running calls keep the version they started with
+        self.assertEqual(first.prompts["greeting"], "Hello")
+
+    def test_checks_at_most_once_per_interval(self):
+        registry = FlowRegistry(self.tmp.name, {}, check_interval=60)
+        with mock.patch("voice_assistant.state_machine.flow_loader.time.monotonic", return_value=1000.0):
+            first = registry.get("greeting")
+            self._write("Hello again")
+            with mock.patch("voice_assistant.state_machine.flow_loader.os.stat") as stat:
+                self.assertIs(registry.get("greeting"), first)
+            stat.assert_not_called()
+        with mock.patch("voice_assistant.state_machine.flow_loader.time.monotonic", return_value=1060.0):
+            self.assertEqual(registry.get("greeting").prompts["greeting"], "Hello again")
+
+    def test_compiled_cache_keeps_the_most_recent_versions(self):
+        registry = FlowRegistry(self.tmp.name, {}, check_interval=0)
+        versions = []
+        for i in range(COMPILED_CACHE_SIZE + 2):
+            # Differently sized, so the change is seen even within one mtime tick
+            self._write("Hello" + "!" * i)
+            versions.append(registry.get("greeting"))
+        cached = [loaded.content_hash for loaded in registry._compiled_cache.values()]
+        self.assertEqual(cached, [loaded.content_hash for loaded in versions[-COMPILED_CACHE_SIZE:]])
+        # A version still in the cache is reused, an evicted one is compiled again
+        self._write("Hello" + "!" * (COMPILED_CACHE_SIZE - 1))
+        self.assertIs(registry.get("greeting"), versions[COMPILED_CACHE_SIZE - 1])
+        self._write("Hello")
+        self.assertIsNot(registry.get("greeting"), versions[0])
+        self.assertEqual(len(registry._compiled_cache), COMPILED_CACHE_SIZE)
+
+    async def test_reload_on_the_event_loop_runs_in_a_thread(self):
+        registry = FlowRegistry(self.tmp.name, {}, check_interval=0)
+        first = registry.get("greeting")
+        self._write("Hello again")
+        with mock.patch.object(registry, "_compile", wraps=registry._compile) as compile_:
+            self.assertIs(registry.get("greeting"), first)
+            for _ in range(200):
+                if "greeting" not in registry._pending_checks:
+                    break
+                await asyncio.sleep(0.01)
+        compile_.assert_called_once()
+        self.assertEqual(registry.get("greeting").prompts["greeting"], "Hello again")
+
+
+class LanguageDetectionTests(SimpleTestCase):
+    def test_detects_the_language_of_a_first_answer(self):
+        cases = {
+            "Ik wil graag twee pizza bestellen": "du",
+            "Merhaba, iki pizza sipariş etmek istiyorum": "tr",
+            "Hello, I would like to order two pizzas": "en",
+        }
+        for transcript, lang in cases.items():
+            guess = detect_language(transcript)
+            self.assertEqual(guess.lang, lang, transcript)
+            self.assertGreaterEqual(guess.confidence, 0.8, transcript)
+
+    def test_little_evidence_gives_low_confidence(self):
+        self.assertEqual(detect_language("mm").lang, None)
+        self.assertEqual(detect_language("").confidence, 0.0)
+        # A single marker word is not enough on its own, the caller's country code adds to it
+        self.assertLess(detect_language("ja").confidence, 0.6)
+        self.assertGreater(detect_language("ja", "+31612345678").confidence, detect_language("ja").confidence)
+
+
+@override_settings(LANGUAGE_DETECTION_MIN_CONFIDENCE=0.6, LANGUAGE_PREFERENCE_TTL_SECONDS=3600)
+class GreetingTests(TestCase):
+    def setUp(self):
+        flow = get_order_flow().compiled
+        self.orchestrator = CallOrchestrator(consumer=None)
+        self.orchestrator.call_sid = "CA123"
+        self.orchestrator.caller_number = "+44700000000"
+        fsm = ConversationFSM(
+            flow.states, flow.state_names[flow.initial_index], {"params": {"caller_number": "+44700000000", "error_message": ""}}, flow
+        )
+        self.orchestrator.fsm = fsm
+        self.orchestrator._push_state = mock.AsyncMock()
+
+    async def test_confident_first_answer_skips_the_language_question(self):
+        self.assertEqual(self.orchestrator.fsm.current_state, "greeting")
+        await self.orchestrator._detect_language("Ik wil graag twee pizza bestellen")
+        self.assertEqual(self.orchestrator.fsm.current_state, "ask_item")
+        self.assertEqual(self.orchestrator.fsm.lang, "du")
+        self.orchestrator._push_state.assert_awaited_once()
+        # Only the first answer is detected
+        await self.orchestrator._detect_language("Hello, I would like to order two pizzas")
+        self.assertEqual(self.orchestrator.fsm.lang, "du")
+
+    async def test_unclear_first_answer_asks_for_the_language(self):
+        await self.orchestrator._detect_language("mm")
+        self.assertEqual(self.orchestrator.fsm.current_state, "language_selection")
+        self.assertIsNone(self.orchestrator.fsm.lang)
+        self.orchestrator._push_state.assert_awaited_once()
+
+    async def test_language_preference_is_shared_and_expires(self):
+        await save_language_preference("+44700000000", "tr")
+        self.assertEqual(await load_language_preference("+44700000000"), "tr")
+        self.assertIsNone(await load_language_preference("+44700000001"))
+        self.assertTrue(self.orchestrator._answer_greeting(await load_language_preference("+44700000000")))
+        self.assertEqual(self.orchestrator.fsm.current_state, "ask_item")
+        self.assertEqual(self.orchestrator.fsm.lang, "tr")
+
+        await CallerLanguagePreference.objects.all().aupdate(updated_at=timezone.now() - timedelta(hours=2))
+        self.assertIsNone(await load_language_preference("+44700000000"))
+
+
+class SlotFillingTests(SimpleTestCase):
+    def setUp(self):
+        catalog_cache.put(synthetic_catalog())
+        flow = get_order_flow().compiled
+        self.fsm = ConversationFSM(flow.states, "ask_item", {"params": {"caller_number": "+31600000000", "error_message": ""}}, flow)
+        self.fsm.set_lang("en")
+        self.pizza = {"product_name": products[0], "quantity": 2}
+
+    def test_delivery_and_address_slots_are_answered_after_the_items(self):
+        slots = {
+            "pizza_items": [{**self.pizza, "size": "30cm"}],
+            "delivery_type": "delivery",
+            "city": "Amsterdam",
+            "zip_code": "1018TV",
+            "house_number": "3a",
+        }
+        with mock.patch("voice_assistant.state_machine.verifiers.default_address_index", return_value=None):
+            self.assertIsNone(handle_tool_call(self.fsm, SLOT_TOOL_NAME, slots))
+        # ask_item, ask_size, pickup_or_delivery and ask_address were answered, the address is still confirmed
+        self.assertEqual(self.fsm.current_state, "confirm_address")
+        self.assertEqual(self.fsm.turns, 1)
+        self.assertEqual(self.fsm.collected_info["slots"], {})
+        params = self.fsm.collected_info["params"]
+        self.assertEqual((params["zip_code"], params["house_number"]), ("1018TV", "3a"))
+        self.assertNotIn("delivery_type", params)
+
+        self.assertEqual(handle_tool_call(self.fsm, "confirm_address", {"next_state_key": "yes"}), "confirm_order")
+        self.assertEqual(params["delivery_type"], "delivery")
+        # Priced now that the delivery type is known
+        self.assertTrue(params["order_total"])
+
+    def test_pending_slots_wait_for_their_state(self):
+        handle_tool_call(self.fsm, SLOT_TOOL_NAME, {"pizza_items": [self.pizza], "delivery_type": "pickup"})
+        # Without a size the caller is asked; the pickup answer stays pending
+        self.assertEqual(self.fsm.current_state, "ask_size")
+        self.assertEqual(list(self.fsm.collected_info["slots"]), ["pickup_or_delivery"])
+        self.assertEqual(fast_forward(self.fsm), 0)
+
+        sizes = {"pizza_size_items": [{**self.pizza, "size": "35cm"}]}
+        self.assertEqual(handle_tool_call(self.fsm, SIZE_TOOL, sizes), "pickup_or_delivery")
+        self.assertEqual(self.fsm.current_state, "confirm_branch")
+        self.assertEqual(handle_tool_call(self.fsm, "confirm_branch", {"next_state_key": "yes"}), "confirm_order")
+        self.assertEqual(self.fsm.collected_info["params"]["delivery_type"], "pickup")
+
+    def test_items_first_order_asks_pickup_or_delivery(self):
+        self.assertEqual(handle_tool_call(self.fsm, "get_order_item", {"pizza_items": [self.pizza]}), "True")
+        self.assertEqual(handle_tool_call(self.fsm, SIZE_TOOL, {"pizza_size_items": [{**self.pizza, "size": "30cm"}]}), "pickup_or_delivery")
+        self.assertEqual(self.fsm.current_state, "pickup_or_delivery")
+
+    def test_answer_without_transition_raises(self):
+        self.fsm.current_state = "confirm_order"
+        with self.assertRaises(ValueError):
+            handle_tool_call(self.fsm, "confirm_order", {"next_state_key": "maybe"})
+        self.assertEqual(self.fsm.current_state, "confirm_order")
+
+    def test_finished_call_ignores_tool_calls(self):
+        self.fsm.current_state = "end_call"
+        self.assertIsNone(handle_tool_call(self.fsm, "end_call", {}))
+        self.assertEqual(self.fsm.turns, 0)
+
+
+class CallSnapshotTests(SimpleTestCase):
+    def setUp(self):
+        catalog_cache.put(synthetic_catalog())
+        self.flow = get_order_flow().compiled
+        self.fsm = self._new_fsm("+31600000000")
+        self.fsm.set_lang("tr")
+        self.pizza = {"product_name": products[0], "quantity": 2}
+        handle_tool_call(self.fsm, "get_order_item", {"pizza_items": [self.pizza]})
+
+    def _new_fsm(self, caller_number):
+        return ConversationFSM(self.flow.states, "ask_item", {"params": {"caller_number": caller_number, "error_message": ""}}, self.flow)
+
+    def test_restore_resumes_state_language_and_slots(self):
+        snapshot = json.loads(json.dumps(self.fsm.snapshot()))
+        self.assertNotIn("caller_number", snapshot["params"])
+        resumed = self._new_fsm("+31600000001")
+        self.assertTrue(resumed.restore(snapshot))
+        self.assertEqual((resumed.current_state, resumed.lang, resumed.turns), ("ask_size", "tr", 1))
+        self.assertEqual(resumed.collected_info["params"]["pizza_items"], [self.pizza])
+        # The current call's own values are kept
+        self.assertEqual(resumed.collected_info["params"]["caller_number"], "+31600000001")
+        self.assertIn(products[0], resumed.get_current().prompt)
+
+    def test_unusable_snapshots_are_rejected(self):
+        snapshot = self.fsm.snapshot()
+        for change in ({"v": SNAPSHOT_VERSION - 1}, {"state": "removed_state"}, {"flow": "other_flow"}):
+            resumed = self._new_fsm("+31600000000")
+            self.assertFalse(resumed.restore({**snapshot, **change}), change)
+            self.assertEqual((resumed.current_state, resumed.lang, resumed.turns), ("ask_item", None, 0))
+            self.assertNotIn("pizza_items", resumed.collected_info["params"])
+
+
+class CallSnapshotStoreTests(SimpleTestCase):
+    CALLER = "+31600000000"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = CallSnapshotStore(self.tmp.name, resume_window_seconds=60)
+
+    async def _drain(self):
+        while self.store._writers:
+            await asyncio.gather(*list(self.store._writers.values()))
+
+    def _snapshot(self, age=0.0):
+        return {"v": SNAPSHOT_VERSION, "state": "ask_size", "saved_at": time.time() - age}
+
+    async def test_saved_snapshot_is_loaded_before_and_after_the_write(self):
+        snapshot = self._snapshot()
+        self.store.save(self.CALLER, snapshot)
+        self.assertEqual(await self.store.load_recent(self.CALLER), snapshot)
+        await self._drain()
+        self.assertTrue(self.store._path(self.CALLER).exists())
+        self.assertNotIn(self.CALLER, self.store._path(self.CALLER).name)
+        self.assertEqual(await self.store.load_recent(self.CALLER), snapshot)
+
+    async def test_snapshot_outside_the_resume_window_is_dropped(self):
+        self.store.save(self.CALLER, self._snapshot(age=61))
+        await self._drain()
+        self.assertIsNone(await self.store.load_recent(self.CALLER))
+        await self._drain()
+        self.assertFalse(self.store._path(self.CALLER).exists())
+
+    async def test_delete_after_save_is_written_last(self):
+        calls = []
+        write, remove = self.store._write, self.store._remove
+        self.store._write = lambda *args: (calls.append("write"), write(*args))
+        self.store._remove = lambda *args: (calls.append("remove"), remove(*args))
+        self.store.save(self.CALLER, self._snapshot())
+        # Let the writer pick up the save, the delete is queued while it is written
+        await asyncio.sleep(0)
+        self.store.delete(self.CALLER)
+        self.assertIsNone(await self.store.load_recent(self.CALLER))
+        await self._drain()
+        self.assertEqual(calls, ["write", "remove"])
+        self.assertFalse(self.store._path(self.CALLER).exists())
+
+    async def test_only_the_latest_queued_snapshot_is_written(self):
+        calls = []
+        self.store._write = lambda caller_number, snapshot: calls.append(snapshot["state"])
+        self.store.save(self.CALLER, {**self._snapshot(), "state": "ask_item"})
+        self.store.save(self.CALLER, self._snapshot())
+        await self._drain()
+        self.assertEqual(calls, ["ask_size"])
+
+    def test_sweep_removes_expired_files(self):
+        self.store._write(self.CALLER, self._snapshot())
+        self.store._write("+31600000001", self._snapshot())
+        expired = time.time() - 120
+        os.utime(self.store._path(self.CALLER), (expired, expired))
+        self.assertEqual(self.store.sweep(), 1)
+        self.assertFalse(self.store._path(self.CALLER).exists())
+        self.assertTrue(self.store._path("+31600000001").exists())
+
+
+class RestaurantRegistryTests(SimpleTestCase):
+    NUMBERS = {"+31 20 000 0001": 1001, "+31 20 000 0002": 1002, "+31 20 000 0003": 1003, "+31 20 000 0004": 1004}
+
+    def setUp(self):
+        patcher = mock.patch(
+            "voice_assistant.services.restaurants._new_restaurant", side_effect=lambda client_id: mock.Mock(client_id=client_id, active_calls=0)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # The default restaurant and two partitions
+        self.registry = RestaurantRegistry(self.NUMBERS, max_partitions=3)
+
+    def _partitions(self):
+        return list(self.registry._partitions)
+
+    def test_partition_with_a_running_call_is_never_evicted(self):
+        held = self.registry.acquire("+31200000001")
+        idle = self.registry.get(1002)
+        self.registry.get(1003)
+        # 1001 is the least recently used but held by a call, so 1002 goes
+        self.assertEqual(self._partitions(), [1001, 1003])
+        idle.close.assert_called_once()
+        held.close.assert_not_called()
+
+        third = self.registry.acquire("+31200000003")
+        self.registry.get(1004)
+        self.assertEqual(self._partitions(), [1001, 1003, 1004])
+        self.assertEqual((held.active_calls, third.active_calls), (1, 1))
+
+    def test_release_makes_the_partition_evictable_in_lru_order(self):
+        first = self.registry.acquire("+31200000001")
+        self.registry.acquire("+31200000001")
+        second = self.registry.acquire("+31200000002")
+        self.registry.release(first)
+        self.assertEqual(first.active_calls, 1)
+        self.registry.release(first)
+        self.registry.release(second)
+        self.registry.release(second)
+        self.assertEqual((first.active_calls, second.active_calls), (0, 0))
+
+        # A new call moves 1001 to the end, so the next partition evicts 1002
+        self.registry.release(self.registry.acquire("+31200000001"))
+        self.assertEqual(self._partitions(), [1002, 1001])
+        self.registry.get(1003)
+        self.assertEqual(self._partitions(), [1001, 1003])
+        second.close.assert_called_once()
+        first.close.assert_not_called()
+
+    def test_unlisted_numbers_use_the_default_restaurant(self):
+        self.assertIs(self.registry.acquire("+31999999999"), self.registry.default)
+        self.registry.release(self.registry.default)
+        self.assertEqual(self._partitions(), [])
@@ -5,7 +5,9 @@ app_name = 'voice_assistant'
 
 urlpatterns = [
     path("incoming-call", views.incoming_call_view, name="incoming_call"),
+    path("call-status", views.call_status_view, name="call_status"),
     path("call-conversations/", views.call_conversation_view, name="call_conversations"),
+    path("metrics/", views.metrics_view, name="metrics"),
     path("call-conversation/<str:call_session_id>/", views.call_conversation_view, name="call_conversation"),
     # re_path(r'media-stream/?$', views.MediaStreamConsumer.as_asgi()),
 ]
@@ -8,8 +8,12 @@ from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render, get_object_or_404
 from django.db.models import Count, Max, Q
-from twilio.twiml.voice_response import VoiceResponse, Connect, Stream
+from django.conf import settings
+from twilio.request_validator import RequestValidator
+from common.utils.metrics import metrics
 from voice_assistant.services.call_orchestrator import CallOrchestrator
+from voice_assistant.services.call_status import call_status_buffer, event_from_callback
+from voice_assistant.services.twiml import incoming_call_twiml
 
 logger = logging.getLogger(__name__)
 IS_TEST = os.environ.get("IS_TEST") == "true"
@@ -17,26 +21,49 @@ IS_RECORD = os.environ.get("IS_RECORD") == "true"
 
 
 @csrf_exempt
-def incoming_call_view(request):
+async def incoming_call_view(request):
+    """Twilio voice webhook: connects the call to the media stream. Async, so ASGI serves it without a thread hop."""
     if request.method != "POST":
         return JsonResponse({"error": "Only POST allowed"}, status=405)
 
     logger.info("Incoming call received")
-    # Twilio'dan gelen caller numarasını al
-    caller_number = request.POST.get("From", "Unknown")
     host = request.get_host().split(":")[0]  # IP veya domain
+    # dialedNumber selects the restaurant partition (RESTAURANT_CLIENT_IDS) for the call
+    twiml = incoming_call_twiml(host, request.POST.get("From", "Unknown"), request.POST.get("To", ""))
+    return HttpResponse(twiml, content_type="application/xml")
 
-    # TwiML ile yönlendirme cevabı oluştur
-    response = VoiceResponse()
-    connect = Connect()
-    stream = Stream(url=f"wss://{host}/ws/media-stream/")
-    stream.parameter(name="callerNumber", value=caller_number)
-    stream.parameter(name="firstMessage", value="Say 'Hello, this is Sofi. What language would you prefer: English, Dutch, or Turkish?'")
 
-    connect.append(stream)
-    response.append(connect)
+def _has_valid_twilio_signature(request) -> bool:
+    if not settings.TWILIO_VALIDATE_SIGNATURES:
+        return True
+    if not settings.TWILIO_AUTH_TOKEN:
+        logger.error("TWILIO_AUTH_TOKEN is not set, Twilio webhooks cannot be validated")
+        return False
+    # Twilio signs the public https URL; TLS ends at the proxy in front of us
+    url = f"https://{request.get_host()}{request.get_full_path()}"
+    return RequestValidator(settings.TWILIO_AUTH_TOKEN).validate(url, request.POST, request.headers.get("X-Twilio-Signature", ""))
 
-    return HttpResponse(str(response), content_type="application/xml")
+
+@csrf_exempt
+async def call_status_view(request):
+    """Twilio call status callback: the event is buffered and written in a batch, see `services.call_status`."""
+    if request.method != "POST":
+        return JsonResponse({"error": "Only POST allowed"}, status=405)
+    if not _has_valid_twilio_signature(request):
+        metrics.increment("call_status.rejected")
+        return HttpResponse(status=403)
+    event = event_from_callback(request.POST)
+    if event is None:
+        metrics.increment("call_status.rejected")
+        return HttpResponse(status=400)
+    call_status_buffer.start()
+    call_status_buffer.add(event)
+    return HttpResponse(status=204)
+
+
+def metrics_view(request):
+    """In-process metrics of this worker (turns per order, fast path usage, ...)."""
+    return JsonResponse(metrics.snapshot())
 
 
 class MediaStreamConsumer(AsyncWebsocketConsumer):